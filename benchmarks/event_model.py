@@ -0,0 +1,100 @@
+"""
+Compares the memory and time of splitting multi-day events into days with per-day dict copies, as the ICS module used
+to do, and with the slotted Event model and its per-day views.
+
+    python benchmarks/event_model.py --events 20000 --days 5
+"""
+
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.event import Event, EventDay
+
+
+def split_dicts(events: List[Dict[str, Any]]) -> Dict[dt.date, List[Dict[str, Any]]]:
+    days: Dict[dt.date, List[Dict[str, Any]]] = {}
+    for event in events:
+        current_date = event["startDatetime"].date()
+        while current_date <= event["endDatetime"].date():
+            event_day = event.copy()
+            event_day["startDatetime"] = max(
+                event["startDatetime"], dt.datetime.combine(current_date, dt.time(0, 0, 0))
+            )
+            event_day["endDatetime"] = min(
+                event["endDatetime"], dt.datetime.combine(current_date, dt.time(23, 59, 59))
+            )
+            days.setdefault(current_date, []).append(event_day)
+            current_date += dt.timedelta(days=1)
+    return days
+
+
+def split_events(events: List[Event]) -> Dict[dt.date, List[EventDay]]:
+    days: Dict[dt.date, List[EventDay]] = {}
+    for event in events:
+        current_date = event.start_datetime.date()
+        while current_date <= event.end_datetime.date():
+            days.setdefault(current_date, []).append(EventDay(event, current_date))
+            current_date += dt.timedelta(days=1)
+    return days
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[float, int]:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start_time
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=5, help="length of every event in days")
+    args = parser.parse_args()
+
+    start = dt.datetime(2024, 8, 27, 10, 0, 0)
+
+    def dicts() -> Any:
+        events = [
+            {
+                "summary": f"Event {i}",
+                "location": "Somewhere",
+                "startDatetime": start + dt.timedelta(hours=i),
+                "endDatetime": start + dt.timedelta(hours=i, days=args.days),
+                "isMultiday": True,
+                "calendarName": "Benchmark",
+            }
+            for i in range(args.events)
+        ]
+        return events, split_dicts(events)
+
+    def slotted() -> Any:
+        events = [
+            Event(
+                summary=f"Event {i}",
+                start_datetime=start + dt.timedelta(hours=i),
+                end_datetime=start + dt.timedelta(hours=i, days=args.days),
+                calendar_name="Benchmark",
+                location="Somewhere",
+            )
+            for i in range(args.events)
+        ]
+        return events, split_events(events)
+
+    for name, fn in (("dicts", dicts), ("slotted", slotted)):
+        seconds, size = measure(fn)
+        print(f"{name:>7}: {round(seconds, 3)} seconds, {round(size / 1e6, 1)} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Synthetic ICS calendars and One Call API responses for the benchmark suite, and a stub HTTP server that serves them
+so that the benchmarks run offline. The content is deterministic, runs on the same commit see the same data.
+"""
+
+import datetime as dt
+import hashlib
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+TIMEZONES = [
+    "America/Los_Angeles",
+    "America/Denver",
+    "America/Chicago",
+    "America/New_York",
+    "America/Sao_Paulo",
+    "Europe/London",
+    "Europe/Berlin",
+    "Europe/Moscow",
+    "Africa/Nairobi",
+    "Asia/Kolkata",
+    "Asia/Shanghai",
+    "Asia/Tokyo",
+    "Australia/Sydney",
+    "Pacific/Auckland",
+]
+
+RRULES = [
+    "FREQ=DAILY",
+    "FREQ=DAILY;INTERVAL=2",
+    "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+    "FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH",
+    "FREQ=MONTHLY;BYMONTHDAY=1,15",
+    "FREQ=MONTHLY;BYDAY=-1FR",
+    "FREQ=YEARLY",
+]
+
+
+def format_datetime(value: dt.datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def format_date(value: dt.date) -> str:
+    return value.strftime("%Y%m%d")
+
+
+def wrap_calendar(name: str, events: List[List[str]]) -> str:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Benchmark//EN", f"X-WR-CALNAME:{name}"]
+    for event in events:
+        lines += ["BEGIN:VEVENT"] + event + ["END:VEVENT"]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def generate_single_events(count: int, today: dt.date, seed: int = 0) -> str:
+    """Single events spread over the two years before and the year after today, most of them in the past."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        start = dt.datetime.combine(
+            today + dt.timedelta(days=rng.randint(-730, 365)), dt.time(rng.randint(6, 20))
+        )
+        events.append(
+            [
+                f"UID:single-{i}@benchmark",
+                f"DTSTART:{format_datetime(start)}Z",
+                f"DTEND:{format_datetime(start + dt.timedelta(minutes=rng.choice([30, 45, 60, 90])))}Z",
+                f"SUMMARY:Event {i}",
+                "LOCATION:Somewhere",
+            ]
+        )
+    return wrap_calendar("Single", events)
+
+
+def generate_recurring_events(count: int, today: dt.date, seed: int = 0) -> str:
+    """Recurring events started years ago, some with exceptions and overridden occurrences."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        start = dt.datetime.combine(
+            today - dt.timedelta(days=rng.randint(30, 1500)), dt.time(rng.randint(6, 20))
+        )
+        event = [
+            f"UID:recurring-{i}@benchmark",
+            f"DTSTART:{format_datetime(start)}Z",
+            f"DTEND:{format_datetime(start + dt.timedelta(hours=1))}Z",
+            f"RRULE:{rng.choice(RRULES)}",
+            f"SUMMARY:Recurring {i}",
+        ]
+        if i % 3 == 0:
+            event.append(f"EXDATE:{format_datetime(start + dt.timedelta(days=7))}Z")
+        events.append(event)
+        if i % 5 == 0:
+            # Move the occurrence one week after the start by an hour
+            moved = start + dt.timedelta(days=7)
+            events.append(
+                [
+                    f"UID:recurring-{i}@benchmark",
+                    f"RECURRENCE-ID:{format_datetime(moved)}Z",
+                    f"DTSTART:{format_datetime(moved + dt.timedelta(hours=1))}Z",
+                    f"DTEND:{format_datetime(moved + dt.timedelta(hours=2))}Z",
+                    f"SUMMARY:Recurring {i} (moved)",
+                ]
+            )
+    return wrap_calendar("Recurring", events)
+
+
+def generate_multiday_events(count: int, today: dt.date, seed: int = 0) -> str:
+    """All-day and timed events lasting from days to several years, most of them covering today."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        start = today - dt.timedelta(days=rng.randint(0, 1500))
+        end = today + dt.timedelta(days=rng.randint(-30, 1500))
+        if end <= start:
+            end = start + dt.timedelta(days=rng.randint(2, 14))
+        if i % 2 == 0:
+            event = [
+                f"DTSTART;VALUE=DATE:{format_date(start)}",
+                f"DTEND;VALUE=DATE:{format_date(end)}",
+            ]
+        else:
+            event = [
+                f"DTSTART:{format_datetime(dt.datetime.combine(start, dt.time(9)))}Z",
+                f"DTEND:{format_datetime(dt.datetime.combine(end, dt.time(17)))}Z",
+            ]
+        events.append([f"UID:multiday-{i}@benchmark", f"SUMMARY:Multi-day {i}"] + event)
+    return wrap_calendar("Multi-day", events)
+
+
+def generate_timezone_events(count: int, today: dt.date, seed: int = 0) -> str:
+    """Single and weekly events in local time of many time zones, which crosses DST changes in the window."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        tzid = TIMEZONES[i % len(TIMEZONES)]
+        start = dt.datetime.combine(
+            today + dt.timedelta(days=rng.randint(-365, 60)), dt.time(rng.randint(6, 20))
+        )
+        event = [
+            f"UID:timezone-{i}@benchmark",
+            f"DTSTART;TZID={tzid}:{format_datetime(start)}",
+            f"DTEND;TZID={tzid}:{format_datetime(start + dt.timedelta(hours=1))}",
+            f"SUMMARY:{tzid} {i}",
+        ]
+        if i % 4 == 0:
+            event.append("RRULE:FREQ=WEEKLY")
+        events.append(event)
+    return wrap_calendar("Time zones", events)
+
+
+def generate_one_call(today: dt.date, seed: int = 0) -> Dict[str, Any]:
+    """A One Call API 3.0 response with the fields used by the dashboard."""
+    rng = random.Random(seed)
+    now = int(dt.datetime.combine(today, dt.time(12), dt.timezone.utc).timestamp())
+
+    def weather() -> List[Dict[str, Any]]:
+        weather_id = rng.choice([200, 300, 500, 600, 701, 800, 801, 804])
+        return [{"id": weather_id, "main": "Clouds", "description": "scattered clouds"}]
+
+    return {
+        "current": {
+            "dt": now,
+            "sunrise": now - 6 * 3600,
+            "sunset": now + 6 * 3600,
+            "temp": 21.3,
+            "feels_like": 20.1,
+            "uvi": 4.2,
+            "weather": weather(),
+        },
+        "hourly": [
+            {
+                "dt": now + h * 3600,
+                "temp": 20 + rng.random() * 5,
+                "pop": rng.random(),
+                "weather": weather(),
+            }
+            for h in range(48)
+        ],
+        "daily": [
+            {
+                "dt": now + d * 86400,
+                "temp": {"min": 10 + rng.random() * 5, "max": 20 + rng.random() * 5},
+                "pop": rng.random(),
+                "moon_phase": round(rng.random(), 2),
+                "weather": weather(),
+            }
+            for d in range(8)
+        ],
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # The routes are registered on the server
+    server: "StubServer"
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path not in self.server.routes:
+            self.send_error(404)
+            return
+        body, content_type = self.server.routes[path]
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves the registered calendars and API responses on a free local port."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.routes: Dict[str, Tuple[bytes, str]] = {}
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_calendar(self, name: str, body: str) -> str:
+        self.routes[f"/{name}.ics"] = (body.encode("utf-8"), "text/calendar; charset=utf-8")
+        return f"{self.url}/{name}.ics"
+
+    def add_one_call(self, data: Dict[str, Any]) -> str:
+        self.routes["/onecall"] = (json.dumps(data).encode("utf-8"), "application/json")
+        return f"{self.url}/onecall"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
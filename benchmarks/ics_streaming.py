@@ -0,0 +1,97 @@
+"""
+Compares parsing a large ICS feed in full with the streaming mode that drops events outside the query window before
+parsing. Reports the time and the peak memory allocated by Python for both.
+
+    python benchmarks/ics_streaming.py --years 10 --events-per-day 5
+"""
+
+import argparse
+import datetime as dt
+import io
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import icalendar
+import recurring_ical_events
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.stream import filter_calendar
+
+
+def generate_calendar(years: int, events_per_day: int, end: dt.date) -> str:
+    """Generates a calendar with single events every day for the given number of years up to end."""
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Benchmark//EN", "X-WR-CALNAME:Benchmark"]
+    day = end - dt.timedelta(days=365 * years)
+    uid = 0
+    while day < end:
+        for i in range(events_per_day):
+            start = dt.datetime.combine(day, dt.time(8 + i))
+            uid += 1
+            lines += [
+                "BEGIN:VEVENT",
+                f"DTSTART:{start:%Y%m%dT%H%M%S}Z",
+                f"DTEND:{start + dt.timedelta(minutes=45):%Y%m%dT%H%M%S}Z",
+                f"SUMMARY:Event {uid}",
+                "LOCATION:Somewhere",
+                f"UID:event-{uid}@benchmark",
+                "END:VEVENT",
+            ]
+        day += dt.timedelta(days=1)
+    lines += [
+        "BEGIN:VEVENT",
+        f"DTSTART;VALUE=DATE:{end - dt.timedelta(days=365 * years):%Y%m%d}",
+        "RRULE:FREQ=WEEKLY",
+        "SUMMARY:Weekly Event",
+        "UID:weekly@benchmark",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def measure(fn: Callable[[], int]) -> Tuple[int, float, int]:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    count = fn()
+    seconds = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, seconds, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--events-per-day", type=int, default=5)
+    parser.add_argument("--days", type=int, default=30, help="length of the query window")
+    args = parser.parse_args()
+
+    start = dt.datetime.now(dt.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + dt.timedelta(days=args.days)
+    body = generate_calendar(args.years, args.events_per_day, start.date() + dt.timedelta(days=365))
+    print(f"Calendar with {body.count('BEGIN:VEVENT')} events, {round(len(body) / 1e6, 1)} MB")
+
+    def full() -> int:
+        calendar = icalendar.Calendar.from_ical(body)
+        return len(recurring_ical_events.of(calendar).between(start, end))
+
+    def streaming() -> int:
+        # Reading from a file object mimics reading the response incrementally
+        filtered = filter_calendar(io.StringIO(body), start, end)
+        calendar = icalendar.Calendar.from_ical(filtered)
+        return len(recurring_ical_events.of(calendar).between(start, end))
+
+    for name, fn in (("full", full), ("streaming", streaming)):
+        count, seconds, peak = measure(fn)
+        print(
+            f"{name:>9}: {count} occurrences in {round(seconds, 3)} seconds, "
+            f"peak memory {round(peak / 1e6, 1)} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
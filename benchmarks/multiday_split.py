@@ -0,0 +1,72 @@
+"""
+Compares splitting multi-year events into days over their whole length, as the ICS module used to do, with the
+splitting clipped to the query window.
+
+    python benchmarks/multiday_split.py --events 200 --years 2 --days 30
+"""
+
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+from typing import Dict, List
+from unittest.mock import patch
+
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.event import Event, EventDay
+from ics_cal.ics import IcsModule
+
+
+def split_unclipped(events: List[Event]) -> Dict[dt.date, List[EventDay]]:
+    days: Dict[dt.date, List[EventDay]] = {}
+    for event in events:
+        current_date = event.start_datetime.date()
+        while current_date <= event.end_datetime.date():
+            days.setdefault(current_date, []).append(EventDay(event, current_date))
+            current_date += dt.timedelta(days=1)
+    return days
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--years", type=int, default=2, help="length of every event in years")
+    parser.add_argument("--days", type=int, default=30, help="length of the query window")
+    args = parser.parse_args()
+
+    timezone = pytz.timezone("Europe/Berlin")
+    cal_start = timezone.localize(dt.datetime(2024, 8, 27, 0, 0, 0))
+    cal_end = cal_start + dt.timedelta(days=args.days, seconds=-1)
+    events = [
+        Event(
+            summary=f"Event {i}",
+            start_datetime=cal_start,
+            end_datetime=cal_start + dt.timedelta(days=365 * args.years, hours=i),
+        )
+        for i in range(args.events)
+    ]
+
+    start_time = time.perf_counter()
+    unclipped = split_unclipped(events)
+    unclipped_seconds = time.perf_counter() - start_time
+
+    ics_module = IcsModule()
+    with patch.object(ics_module, "_retrieve_events", return_value=events):
+        start_time = time.perf_counter()
+        clipped = ics_module.get_events("", cal_start, cal_end, "Europe/Berlin")
+        clipped_seconds = time.perf_counter() - start_time
+
+    for name, days, seconds in (
+        ("unclipped", unclipped, unclipped_seconds),
+        ("clipped", clipped, clipped_seconds),
+    ):
+        count = sum(len(e) for e in days.values())
+        print(f"{name:>9}: {count} event days in {round(seconds, 3)} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Benchmarks retrieving the events and rendering the dashboard HTML for synthetic calendars at several scales, served by
+a local stub server so that no network access is needed. Results are written as JSON and can be compared with the
+results of another commit.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --scenarios single_100,rrule --compare results.json
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import fixtures
+from config import DashboardConfig
+from ics_cal.ics import IcsModule
+from metrics import stage_seconds
+from owm.owm import OwmModule
+from render.render import RenderHelper
+
+# Stages recorded by the ICS module, see metrics.py
+ICS_STAGES = ("ics_fetch", "ics_parse", "recurrence_expansion", "day_grouping")
+
+# Scenario name to the generator and number of VEVENTs of each feed
+SCENARIOS: Dict[str, List[Tuple[Callable[..., str], int]]] = {
+    "single_100": [(fixtures.generate_single_events, 100)],
+    "single_10k": [(fixtures.generate_single_events, 10_000)],
+    "single_100k": [(fixtures.generate_single_events, 100_000)],
+    "rrule": [(fixtures.generate_recurring_events, 2_000)],
+    "multiday": [(fixtures.generate_multiday_events, 1_000)],
+    "timezones": [(fixtures.generate_timezone_events, 2_000)],
+    "mixed": [
+        (fixtures.generate_single_events, 5_000),
+        (fixtures.generate_recurring_events, 500),
+        (fixtures.generate_multiday_events, 200),
+        (fixtures.generate_timezone_events, 500),
+    ],
+}
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return None
+
+
+def get_stage_sums() -> Dict[str, float]:
+    return {stage: stage_seconds.get_sum(stage=stage) for stage in ICS_STAGES}
+
+
+def timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    start_time = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start_time
+
+
+def run_scenario(
+    server: fixtures.StubServer, name: str, cfg: DashboardConfig, repeat: int
+) -> Dict[str, Any]:
+    local_timezone = pytz.timezone(cfg.DISPLAY_TZ)
+    current_time = dt.datetime.now(local_timezone)
+    start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + dt.timedelta(days=cfg.NUM_CAL_DAYS_TO_QUERY, seconds=-1)
+
+    bodies = [
+        generate(count, current_time.date(), seed=i)
+        for i, (generate, count) in enumerate(SCENARIOS[name])
+    ]
+    ics_url = "|".join(server.add_calendar(f"{name}-{i}", body) for i, body in enumerate(bodies))
+    weather = OwmModule().get_weather(cfg.LAT, cfg.LNG, cfg.OWM_API_KEY, cfg.WEATHER_UNITS)
+    render_helper = RenderHelper(cfg)
+
+    results: Dict[str, List[float]] = {
+        key: [] for key in ["get_events_cold", "get_events_warm", *ICS_STAGES, "render_html"]
+    }
+    for _ in range(repeat):
+        # A new module has neither downloaded nor parsed any of the feeds
+        ics_module = IcsModule(min_refresh="0")
+        before = get_stage_sums()
+        events, seconds = timed(lambda: ics_module.get_events(ics_url, start, end, cfg.DISPLAY_TZ))
+        results["get_events_cold"].append(seconds)
+        after = get_stage_sums()
+        for stage in ICS_STAGES:
+            results[stage].append(after[stage] - before[stage])
+
+        # The feeds are unchanged, so they are answered with 304 and taken from the calendar cache
+        _, seconds = timed(lambda: ics_module.get_events(ics_url, start, end, cfg.DISPLAY_TZ))
+        results["get_events_warm"].append(seconds)
+
+        _, seconds = timed(
+            lambda: render_helper.render_html(
+                render_helper.get_template_params(current_time, *weather, events)
+            )
+        )
+        results["render_html"].append(seconds)
+
+    # Tracing allocations slows everything down, so the peak memory is measured in a separate run
+    tracemalloc.start()
+    IcsModule(min_refresh="0").get_events(ics_url, start, end, cfg.DISPLAY_TZ)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "vevents": sum(count for _, count in SCENARIOS[name]),
+        "feed_mb": round(sum(len(body) for body in bodies) / 1e6, 2),
+        "days_with_events": len(events),
+        **{f"{key}_seconds": round(statistics.median(v), 4) for key, v in results.items()},
+        "peak_memory_mb": round(peak / 1e6, 2),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for name, results in current["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        print(f"  {name}")
+        for key, value in results.items():
+            old = previous.get(key)
+            if not (key.endswith("_seconds") or key.endswith("_mb")) or not old:
+                continue
+            change = (value - old) / old * 100
+            print(f"    {key:<32} {old:>10} -> {value:>10} ({change:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per scenario, the median is reported"
+    )
+    parser.add_argument("--days", type=int, default=30, help="length of the query window")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    parser.add_argument("--compare", help="results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(
+            f"unknown scenarios {', '.join(unknown)}, available are {', '.join(SCENARIOS)}"
+        )
+
+    server = fixtures.StubServer()
+    server.start()
+    one_call_url = server.add_one_call(fixtures.generate_one_call(dt.date.today()))
+    cfg = DashboardConfig(
+        {
+            "ICS_URL": f"{server.url}/unused.ics",
+            "OWM_API_KEY": "benchmark",
+            "LAT": "37.77",
+            "LNG": "-122.42",
+            "NUM_CAL_DAYS_TO_QUERY": str(args.days),
+        }
+    )
+
+    results: Dict[str, Any] = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "repeat": args.repeat,
+        "days": args.days,
+        "scenarios": {},
+    }
+    try:
+        with patch("owm.owm.ONE_CALL_URL", one_call_url):
+            for name in names:
+                scenario = run_scenario(server, name, cfg, args.repeat)
+                results["scenarios"][name] = scenario
+                print(
+                    f"{name:>12}: {scenario['vevents']} VEVENTs, "
+                    f"get_events {scenario['get_events_cold_seconds']}s cold / "
+                    f"{scenario['get_events_warm_seconds']}s warm, "
+                    f"render_html {scenario['render_html_seconds']}s, "
+                    f"peak memory {scenario['peak_memory_mb']} MB"
+                )
+    finally:
+        server.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
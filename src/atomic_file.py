@@ -0,0 +1,25 @@
+"""
+This writes cache files atomically: the data goes to a temporary file in the same directory first, which then replaces
+the target, so that a crash never leaves a half-written file behind and readers in other processes see either the old
+or the new content.
+"""
+
+import os
+import tempfile
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replaces the file at path with data, raises OSError if it can't be written."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".tmp", delete=False) as f:
+        try:
+            f.write(data)
+        except OSError:
+            f.close()
+            os.remove(f.name)
+            raise
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.remove(f.name)
+        raise
@@ -1,48 +1,97 @@
 import os
+import re
 import sys
-from typing import Optional
+import tempfile
+import tomllib
+from enum import Enum
+from typing import Any, Dict, Mapping, Optional
 
 import structlog
 
 from owm.owm import WeatherUnits
+from render.encode import Dither, OutputMode
 
 logger = structlog.get_logger()
 
 _current_config: Optional["DashboardConfig"] = None
 
+DEFAULT_PROFILE = "default"
+PROFILE_NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+# Path segments under /image that can't be used as profile names
+RESERVED_PROFILE_NAMES = {DEFAULT_PROFILE, "etag"}
+
+
+class RenderBackend(str, Enum):
+    chrome = "chrome"
+    pillow = "pillow"
+
 
 class DashboardConfig:
-    def __init__(self) -> None:
-        ics_url = os.getenv("ICS_URL")
+    def __init__(self, env: Optional[Mapping[str, str]] = None) -> None:
+        env = os.environ if env is None else env
+
+        ics_url = env.get("ICS_URL")
         if not ics_url:
             logger.error("ICS_URL needs to be set.")
             sys.exit(1)
         self.ICS_URL: str = ics_url
 
-        owm_api_key = os.getenv("OWM_API_KEY")
+        owm_api_key = env.get("OWM_API_KEY")
         if not owm_api_key:
             logger.error("OWM_API_KEY needs to be set.")
             sys.exit(1)
         self.OWM_API_KEY: str = owm_api_key
 
-        if os.getenv("LAT") and os.getenv("LNG"):
-            self.LAT: float = float(os.getenv("LAT"))
-            self.LNG: float = float(os.getenv("LNG"))
+        if env.get("LAT") and env.get("LNG"):
+            self.LAT: float = float(env.get("LAT"))
+            self.LNG: float = float(env.get("LNG"))
         else:
             logger.error("LAT and LNG need to be set.")
             sys.exit(1)
 
-        self.DISPLAY_TZ: str = os.getenv("DISPLAY_TZ", "America/Los_Angeles")
-        self.IMAGE_HEIGHT: int = int(os.getenv("IMAGE_HEIGHT", "825"))
-        self.IMAGE_WIDTH: int = int(os.getenv("IMAGE_WIDTH", "1200"))
-        self.NUM_CAL_DAYS_TO_QUERY: int = int(os.getenv("NUM_CAL_DAYS_TO_QUERY", "30"))
+        self.CHROME_MAX_AGE_MINUTES: int = int(env.get("CHROME_MAX_AGE_MINUTES", "60"))
+        self.CHROME_MAX_RENDERS: int = int(env.get("CHROME_MAX_RENDERS", "50"))
+        self.CHROME_POOL_SIZE: int = int(env.get("CHROME_POOL_SIZE", "1"))
+        self.DATA_RETRIEVAL_TIMEOUT: float = float(env.get("DATA_RETRIEVAL_TIMEOUT", "30"))
+        self.DITHER: Dither = Dither(env.get("DITHER", "floyd-steinberg"))
+        self.DISPLAY_TZ: str = env.get("DISPLAY_TZ", "America/Los_Angeles")
+        self.ICS_CACHE_DIR: str = env.get(
+            "ICS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ics-cache")
+        )
+        self.ICS_CALENDAR_CACHE_MB: int = int(env.get("ICS_CALENDAR_CACHE_MB", "64"))
+        self.ICS_MIN_REFRESH_SECONDS: str = env.get("ICS_MIN_REFRESH_SECONDS", "60")
+        self.ICS_STREAMING: bool = env.get("ICS_STREAMING", "False").lower() == "true"
+        self.ICS_TIMEOUT: str = env.get("ICS_TIMEOUT", "10")
+        self.IMAGE_HEIGHT: int = int(env.get("IMAGE_HEIGHT", "825"))
+        self.IMAGE_WIDTH: int = int(env.get("IMAGE_WIDTH", "1200"))
+        self.NUM_CAL_DAYS_TO_DISPLAY: int = int(env.get("NUM_CAL_DAYS_TO_DISPLAY", "0"))
+        self.NUM_CAL_DAYS_TO_QUERY: int = int(env.get("NUM_CAL_DAYS_TO_QUERY", "30"))
+        self.OUTPUT_MODE: OutputMode = OutputMode(env.get("OUTPUT_MODE", "color"))
+        self.OWM_CACHE_FILE: str = env.get(
+            "OWM_CACHE_FILE", os.path.join(tempfile.gettempdir(), "owm-cache.json")
+        )
+        self.OWM_CACHE_TTL_MINUTES: float = float(env.get("OWM_CACHE_TTL_MINUTES", "10"))
+        self.PRERENDER: bool = env.get("PRERENDER", "False").lower() == "true"
+        self.PRERENDER_LEAD_SECONDS: int = int(env.get("PRERENDER_LEAD_SECONDS", "60"))
+        self.PRERENDER_SCHEDULE: str = env.get("PRERENDER_SCHEDULE", "")
+        self.PROFILING_DIR: str = env.get(
+            "PROFILING_DIR", os.path.join(tempfile.gettempdir(), "profiles")
+        )
+        self.PROFILING_RETENTION: int = int(env.get("PROFILING_RETENTION", "20"))
+        self.PROFILING_SAMPLE_RATE: int = int(env.get("PROFILING_SAMPLE_RATE", "0"))
+        self.PROFILING_TOKEN: str = env.get("PROFILING_TOKEN", "")
+        self.PROFILES_FILE: str = env.get("PROFILES_FILE", "")
+        self.RENDER_BACKEND: RenderBackend = RenderBackend[env.get("RENDER_BACKEND", "chrome")]
+        self.RENDER_TIMEOUT: float = float(env.get("RENDER_TIMEOUT", "5"))
+        self.SHARED_CACHE_DIR: str = env.get("SHARED_CACHE_DIR", "")
         self.SHOW_ADDITIONAL_WEATHER: bool = (
-            os.getenv("SHOW_ADDITIONAL_WEATHER", "False").lower() == "true"
+            env.get("SHOW_ADDITIONAL_WEATHER", "False").lower() == "true"
         )
-        self.SHOW_CALENDAR_NAME: bool = os.getenv("SHOW_CALENDAR_NAME", "False").lower() == "true"
-        self.SHOW_MOON_PHASE: bool = os.getenv("SHOW_MOON_PHASE", "False").lower() == "true"
-        self.USE_24H_FORMAT: bool = os.getenv("USE_24H_FORMAT", "True").lower() == "true"
-        self.WEATHER_UNITS: WeatherUnits = WeatherUnits[os.getenv("WEATHER_UNITS", "metric")]
+        self.SHOW_CALENDAR_NAME: bool = env.get("SHOW_CALENDAR_NAME", "False").lower() == "true"
+        self.SHOW_MOON_PHASE: bool = env.get("SHOW_MOON_PHASE", "False").lower() == "true"
+        self.TEMPLATE_AUTO_RELOAD: bool = env.get("TEMPLATE_AUTO_RELOAD", "False").lower() == "true"
+        self.USE_24H_FORMAT: bool = env.get("USE_24H_FORMAT", "True").lower() == "true"
+        self.WEATHER_UNITS: WeatherUnits = WeatherUnits[env.get("WEATHER_UNITS", "metric")]
 
     @classmethod
     def get_config(cls) -> "DashboardConfig":
@@ -50,3 +99,31 @@ class DashboardConfig:
         if _current_config is None:
             _current_config = DashboardConfig()
         return _current_config
+
+
+def format_profile_value(value: Any) -> str:
+    """Converts a TOML value into the string it would have as environment variable."""
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, list):
+        return "|".join(str(v) for v in value)
+    return str(value)
+
+
+def load_profiles(path: str, env: Optional[Mapping[str, str]] = None) -> Dict[str, DashboardConfig]:
+    """
+    Loads the dashboard profiles from a TOML file with one [profiles.<name>] table per dashboard. Profiles use the
+    same keys as the environment variables and fall back to the environment for everything they don't set.
+    """
+
+    env = os.environ if env is None else env
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+
+    profiles: Dict[str, DashboardConfig] = {}
+    for name, values in data.get("profiles", {}).items():
+        if not PROFILE_NAME_PATTERN.fullmatch(name) or name in RESERVED_PROFILE_NAMES:
+            raise ValueError(f"Invalid profile name {name}")
+        profile_env = {**env, **{k: format_profile_value(v) for k, v in values.items()}}
+        profiles[name] = DashboardConfig(profile_env)
+    return profiles
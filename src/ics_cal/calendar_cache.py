@@ -0,0 +1,215 @@
+"""
+This keeps parsed calendars and their expanded occurrences in memory, keyed by a hash of the feed content, so that
+unchanged feeds are neither parsed nor expanded again. When the query window slides forward, only the newly exposed
+part of the window is expanded and occurrences that ended before it are dropped. The occurrences converted to the
+display time zone and sorted by start are kept until the next expansion, so that requests for unchanged feeds only
+walk them until enough days are filled. Entries are evicted least recently used once their estimated memory use
+exceeds the limit.
+"""
+
+import collections
+import datetime as dt
+import hashlib
+import operator
+import threading
+from typing import Any, Dict, List, Optional, OrderedDict, Tuple
+
+import icalendar
+import pytz
+import recurring_ical_events
+
+from metrics import time_stage
+
+# Estimated memory use of the parsed component tree per byte of feed content, of each expanded occurrence and of each
+# occurrence converted to a time zone, measured with tracemalloc for synthetic feeds with single, recurring, multi-day
+# and time zone events
+PARSED_BYTES_PER_BYTE = 40
+OCCURRENCE_BYTES = 4500
+LOCALIZED_OCCURRENCE_BYTES = 200
+# Occurrences are kept for a day before the window start, so that windows starting at midnight in different time
+# zones share them and dates without a time zone are never dropped too early
+PRUNE_SLACK = dt.timedelta(days=1)
+
+
+def get_occurrence_key(event: icalendar.Event) -> Tuple[str, Any]:
+    """Identifies an occurrence, expanded occurrences of a recurring event share the UID but not the start."""
+    start = event.get("DTSTART")
+    return str(event.get("UID", event.get("SUMMARY"))), start.dt if start is not None else None
+
+
+# Start and end in the display time zone and the occurrence
+LocalizedOccurrence = Tuple[dt.datetime, dt.datetime, icalendar.Event]
+
+
+def localize_occurrence(
+    event: icalendar.Event, local_timezone: pytz.BaseTzInfo
+) -> LocalizedOccurrence:
+    event_start = event.get("DTSTART").dt
+    event_end = event.get("DTEND").dt
+
+    if isinstance(event_start, dt.datetime):
+        start_datetime = event_start.astimezone(local_timezone)
+        end_datetime = event_end.astimezone(local_timezone)
+    elif isinstance(event_start, dt.date):
+        # Convert date into datetime at midnight
+        start_datetime = local_timezone.localize(dt.datetime.combine(event_start, dt.time(0, 0, 0)))
+        end_datetime = local_timezone.localize(
+            dt.datetime.combine(event_end, dt.time(0, 0, 0))
+        ) - dt.timedelta(seconds=1)
+    else:
+        raise TypeError(f"Unknown type {type(event_start)} for DTSTART")
+    return start_datetime, end_datetime, event
+
+
+def ends_before(event: icalendar.Event, start: dt.datetime) -> bool:
+    end = event.get("DTEND", event.get("DTSTART"))
+    if end is None:
+        return False
+    value = end.dt
+    if not isinstance(value, dt.datetime):
+        value = dt.datetime.combine(value, dt.time(0, 0, 0))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=start.tzinfo)
+    return value < start
+
+
+class CachedCalendar:
+    def __init__(self, body: str) -> None:
+        with time_stage("ics_parse"):
+            self.calendar = icalendar.Calendar.from_ical(body)
+        self.name: Optional[str] = self.calendar.get("X-WR-CALNAME", None)
+        self.parsed_size = len(body) * PARSED_BYTES_PER_BYTE
+        self._query = recurring_ical_events.of(self.calendar)
+        self._lock = threading.Lock()
+        self._window: Optional[Tuple[dt.datetime, dt.datetime]] = None
+        self._occurrences: Dict[Tuple[str, Any], icalendar.Event] = {}
+        # Time zone name to the localized occurrences sorted by start, cleared whenever the occurrences change
+        self._localized: Dict[str, List[LocalizedOccurrence]] = {}
+
+    @property
+    def size(self) -> int:
+        """Estimated memory use in bytes, which grows with the expanded occurrences."""
+        # Locked because other threads replace and fill the occurrences while expanding
+        with self._lock:
+            occurrences = len(self._occurrences)
+            localized = sum(len(occurrences) for occurrences in self._localized.values())
+        return (
+            self.parsed_size
+            + occurrences * OCCURRENCE_BYTES
+            + localized * LOCALIZED_OCCURRENCE_BYTES
+        )
+
+    def _expand(self, start: dt.datetime, end: dt.datetime) -> None:
+        with time_stage("recurrence_expansion"):
+            for event in self._query.between(start, end):
+                self._occurrences.setdefault(get_occurrence_key(event), event)
+        self._localized = {}
+
+    def _prune(self, start: dt.datetime) -> None:
+        self._occurrences = {
+            key: event for key, event in self._occurrences.items() if not ends_before(event, start)
+        }
+        self._localized = {}
+
+    def _update_window(self, start: dt.datetime, end: dt.datetime) -> None:
+        if self._window is None:
+            self._expand(start, end)
+            self._window = (start, end)
+        else:
+            cached_start, cached_end = self._window
+            # Start over if the window moved backwards or jumped ahead
+            if start < cached_start or start > cached_end:
+                self._occurrences = {}
+                self._expand(start, end)
+                self._window = (start, end)
+            else:
+                if end > cached_end:
+                    self._expand(cached_end, end)
+                    cached_end = end
+                if start - cached_start > PRUNE_SLACK:
+                    cached_start = start - PRUNE_SLACK
+                    self._prune(cached_start)
+                self._window = (cached_start, cached_end)
+
+    def between(
+        self, start: dt.datetime, end: dt.datetime, local_timezone: pytz.BaseTzInfo
+    ) -> List[LocalizedOccurrence]:
+        """
+        Returns the occurrences between start and end converted to the time zone and sorted by start. They are
+        converted and sorted once per expansion, unchanged feeds reuse them. The result can include occurrences
+        shortly before start that were expanded for an earlier window, callers filter by their own window anyway.
+        """
+
+        # Expanding and converting happen under one lock, so that a concurrent request for another window can't
+        # replace the occurrences in between
+        with self._lock:
+            self._update_window(start, end)
+            occurrences = self._localized.get(local_timezone.zone)
+            if occurrences is None:
+                with time_stage("recurrence_expansion"):
+                    occurrences = sorted(
+                        (
+                            localize_occurrence(e, local_timezone)
+                            for e in self._occurrences.values()
+                        ),
+                        key=operator.itemgetter(0),
+                    )
+                self._localized[local_timezone.zone] = occurrences
+            return occurrences
+
+
+class CalendarCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._calendars: OrderedDict[str, CachedCalendar] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, body: str) -> CachedCalendar:
+        """Returns the parsed calendar for the feed content, raises ValueError if it can't be parsed."""
+        key = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        with self._lock:
+            calendar = self._calendars.get(key)
+            if calendar is not None:
+                self._calendars.move_to_end(key)
+                self.hits += 1
+                return calendar
+            self.misses += 1
+
+        calendar = CachedCalendar(body)
+        with self._lock:
+            self._calendars.setdefault(key, calendar)
+        self.evict()
+        return calendar
+
+    def evict(self) -> None:
+        """
+        Evicts the least recently used calendars until the estimated memory use is within the limit. Called again
+        after expanding occurrences, which makes the calendars grow.
+        """
+
+        # Sized outside the lock, reading the size waits for expansions in progress
+        sizes = self._get_sizes()
+        with self._lock:
+            # Calendars added in the meantime haven't been expanded yet
+            total = sum(sizes.get(key, c.parsed_size) for key, c in self._calendars.items())
+            # Always keep the newest calendar, even if it is larger than the limit on its own
+            while total > self.max_bytes and len(self._calendars) > 1:
+                key, evicted = self._calendars.popitem(last=False)
+                total -= sizes.get(key, evicted.parsed_size)
+
+    def _get_sizes(self) -> Dict[str, int]:
+        with self._lock:
+            calendars = list(self._calendars.items())
+        return {key: calendar.size for key, calendar in calendars}
+
+    def get_stats(self) -> Dict[str, Any]:
+        sizes = self._get_sizes()
+        with self._lock:
+            return {
+                "calendars": len(sizes),
+                "bytes": sum(sizes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,68 @@
+"""
+This is the calendar event passed from the ICS module to the rendering. Days of multi-day events are views that
+reference the event instead of copying it.
+"""
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import Optional, Union
+
+
+def combine(date: dt.date, time: dt.time, tzinfo: Optional[dt.tzinfo]) -> dt.datetime:
+    """Like datetime.combine, but localizes with pytz time zones so that the offset on that date is used."""
+    if tzinfo is not None and hasattr(tzinfo, "localize"):
+        return tzinfo.localize(dt.datetime.combine(date, time))
+    return dt.datetime.combine(date, time, tzinfo)
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    summary: str
+    start_datetime: dt.datetime
+    end_datetime: dt.datetime
+    calendar_name: Optional[str] = None
+    location: Optional[str] = None
+
+    @property
+    def is_multiday(self) -> bool:
+        return self.start_datetime.date() != self.end_datetime.date()
+
+
+@dataclass(frozen=True, slots=True)
+class EventDay:
+    """One day of a multi-day event, starting at midnight and ending before midnight except on its first and last day."""
+
+    event: Event
+    date: dt.date
+
+    @property
+    def summary(self) -> str:
+        return self.event.summary
+
+    @property
+    def calendar_name(self) -> Optional[str]:
+        return self.event.calendar_name
+
+    @property
+    def location(self) -> Optional[str]:
+        return self.event.location
+
+    @property
+    def is_multiday(self) -> bool:
+        return True
+
+    @property
+    def start_datetime(self) -> dt.datetime:
+        if self.date == self.event.start_datetime.date():
+            return self.event.start_datetime
+        return combine(self.date, dt.time(0, 0, 0), self.event.start_datetime.tzinfo)
+
+    @property
+    def end_datetime(self) -> dt.datetime:
+        if self.date == self.event.end_datetime.date():
+            return self.event.end_datetime
+        return combine(self.date, dt.time(23, 59, 59), self.event.end_datetime.tzinfo)
+
+
+# An event as listed for a day of the calendar
+DayEvent = Union[Event, EventDay]
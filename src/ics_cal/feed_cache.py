@@ -0,0 +1,200 @@
+"""
+This keeps the raw body of every ICS feed together with its ETag and Last-Modified header, so that feeds can be
+requested conditionally and an unchanged calendar doesn't need to be downloaded again. The cache lives in memory and,
+if a directory is configured, on disk so that it survives restarts and can stand in when a feed is briefly down.
+With a shared cache, feeds downloaded by other workers of the same server are picked up as well.
+
+The body and the metadata are stored separately, so that revalidating an unchanged feed only rewrites the small
+metadata. Feed URLs often contain secret tokens and are therefore never written, files and shared entries are named
+after a hash of the URL.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from typing import Any, ContextManager, Dict, NamedTuple, Optional
+
+import structlog
+
+from atomic_file import atomic_write
+from shared_cache import SharedCache
+
+
+class CachedFeed(NamedTuple):
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+def get_body_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class FeedCache:
+    def __init__(
+        self, cache_dir: Optional[str] = None, shared_cache: Optional[SharedCache] = None
+    ) -> None:
+        self.logger = structlog.get_logger()
+        self.cache_dir = cache_dir
+        self.shared_cache = shared_cache
+        self._lock = threading.Lock()
+        self._feeds: Dict[str, CachedFeed] = {}
+        # Hash of the body of each feed, to tell whether metadata written elsewhere refers to the same body
+        self._body_hashes: Dict[str, str] = {}
+        # When the shared metadata of each feed was last stored, to only read it again once it changed
+        self._shared_at: Dict[str, float] = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get_path(self, url: str, suffix: str = ".json") -> str:
+        """Returns the path of the metadata (.json) or body (.ics) file of the feed."""
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + suffix
+        )
+
+    def lock(self, url: str) -> ContextManager[None]:
+        """Lets only one worker at a time refresh the feed if the cache is shared."""
+        if self.shared_cache is None:
+            return contextlib.nullcontext()
+        return self.shared_cache.lock(f"ics:{url}")
+
+    def _remember(self, url: str, feed: CachedFeed, body_hash: str) -> None:
+        with self._lock:
+            self._feeds[url] = feed
+            self._body_hashes[url] = body_hash
+
+    def _get_body(self, url: str, body_hash: str) -> Optional[str]:
+        """Returns the body with the hash from memory if it is unchanged, otherwise None."""
+        with self._lock:
+            feed = self._feeds.get(url)
+            if feed is not None and self._body_hashes.get(url) == body_hash:
+                return feed.body
+        return None
+
+    def _get_shared(self, url: str) -> Optional[CachedFeed]:
+        with self._lock:
+            shared_at = self._shared_at.get(url, 0.0)
+        entry = self.shared_cache.get(f"ics-meta:{url}", newer_than=shared_at)
+        if entry is None:
+            return None
+        try:
+            metadata = json.loads(entry.data)
+            body_hash = metadata["body_hash"]
+            body = self._get_body(url, body_hash)
+            if body is None:
+                # Only read the body if another worker downloaded a different one
+                body_entry = self.shared_cache.get(f"ics:{url}", version=body_hash)
+                if body_entry is None:
+                    return None
+                body = body_entry.data.decode("utf-8")
+            feed = CachedFeed(
+                body, metadata["etag"], metadata["last_modified"], metadata["fetched_at"]
+            )
+        except (ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable shared ICS cache entry: {e}")
+            return None
+
+        self._remember(url, feed, body_hash)
+        with self._lock:
+            self._shared_at[url] = entry.stored_at
+        return feed
+
+    def _get_file(self, url: str) -> Optional[CachedFeed]:
+        try:
+            with open(self.get_path(url), encoding="utf-8") as f:
+                metadata = json.load(f)
+            body_hash = metadata["body_hash"]
+            body = self._get_body(url, body_hash)
+            if body is None:
+                with open(self.get_path(url, ".ics"), encoding="utf-8") as f:
+                    body = f.read()
+                if get_body_hash(body) != body_hash:
+                    raise ValueError("Body doesn't match the metadata")
+            feed = CachedFeed(
+                body, metadata["etag"], metadata["last_modified"], metadata["fetched_at"]
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable ICS cache file: {e}")
+            return None
+
+        self._remember(url, feed, body_hash)
+        return feed
+
+    def get(self, url: str) -> Optional[CachedFeed]:
+        if self.shared_cache is not None:
+            feed = self._get_shared(url)
+            if feed is not None:
+                return feed
+
+        with self._lock:
+            feed = self._feeds.get(url)
+        if feed is not None or not self.cache_dir:
+            return feed
+        return self._get_file(url)
+
+    def put(self, url: str, feed: CachedFeed) -> None:
+        """Stores a downloaded feed including its body."""
+        body_hash = get_body_hash(feed.body)
+        self._remember(url, feed, body_hash)
+        body = feed.body.encode("utf-8")
+        if self.shared_cache is not None:
+            self.shared_cache.put(f"ics:{url}", body, version=body_hash)
+        if self.cache_dir:
+            self._write(self.get_path(url, ".ics"), body)
+        # The metadata is written after the body, so that it never refers to a body that isn't there yet
+        self._put_metadata(url, feed, body_hash)
+
+    def touch(
+        self,
+        url: str,
+        fetched_at: float,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Optional[CachedFeed]:
+        """
+        Marks an unchanged feed as fetched again and updates the validators if the server sent new ones, without
+        writing the body again. Returns the updated feed, or None if the feed isn't cached.
+        """
+
+        with self._lock:
+            feed = self._feeds.get(url)
+            body_hash = self._body_hashes.get(url)
+        if feed is None or body_hash is None:
+            return None
+        feed = feed._replace(
+            fetched_at=fetched_at,
+            etag=etag or feed.etag,
+            last_modified=last_modified or feed.last_modified,
+        )
+        self._remember(url, feed, body_hash)
+        self._put_metadata(url, feed, body_hash)
+        return feed
+
+    def _put_metadata(self, url: str, feed: CachedFeed, body_hash: str) -> None:
+        if self.shared_cache is None and not self.cache_dir:
+            return
+        metadata: Dict[str, Any] = {
+            "etag": feed.etag,
+            "last_modified": feed.last_modified,
+            "fetched_at": feed.fetched_at,
+            "body_hash": body_hash,
+        }
+        data = json.dumps(metadata).encode("utf-8")
+        if self.shared_cache is not None:
+            stored_at = self.shared_cache.put(f"ics-meta:{url}", data)
+            if stored_at is not None:
+                with self._lock:
+                    self._shared_at[url] = stored_at
+        if self.cache_dir:
+            self._write(self.get_path(url), data)
+
+    def _write(self, path: str, data: bytes) -> None:
+        try:
+            atomic_write(path, data)
+        except OSError as e:
+            self.logger.warning(f"Could not write ICS cache file: {e}")
@@ -1,88 +1,273 @@
 """
-This is where we retrieve events from an ICS calendar.
+This is where we retrieve events from an ICS calendar. Multiple calendar feeds are downloaded concurrently through a
+shared keep-alive session, so the total download time is close to that of the slowest feed. Feeds are requested
+conditionally and unchanged or unreachable feeds are served from the feed cache, and unchanged feeds are neither parsed
+nor expanded again thanks to the calendar cache. In streaming mode, feeds are instead read line by line and events
+outside the query window are dropped before parsing, see ics_cal.stream.
 """
 
+import bisect
 import datetime as dt
-from typing import Any, Dict, List
+import hashlib
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-import icalendar
 import pytz
-import recurring_ical_events
 import requests
 import structlog
+from requests.adapters import HTTPAdapter
+
+from ics_cal.calendar_cache import CachedCalendar, CalendarCache, LocalizedOccurrence
+from ics_cal.event import DayEvent, Event, EventDay
+from ics_cal.feed_cache import CachedFeed, FeedCache
+from ics_cal.stream import filter_calendar
+from metrics import ics_fetch_results, ics_fetch_seconds, time_stage
+from shared_cache import SharedCache
+from singleflight import SingleFlight
+
+DEFAULT_TIMEOUT = 10.0
+# Upper bound for concurrent feed downloads and pooled connections per host
+MAX_WORKERS = 8
+
+
+def parse_per_feed(value: str, count: int, default: float) -> List[float]:
+    """
+    Parses per-feed settings like the timeouts "10|30|5", in the same order as the ICS URLs. A single value applies
+    to every feed, empty values use the default and missing values are filled up with the last one.
+    """
+
+    values = [float(v) if v.strip() else default for v in value.split("|")]
+    return (values + values[-1:] * count)[:count]
+
+
+def get_feed_id(ics_url: str) -> str:
+    """Identifies a feed in the metrics without exposing its URL, which often contains a secret."""
+    return hashlib.sha256(ics_url.encode("utf-8")).hexdigest()[:8]
 
 
 class IcsModule:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        timeout: str = str(DEFAULT_TIMEOUT),
+        min_refresh: str = "0",
+        cache_dir: Optional[str] = None,
+        calendar_cache_bytes: int = 64 * 1024 * 1024,
+        streaming: bool = False,
+        shared_cache: Optional[SharedCache] = None,
+    ) -> None:
         self.logger = structlog.get_logger()
+        self.timeout = timeout
+        self.min_refresh = min_refresh
+        self.feed_cache = FeedCache(cache_dir, shared_cache)
+        self.calendar_cache = CalendarCache(calendar_cache_bytes)
+        self.streaming = streaming
+        self.download_flight: SingleFlight[Optional[CachedCalendar]] = SingleFlight()
 
-    def _retrieve_events(
-        self,
-        ics_url: str,
-        calStartDatetime: dt.datetime,
-        calEndDatetime: dt.datetime,
-        localTZ: str,
-    ) -> List[Dict[str, Any]]:
-        # Call the ICS calendar and return a list of events that fall within the specified dates
-        event_list = []
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
-        self.logger.info("Retrieving events from ICS...")
-        ics_urls = ics_url.split("|")
-        for ics_url in ics_urls:
-            try:
-                response = requests.get(ics_url, timeout=10)
-                response.raise_for_status()
-                cal = icalendar.Calendar.from_ical(response.text)
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"Error downloading ICS: {e}")
-                continue
-            except ValueError as e:
-                self.logger.error(f"Error parsing ICS: {e}")
-                continue
+    def _fetch_feed(self, ics_url: str, timeout: float, min_refresh: float) -> Optional[str]:
+        # With a shared cache, workers wait for the one downloading the feed and then reuse its copy
+        with self.feed_cache.lock(ics_url):
+            return self._timed_fetch(
+                ics_url, lambda: self._refresh_feed(ics_url, timeout, min_refresh)
+            )
 
-            cal_name = cal.get("X-WR-CALNAME", None)
+    def _timed_fetch(
+        self, ics_url: str, fetch: Callable[[], Tuple[Optional[str], str]]
+    ) -> Optional[str]:
+        feed_id = get_feed_id(ics_url)
+        start_time = time.perf_counter()
+        with time_stage("ics_fetch"):
+            body, result = fetch()
+        ics_fetch_seconds.observe(time.perf_counter() - start_time, feed=feed_id)
+        ics_fetch_results.inc(feed=feed_id, result=result)
+        return body
 
-            events = recurring_ical_events.of(cal).between(calStartDatetime, calEndDatetime)
-            local_timezone = pytz.timezone(localTZ)
+    def _refresh_feed(
+        self, ics_url: str, timeout: float, min_refresh: float
+    ) -> Tuple[Optional[str], str]:
+        """Returns the body of the feed and whether it was fresh, not_modified, downloaded, cached or failed."""
+        cached = self.feed_cache.get(ics_url)
+        if cached is not None and time.time() - cached.fetched_at < min_refresh:
+            return cached.body, "fresh"
 
-            for event in events:
-                new_event: Dict[str, Any] = {"summary": str(event.get("SUMMARY"))}
-
-                if "LOCATION" in event:
-                    new_event["location"] = str(event.get("LOCATION"))
-
-                event_start = event.get("DTSTART").dt
-                event_end = event.get("DTEND").dt
-
-                if isinstance(event_start, dt.datetime):
-                    new_event["startDatetime"] = event_start.astimezone(local_timezone)
-                    new_event["endDatetime"] = event_end.astimezone(local_timezone)
-                elif isinstance(event_start, dt.date):
-                    # Convert date into datetime at midnight
-                    new_event["startDatetime"] = local_timezone.localize(
-                        dt.datetime.combine(event_start, dt.time(0, 0, 0))
-                    )
-                    new_event["endDatetime"] = local_timezone.localize(
-                        dt.datetime.combine(event_end, dt.time(0, 0, 0))
-                    ) - dt.timedelta(seconds=1)
-                else:
-                    raise TypeError(f"Unknown type {type(event_start)} for DTSTART")
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            response = self.session.get(ics_url, timeout=timeout, headers=headers)
+            if response.status_code == 304 and cached is not None:
+                # Only the metadata is written again, the body is unchanged
+                self.feed_cache.touch(
+                    ics_url,
+                    time.time(),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
+                return cached.body, "not_modified"
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if cached is not None:
+                self.logger.warning(f"Error downloading ICS, using cached copy: {e}")
+                return cached.body, "cached"
+            self.logger.error(f"Error downloading ICS: {e}")
+            return None, "failed"
+
+        self.feed_cache.put(
+            ics_url,
+            CachedFeed(
+                response.text,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                time.time(),
+            ),
+        )
+        return response.text, "downloaded"
+
+    def _stream_feed(
+        self, ics_url: str, timeout: float, start: dt.datetime, end: dt.datetime
+    ) -> Optional[str]:
+        return self._timed_fetch(ics_url, lambda: self._filter_feed(ics_url, timeout, start, end))
+
+    def _filter_feed(
+        self, ics_url: str, timeout: float, start: dt.datetime, end: dt.datetime
+    ) -> Tuple[Optional[str], str]:
+        # The full feed is never held in memory, so it can't be cached or requested conditionally
+        try:
+            with self.session.get(ics_url, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                if "charset" not in response.headers.get("Content-Type", ""):
+                    response.encoding = "utf-8"
+                body = filter_calendar(response.iter_lines(decode_unicode=True), start, end)
+                return body, "downloaded"
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Error downloading ICS: {e}")
+            return None, "failed"
 
-                new_event["isMultiday"] = (
-                    new_event["startDatetime"].date() != new_event["endDatetime"].date()
+    def _download_calendar(
+        self,
+        ics_url: str,
+        timeout: float,
+        min_refresh: float,
+        start: dt.datetime,
+        end: dt.datetime,
+    ) -> Optional[CachedCalendar]:
+        if self.streaming:
+            body = self._stream_feed(ics_url, timeout, start, end)
+        else:
+            body = self._fetch_feed(ics_url, timeout, min_refresh)
+        if body is None:
+            return None
+        try:
+            return self.calendar_cache.get(body)
+        except ValueError as e:
+            self.logger.error(f"Error parsing ICS: {e}")
+            return None
+
+    def _download_shared_calendar(
+        self,
+        ics_url: str,
+        timeout: float,
+        min_refresh: float,
+        start: dt.datetime,
+        end: dt.datetime,
+    ) -> Optional[CachedCalendar]:
+        # Dashboards sharing a feed join the download in flight, streamed feeds also depend on the window
+        key = (ics_url, start, end) if self.streaming else ics_url
+        return self.download_flight.do(
+            key, lambda: self._download_calendar(ics_url, timeout, min_refresh, start, end)
+        )
+
+    def _download_calendars(
+        self,
+        ics_urls: List[str],
+        start: dt.datetime,
+        end: dt.datetime,
+        timeout: Optional[str] = None,
+        min_refresh: Optional[str] = None,
+    ) -> List[Optional[CachedCalendar]]:
+        start_time = time.time()
+        timeouts = parse_per_feed(timeout or self.timeout, len(ics_urls), DEFAULT_TIMEOUT)
+        min_refreshes = parse_per_feed(min_refresh or self.min_refresh, len(ics_urls), 0)
+        with ThreadPoolExecutor(
+            max_workers=min(len(ics_urls), MAX_WORKERS), thread_name_prefix="ics"
+        ) as executor:
+            calendars = list(
+                executor.map(
+                    self._download_shared_calendar,
+                    ics_urls,
+                    timeouts,
+                    min_refreshes,
+                    itertools.repeat(start),
+                    itertools.repeat(end),
                 )
+            )
+        self.logger.info(
+            f"Downloaded {len(ics_urls)} ICS feed(s) in {round(time.time() - start_time, 3)} seconds."
+        )
+        return calendars
 
-                if (
-                    new_event["endDatetime"] >= calStartDatetime
-                    and new_event["startDatetime"] < calEndDatetime
-                ):
+    def _feed_events(
+        self,
+        cal: CachedCalendar,
+        occurrences: List[LocalizedOccurrence],
+        calStartDatetime: dt.datetime,
+        calEndDatetime: dt.datetime,
+    ) -> Iterator[Event]:
+        """Yields the events of one calendar ordered by start, building each event only when it is reached."""
+        for start_datetime, end_datetime, event in occurrences:
+            if start_datetime >= calEndDatetime:
+                break
+            if end_datetime >= calStartDatetime:
+                yield Event(
+                    summary=str(event.get("SUMMARY")),
                     # Don't show past days for ongoing multiday event
-                    new_event["startDatetime"] = max(new_event["startDatetime"], calStartDatetime)
-                    new_event["calendarName"] = cal_name
+                    start_datetime=max(start_datetime, calStartDatetime),
+                    end_datetime=end_datetime,
+                    calendar_name=cal.name,
+                    location=str(event.get("LOCATION")) if "LOCATION" in event else None,
+                )
 
-                    event_list.append(new_event)
+    def _retrieve_events(
+        self,
+        ics_url: str,
+        calStartDatetime: dt.datetime,
+        calEndDatetime: dt.datetime,
+        localTZ: str,
+        timeout: Optional[str] = None,
+        min_refresh: Optional[str] = None,
+    ) -> Iterator[Event]:
+        # Call the ICS calendar and return the events that fall within the specified dates, ordered by start
+        self.logger.info("Retrieving events from ICS...")
+        calendars = self._download_calendars(
+            ics_url.split("|"), calStartDatetime, calEndDatetime, timeout, min_refresh
+        )
+        local_timezone = pytz.timezone(localTZ)
+        # Expanded and converted up front so that the time spent on recurrences isn't attributed to grouping the events
+        feeds = [
+            (cal, cal.between(calStartDatetime, calEndDatetime, local_timezone))
+            for cal in calendars
+            if cal is not None
+        ]
+        self.calendar_cache.evict()
 
-        return sorted(event_list, key=lambda k: k["startDatetime"])
+        return heapq.merge(
+            *(
+                self._feed_events(cal, occurrences, calStartDatetime, calEndDatetime)
+                for cal, occurrences in feeds
+            ),
+            key=lambda e: e.start_datetime,
+        )
 
     def get_events(
         self,
@@ -90,35 +275,52 @@ class IcsModule:
         calStartDatetime: dt.datetime,
         calEndDatetime: dt.datetime,
         displayTZ: str,
-    ) -> Dict[dt.date, List[Dict[str, Any]]]:
-        eventList = self._retrieve_events(ics_url, calStartDatetime, calEndDatetime, displayTZ)
-
-        calDict: Dict[dt.date, List[Dict[str, Any]]] = {}
-
-        for event in eventList:
-            if event["isMultiday"]:
-                start_date = event["startDatetime"].date()
-                end_date = event["endDatetime"].date()
-                current_date = start_date
-                while current_date <= end_date:
-                    event_day = event.copy()
-                    if current_date < end_date:
-                        event_day["endDatetime"] = dt.datetime.combine(
-                            current_date, dt.time(23, 59, 59)
-                        )
-                    else:
-                        event_day["endDatetime"] = event["endDatetime"]
-
-                    if current_date > start_date:
-                        event_day["startDatetime"] = dt.datetime.combine(
-                            current_date, dt.time(0, 0, 0)
-                        )
-                    else:
-                        event_day["startDatetime"] = event["startDatetime"]
-
-                    calDict.setdefault(current_date, []).append(event_day)
-                    current_date += dt.timedelta(days=1)
-            else:
-                calDict.setdefault(event["startDatetime"].date(), []).append(event)
+        max_days: Optional[int] = None,
+        timeout: Optional[str] = None,
+        min_refresh: Optional[str] = None,
+    ) -> Dict[dt.date, List[DayEvent]]:
+        """
+        Groups the events by day. With max_days, only the first max_days days with events are returned and the
+        remaining events are never built. Timeouts and minimum refresh intervals default to those of the module.
+        """
 
+        calDict: Dict[dt.date, List[DayEvent]] = {}
+        # Days are added in order because events arrive ordered by start and multi-day events cover consecutive days
+        days: List[dt.date] = []
+
+        events = self._retrieve_events(
+            ics_url, calStartDatetime, calEndDatetime, displayTZ, timeout, min_refresh
+        )
+        with time_stage("day_grouping"):
+            for event in events:
+                start_date = event.start_datetime.date()
+                # Days before the start of this event can't get any more events
+                if max_days is not None and bisect.bisect_left(days, start_date) >= max_days:
+                    break
+
+                if event.is_multiday:
+                    # Only the days within the query window, the start is already clipped
+                    end_date = min(event.end_datetime.date(), calEndDatetime.date())
+                    current_date = start_date
+                    while current_date <= end_date:
+                        self._add_to_day(calDict, days, current_date, EventDay(event, current_date))
+                        current_date += dt.timedelta(days=1)
+                else:
+                    self._add_to_day(calDict, days, start_date, event)
+
+        if max_days is not None:
+            return {d: calDict[d] for d in days[:max_days]}
         return calDict
+
+    @classmethod
+    def _add_to_day(
+        cls,
+        calDict: Dict[dt.date, List[DayEvent]],
+        days: List[dt.date],
+        date: dt.date,
+        event: DayEvent,
+    ) -> None:
+        if date not in calDict:
+            calDict[date] = []
+            days.append(date)
+        calDict[date].append(event)
@@ -0,0 +1,95 @@
+"""
+This reads an ICS feed line by line and drops the events that can't show up in the query window before the feed is
+parsed, so that very large calendars with years of history don't need to be held and parsed in full. Only events
+that are neither recurring nor overriding an occurrence are dropped, based on the dates of their DTSTART and DTEND.
+"""
+
+import datetime as dt
+from typing import Iterable, Iterator, List, Optional
+
+# Properties that make an event part of a recurrence, these events are always kept
+RECURRENCE_PROPERTIES = ("RRULE", "RDATE", "RECURRENCE-ID")
+
+
+def unfold_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Joins folded content lines, continuation lines start with a space or tab."""
+    current: Optional[str] = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        if line[0] in " \t" and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def get_property_name(line: str) -> str:
+    return line.split(":", 1)[0].split(";", 1)[0].upper()
+
+
+def get_property_date(line: str) -> Optional[dt.date]:
+    """Returns the date part of a DTSTART or DTEND line, ignoring its time and time zone."""
+    value = line.split(":", 1)[-1].strip()
+    try:
+        return dt.date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    except ValueError:
+        return None
+
+
+def is_outside_window(event: List[str], start: dt.date, end: dt.date) -> bool:
+    """
+    Whether a single event lies entirely before start or after end. Dates are compared with a margin of one day
+    because the time zone of the event isn't resolved.
+    """
+
+    event_start = event_end = None
+    has_duration = False
+    for line in event:
+        name = get_property_name(line)
+        if name in RECURRENCE_PROPERTIES:
+            return False
+        if name == "DTSTART":
+            event_start = get_property_date(line)
+        elif name == "DTEND":
+            event_end = get_property_date(line)
+        elif name == "DURATION":
+            has_duration = True
+
+    if event_start is None:
+        return False
+    if event_start > end + dt.timedelta(days=1):
+        return True
+    if event_end is None:
+        # Without DTEND an event lasts for its duration or, without one, a day at most
+        event_end = None if has_duration else event_start + dt.timedelta(days=1)
+    return event_end is not None and event_end < start - dt.timedelta(days=1)
+
+
+def filter_calendar(lines: Iterable[str], start: dt.datetime, end: dt.datetime) -> str:
+    """Returns the calendar without the events outside the window between start and end."""
+    kept: List[str] = []
+    event: Optional[List[str]] = None
+    depth = 0
+    for line in unfold_lines(lines):
+        if event is not None:
+            event.append(line)
+            # Events can contain nested components like VALARM
+            if line.startswith("BEGIN:"):
+                depth += 1
+            elif line.startswith("END:"):
+                depth -= 1
+            if depth == 0:
+                if not is_outside_window(event, start.date(), end.date()):
+                    kept.extend(event)
+                event = None
+        elif line.strip() == "BEGIN:VEVENT":
+            event = [line]
+            depth = 1
+        else:
+            kept.append(line)
+    return "\r\n".join(kept) + "\r\n"
@@ -4,30 +4,133 @@ be easily adapted to other display sizes and resolution by adjusting the config
 CSS stylesheet.
 """
 
+import concurrent.futures
+import contextlib
 import datetime as dt
-import tempfile
+import hashlib
+import itertools
 import time
-from typing import Any, Dict, List
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
 import pytz
 import structlog
 import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse
 
-from config import DashboardConfig
+from config import DEFAULT_PROFILE, DashboardConfig, RenderBackend, load_profiles
+from ics_cal.event import DayEvent
 from ics_cal.ics import IcsModule
+from metrics import registry, response_bytes, time_stage
 from owm.owm import OwmModule
+from prerender import PrerenderScheduler
+from profiling import ProfileFormat, Profiler
+from render.chrome_pool import ChromePool
+from render.encode import Dither, OutputMode, encode_png
+from render.framebuffer import Compression, encode_raw
+from render.pillow_render import PillowRenderHelper
 from render.render import RenderHelper
+from render.render_cache import RenderCache
+from shared_cache import SharedCache
+from singleflight import SingleFlight
 
-cfg = DashboardConfig.get_config()
+T = TypeVar("T")
 
-app = FastAPI(title="Family E-Ink Dashboard Server", version="0.10.0")
+cfg = DashboardConfig.get_config()
 
 logger = structlog.get_logger()
 
-owmModule = OwmModule()
-calModule = IcsModule()
+# Shared between the worker processes, so that only one of them fetches or renders at a time
+sharedCache = SharedCache(cfg.SHARED_CACHE_DIR) if cfg.SHARED_CACHE_DIR else None
+
+owmModule = OwmModule(
+    ttl=cfg.OWM_CACHE_TTL_MINUTES * 60,
+    cache_file=cfg.OWM_CACHE_FILE or None,
+    shared_cache=sharedCache,
+)
+calModule = IcsModule(
+    timeout=cfg.ICS_TIMEOUT,
+    min_refresh=cfg.ICS_MIN_REFRESH_SECONDS,
+    cache_dir=cfg.ICS_CACHE_DIR or None,
+    calendar_cache_bytes=cfg.ICS_CALENDAR_CACHE_MB * 1024 * 1024,
+    streaming=cfg.ICS_STREAMING,
+    shared_cache=sharedCache,
+)
+chromePool = ChromePool(
+    size=cfg.CHROME_POOL_SIZE,
+    max_renders=cfg.CHROME_MAX_RENDERS,
+    max_age=cfg.CHROME_MAX_AGE_MINUTES * 60,
+)
+
+
+class Dashboard(NamedTuple):
+    cfg: DashboardConfig
+    render_service: RenderHelper
+    render_cache: RenderCache
+
+
+def create_dashboard(dashboard_cfg: DashboardConfig) -> Dashboard:
+    # All dashboards render with the same backend and share the Chrome pool
+    render_service = (
+        PillowRenderHelper(dashboard_cfg)
+        if cfg.RENDER_BACKEND == RenderBackend.pillow
+        else RenderHelper(dashboard_cfg, chromePool)
+    )
+    return Dashboard(dashboard_cfg, render_service, RenderCache())
+
+
+dashboards: Dict[str, Dashboard] = {DEFAULT_PROFILE: create_dashboard(cfg)}
+if cfg.PROFILES_FILE:
+    for name, profile_cfg in load_profiles(cfg.PROFILES_FILE).items():
+        dashboards[name] = create_dashboard(profile_cfg)
+    logger.info(f"Loaded {len(dashboards) - 1} dashboard profile(s).")
+# Every dashboard retrieves weather and calendar at the same time and renders of the same dashboard are coalesced, so
+# that retrievals never queue behind those of other dashboards and eat into their deadline
+dataExecutor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2 * len(dashboards), thread_name_prefix="data"
+)
+renderFlight: SingleFlight[bytes] = SingleFlight()
+prerenderScheduler: Optional[PrerenderScheduler] = None
+profiler = (
+    Profiler(
+        cfg.PROFILING_DIR,
+        retention=cfg.PROFILING_RETENTION,
+        sample_rate=cfg.PROFILING_SAMPLE_RATE,
+        token=cfg.PROFILING_TOKEN,
+    )
+    if cfg.PROFILING_TOKEN or cfg.PROFILING_SAMPLE_RATE
+    else None
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if cfg.RENDER_BACKEND == RenderBackend.chrome:
+        try:
+            chromePool.start()
+        except Exception as e:
+            logger.error(f"Could not pre-warm Chrome pool, sessions will be started on demand: {e}")
+    if prerenderScheduler is not None:
+        prerenderScheduler.start()
+    yield
+    if prerenderScheduler is not None:
+        prerenderScheduler.stop()
+    chromePool.close()
+
+
+app = FastAPI(title="Family E-Ink Dashboard Server", version="0.10.0", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -43,64 +146,426 @@ def get_background() -> FileResponse:
     return FileResponse("src/render/background.png", media_type="image/png")
 
 
-@app.get("/image", summary="Rendered dashboard image")
-def get_image() -> FileResponse:
+def timed_fetch(source: str, fetch: Callable[..., T], *args: Any) -> T:
     start_time = time.time()
-    logger.info("Retrieving data...")
+    result = fetch(*args)
+    logger.info(f"Completed {source} retrieval in {round(time.time() - start_time, 3)} seconds.")
+    return result
 
-    # Retrieve Weather Data
-    current_weather, hourly_forecast, daily_forecast = owmModule.get_weather(
-        cfg.LAT, cfg.LNG, cfg.OWM_API_KEY, cfg.WEATHER_UNITS
-    )
 
-    local_timezone = pytz.timezone(cfg.DISPLAY_TZ)
+def fetch_and_render(profile: str = DEFAULT_PROFILE) -> bytes:
+    dashboard = dashboards[profile]
+    dashboard_cfg = dashboard.cfg
+    start_time = time.time()
+    logger.info(f"Retrieving data for dashboard {profile}...")
+
+    local_timezone = pytz.timezone(dashboard_cfg.DISPLAY_TZ)
     currTime = dt.datetime.now(local_timezone)
     calStartDatetime = currTime.replace(hour=0, minute=0, second=0, microsecond=0)
-    calEndDatetime = calStartDatetime + dt.timedelta(days=cfg.NUM_CAL_DAYS_TO_QUERY, seconds=-1)
+    calEndDatetime = calStartDatetime + dt.timedelta(
+        days=dashboard_cfg.NUM_CAL_DAYS_TO_QUERY, seconds=-1
+    )
 
-    events: Dict[dt.date, List[Dict[str, Any]]] = calModule.get_events(
-        cfg.ICS_URL, calStartDatetime, calEndDatetime, cfg.DISPLAY_TZ
+    # Retrieve weather data and calendar events at the same time, both share one deadline
+    weather_future = dataExecutor.submit(
+        timed_fetch,
+        "weather",
+        owmModule.get_weather,
+        dashboard_cfg.LAT,
+        dashboard_cfg.LNG,
+        dashboard_cfg.OWM_API_KEY,
+        dashboard_cfg.WEATHER_UNITS,
+    )
+    events_future = dataExecutor.submit(
+        timed_fetch,
+        "calendar",
+        calModule.get_events,
+        dashboard_cfg.ICS_URL,
+        calStartDatetime,
+        calEndDatetime,
+        dashboard_cfg.DISPLAY_TZ,
+        # One extra day in case all of today's events are over
+        dashboard_cfg.NUM_CAL_DAYS_TO_DISPLAY + 1
+        if dashboard_cfg.NUM_CAL_DAYS_TO_DISPLAY
+        else None,
+        dashboard_cfg.ICS_TIMEOUT,
+        dashboard_cfg.ICS_MIN_REFRESH_SECONDS,
     )
+    deadline = start_time + dashboard_cfg.DATA_RETRIEVAL_TIMEOUT
+    try:
+        current_weather, hourly_forecast, daily_forecast = weather_future.result(
+            timeout=max(deadline - time.time(), 0)
+        )
+        events: Dict[dt.date, List[DayEvent]] = events_future.result(
+            timeout=max(deadline - time.time(), 0)
+        )
+    except concurrent.futures.TimeoutError:
+        logger.error(
+            f"Data retrieval didn't complete within {dashboard_cfg.DATA_RETRIEVAL_TIMEOUT} seconds."
+        )
+        image = get_last_image(dashboard, profile)
+        if image is None:
+            raise HTTPException(
+                status_code=503, detail="Weather and calendar data are currently unavailable"
+            )
+        logger.info("Serving last rendered image.")
+        return image
 
     # Remove today's past events
     today = currTime.date()
     if today in events:
         filtered_events = []
         for e in events[today]:
-            end_datetime = e["endDatetime"]
-            if end_datetime.tzinfo is None:
-                end_datetime = local_timezone.localize(end_datetime)
-            if end_datetime >= currTime:
+            if e.end_datetime >= currTime:
                 filtered_events.append(e)
         if filtered_events:
             events[today] = filtered_events
         else:
             del events[today]
+    if dashboard_cfg.NUM_CAL_DAYS_TO_DISPLAY:
+        events = dict(itertools.islice(events.items(), dashboard_cfg.NUM_CAL_DAYS_TO_DISPLAY))
+
+    with time_stage("template_params"):
+        params = dashboard.render_service.get_template_params(
+            currTime, current_weather, hourly_forecast, daily_forecast, events
+        )
+
+    # Skip rendering if nothing on the dashboard has changed since the last image
+    render_key = RenderCache.get_key(params)
+    image = dashboard.render_cache.get(render_key)
+    if image is not None:
+        logger.info("Dashboard unchanged, serving cached image.")
+        return image
+
+    start_time = time.time()
+    image = render_shared(dashboard, profile, params, render_key)
+    dashboard.render_cache.put(render_key, image, time.time() - start_time)
+    return image
+
+
+def get_last_image(dashboard: Dashboard, profile: str) -> Optional[bytes]:
+    image = dashboard.render_cache.get_last()
+    if image is None and sharedCache is not None:
+        # Another worker may have rendered the dashboard before
+        entry = sharedCache.get(f"image:{profile}")
+        image = entry.data if entry is not None else None
+    return image
+
+
+def render_shared(
+    dashboard: Dashboard, profile: str, params: Dict[str, Any], render_key: str
+) -> bytes:
+    if sharedCache is None:
+        return generate_image(dashboard, params)
+
+    # Workers wait for the one rendering the same dashboard and then reuse its image
+    shared_key = f"image:{profile}"
+    with sharedCache.lock(shared_key):
+        entry = sharedCache.get(shared_key, version=render_key)
+        if entry is not None:
+            logger.info("Dashboard rendered by another worker, serving shared image.")
+            return entry.data
+        image = generate_image(dashboard, params)
+        sharedCache.put(shared_key, image, version=render_key)
+        return image
+
+
+def generate_image(dashboard: Dashboard, params: Dict[str, Any]) -> bytes:
+    start_time = time.time()
+    logger.info("Generating image...")
+
+    image = dashboard.render_service.render(params)
 
     end_time = time.time()
-    logger.info(f"Completed data retrieval in {round(end_time - start_time, 3)} seconds.")
-
-    # TODO: delete=False leads to accumulating temporary files in /tmp but is currently needed because the FileResponse is async.
-    with tempfile.NamedTemporaryFile(suffix=".png", delete_on_close=False, delete=False) as tf:
-        start_time = time.time()
-        logger.info("Generating image...")
-
-        renderService = RenderHelper(cfg)
-        renderService.process_inputs(
-            currTime,
-            current_weather,
-            hourly_forecast,
-            daily_forecast,
-            events,
-            tf.name,
+    logger.info(
+        f"Completed image generation in {round(end_time - start_time, 3)} seconds, serving image now."
+    )
+    return image
+
+
+def render_image(profile: str = DEFAULT_PROFILE) -> bytes:
+    # Displays that wake up together join the render already in flight instead of starting their own
+    return renderFlight.do(profile, lambda: fetch_and_render(profile))
+
+
+if cfg.PRERENDER:
+    prerenderScheduler = PrerenderScheduler(
+        render_image,
+        lead_seconds=cfg.PRERENDER_LEAD_SECONDS,
+        schedule=cfg.PRERENDER_SCHEDULE,
+        timezone=cfg.DISPLAY_TZ,
+    )
+
+
+def get_rendered_image(request: Request, profile: str = DEFAULT_PROFILE) -> bytes:
+    # Pre-rendering is only available for the default dashboard
+    if prerenderScheduler is not None and profile == DEFAULT_PROFILE:
+        prerenderScheduler.record_request(request.client.host if request.client else "unknown")
+        image = prerenderScheduler.get_image()
+        if image is not None:
+            logger.info("Serving pre-rendered image.")
+            return image
+    return render_image(profile)
+
+
+def get_dashboard(profile: str) -> Dashboard:
+    if profile not in dashboards:
+        raise HTTPException(status_code=404, detail=f"Unknown dashboard profile {profile}")
+    return dashboards[profile]
+
+
+def get_profiling_token(request: Request) -> Optional[str]:
+    return request.headers.get("X-Profiling-Token") or request.query_params.get("profiling_token")
+
+
+def profile_request(request: Request) -> ContextManager[None]:
+    # Admins can profile a request by passing the token, other requests are sampled
+    if profiler is None:
+        return contextlib.nullcontext()
+    requested = profiler.is_admin(get_profiling_token(request))
+    if not profiler.should_profile(requested):
+        return contextlib.nullcontext()
+    return profiler.profile(request.url.path, "requested" if requested else "sampled")
+
+
+def get_dashboard_image(
+    request: Request,
+    mode: Optional[OutputMode],
+    dither: Optional[Dither],
+    profile: str = DEFAULT_PROFILE,
+) -> bytes:
+    dashboard_cfg = get_dashboard(profile).cfg
+    with profile_request(request):
+        image = get_rendered_image(request, profile)
+        with time_stage("encode"):
+            return encode_png(
+                image, mode or dashboard_cfg.OUTPUT_MODE, dither or dashboard_cfg.DITHER
+            )
+
+
+def get_etag(image: bytes) -> str:
+    # Strong ETag derived from the content of the rendered image
+    return f'"{hashlib.sha256(image).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def image_response(image: bytes, if_none_match: Optional[str], head: bool = False) -> Response:
+    etag = get_etag(image)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if head:
+        return Response(
+            headers={"ETag": etag, "Content-Length": str(len(image))}, media_type="image/png"
         )
+    response_bytes.observe(len(image), endpoint="image")
+    return Response(image, media_type="image/png", headers={"ETag": etag})
+
 
-        end_time = time.time()
-        logger.info(
-            f"Completed image generation in {round(end_time - start_time, 3)} seconds, serving image now."
+def raw_image_response(
+    request: Request,
+    profile: str,
+    mode: Optional[OutputMode],
+    dither: Optional[Dither],
+    compression: Compression,
+    if_none_match: Optional[str],
+) -> Response:
+    dashboard_cfg = get_dashboard(profile).cfg
+    if mode is None:
+        mode = (
+            OutputMode.gray_3bit
+            if dashboard_cfg.OUTPUT_MODE == OutputMode.color
+            else dashboard_cfg.OUTPUT_MODE
+        )
+    if mode == OutputMode.color:
+        raise HTTPException(
+            status_code=400, detail="Frame buffers are only available in 3bit and 1bit mode"
         )
 
-        return FileResponse(tf.name, media_type="image/png")
+    with profile_request(request):
+        image = get_rendered_image(request, profile)
+        with time_stage("encode"):
+            framebuffer = encode_raw(image, mode, dither or dashboard_cfg.DITHER, compression)
+    etag = get_etag(framebuffer)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response_bytes.observe(len(framebuffer), endpoint="image.raw")
+    return Response(framebuffer, media_type="application/octet-stream", headers={"ETag": etag})
+
+
+@app.get("/image", summary="Rendered dashboard image")
+def get_image(
+    request: Request,
+    mode: Optional[OutputMode] = None,
+    dither: Optional[Dither] = None,
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    return image_response(get_dashboard_image(request, mode, dither), if_none_match)
+
+
+@app.head("/image", summary="Headers of the rendered dashboard image")
+def head_image(
+    request: Request,
+    mode: Optional[OutputMode] = None,
+    dither: Optional[Dither] = None,
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    return image_response(get_dashboard_image(request, mode, dither), if_none_match, head=True)
+
+
+@app.get("/image/etag", summary="ETag of the rendered dashboard image")
+def get_image_etag(
+    request: Request, mode: Optional[OutputMode] = None, dither: Optional[Dither] = None
+) -> PlainTextResponse:
+    etag = get_etag(get_dashboard_image(request, mode, dither))
+    return PlainTextResponse(etag, headers={"ETag": etag})
+
+
+@app.get("/image.raw", summary="Rendered dashboard as packed Inkplate frame buffer")
+def get_image_raw(
+    request: Request,
+    mode: Optional[OutputMode] = None,
+    dither: Optional[Dither] = None,
+    compression: Compression = Compression.none,
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    return raw_image_response(request, DEFAULT_PROFILE, mode, dither, compression, if_none_match)
+
+
+# Registered after /image/etag and /image.raw so that these aren't taken for profile names
+@app.get(
+    "/image/{profile}.raw", summary="Rendered dashboard profile as packed Inkplate frame buffer"
+)
+def get_profile_image_raw(
+    request: Request,
+    profile: str,
+    mode: Optional[OutputMode] = None,
+    dither: Optional[Dither] = None,
+    compression: Compression = Compression.none,
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    return raw_image_response(request, profile, mode, dither, compression, if_none_match)
+
+
+@app.get("/image/{profile}", summary="Rendered dashboard profile image")
+def get_profile_image(
+    request: Request,
+    profile: str,
+    mode: Optional[OutputMode] = None,
+    dither: Optional[Dither] = None,
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    return image_response(get_dashboard_image(request, mode, dither, profile), if_none_match)
+
+
+@app.head("/image/{profile}", summary="Headers of the rendered dashboard profile image")
+def head_profile_image(
+    request: Request,
+    profile: str,
+    mode: Optional[OutputMode] = None,
+    dither: Optional[Dither] = None,
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    return image_response(
+        get_dashboard_image(request, mode, dither, profile), if_none_match, head=True
+    )
+
+
+@app.get("/stats", summary="Cache statistics")
+def get_stats() -> Dict[str, Any]:
+    return {
+        "render_cache": {
+            name: dashboard.render_cache.get_stats() for name, dashboard in dashboards.items()
+        },
+        "calendar_cache": calModule.calendar_cache.get_stats(),
+        "weather_cache": owmModule.weather_cache.get_stats(),
+        "shared_cache": sharedCache.get_stats() if sharedCache is not None else None,
+    }
+
+
+def get_profiler(request: Request) -> Profiler:
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiler.is_admin(get_profiling_token(request)):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    return profiler
+
+
+@app.get("/admin/profiling", summary="Stored request profiles")
+def get_profiling_results(request: Request) -> List[Dict[str, Any]]:
+    return get_profiler(request).list_profiles()
+
+
+@app.get("/admin/profiling/{profile_id}", summary="Download a request profile")
+def get_profiling_result(
+    request: Request, profile_id: str, format: ProfileFormat = ProfileFormat.pstats
+) -> FileResponse:
+    path = get_profiler(request).get_file(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile {profile_id}")
+    return FileResponse(
+        path,
+        media_type="application/octet-stream"
+        if format == ProfileFormat.pstats
+        else "text/plain; charset=utf-8",
+        filename=f"{profile_id}.{format.value}",
+    )
+
+
+def get_hit_ratio(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def get_cache_hit_ratios() -> Dict[Tuple[str], float]:
+    weather_stats = owmModule.weather_cache.get_stats()
+    ratios = {
+        ("calendar",): get_hit_ratio(
+            calModule.calendar_cache.hits, calModule.calendar_cache.misses
+        ),
+        ("weather",): get_hit_ratio(
+            weather_stats["hits"] + weather_stats["stale_hits"], weather_stats["misses"]
+        ),
+    }
+    if sharedCache is not None:
+        ratios[("shared",)] = get_hit_ratio(sharedCache.hits, sharedCache.misses)
+    return ratios
+
+
+registry.gauge(
+    "dashboard_cache_hit_ratio",
+    "Share of lookups answered by the calendar, weather and shared caches",
+    ("cache",),
+    callback=get_cache_hit_ratios,
+)
+registry.gauge(
+    "dashboard_render_cache_hit_ratio",
+    "Share of renders skipped because the dashboard didn't change",
+    ("profile",),
+    callback=lambda: {
+        (name,): get_hit_ratio(dashboard.render_cache.hits, dashboard.render_cache.misses)
+        for name, dashboard in dashboards.items()
+    },
+)
+registry.gauge(
+    "dashboard_renders_in_flight",
+    "Renders currently in progress",
+    callback=lambda: renderFlight.in_flight(),
+)
+registry.gauge(
+    "dashboard_chrome_rss_bytes",
+    "Resident memory of chromedriver and the headless Chrome processes",
+    callback=lambda: chromePool.get_rss_bytes(),
+)
+
+
+@app.get("/metrics", summary="Metrics in the Prometheus text format")
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.expose(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
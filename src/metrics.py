@@ -0,0 +1,236 @@
+"""
+This is a minimal metrics registry that renders counters, gauges and histograms in the Prometheus text format, so that
+the duration of every stage of the rendering pipeline can be scraped from /metrics without an extra dependency.
+"""
+
+import abc
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Buckets in seconds, from a cached lookup to a slow feed download or Chrome start
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets in bytes, from a compressed frame buffer to a full color PNG
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LabelValues = Tuple[str, ...]
+Samples = Union[float, Dict[LabelValues, float]]
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values
+    )
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def get_label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Expected labels {self.labelnames} for {self.name}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abc.abstractmethod
+    def collect(self) -> List[str]:
+        pass
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.collect())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self.get_label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self.get_label_values(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """A gauge whose value is read from a callback when the metrics are collected."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Samples]] = None,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        samples = self.callback() if self.callback is not None else {}
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(samples.items())
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values, the count of each bucket (not cumulative, the last one is +Inf), the sum and the count
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self.get_label_values(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0, 0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def get_count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self.get_label_values(labels))
+            return entry[2] if entry is not None else 0
+
+    def get_sum(self, **labels: str) -> float:
+        with self._lock:
+            entry = self._values.get(self.get_label_values(labels))
+            return entry[1] if entry is not None else 0.0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(c), t, n)) for key, (c, t, n) in self._values.items())
+        lines = []
+        names = self.labelnames + ("le",)
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = format_labels(names, key + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Samples]] = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, callback))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.expose() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Stages are owm_fetch, ics_fetch, ics_parse, recurrence_expansion, day_grouping, template_params, template_render,
+# chrome_start, page_load, page_wait, screenshot and encode
+stage_seconds = registry.histogram(
+    "dashboard_stage_seconds", "Duration of each stage of the rendering pipeline", ("stage",)
+)
+stage_errors = registry.counter(
+    "dashboard_stage_errors_total", "Failures of each stage of the rendering pipeline", ("stage",)
+)
+ics_fetch_seconds = registry.histogram(
+    "dashboard_ics_fetch_seconds",
+    "Duration of each ICS feed download, feeds are identified by a hash of their URL",
+    ("feed",),
+)
+ics_fetch_results = registry.counter(
+    "dashboard_ics_fetch_total",
+    "ICS feed requests by result (downloaded, not_modified, fresh, cached or failed)",
+    ("feed", "result"),
+)
+response_bytes = registry.histogram(
+    "dashboard_response_bytes", "Size of the served images", ("endpoint",), SIZE_BUCKETS
+)
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """Observes the duration of a pipeline stage and counts it as failed if it raises."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start_time, stage=stage)
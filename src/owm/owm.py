@@ -1,15 +1,29 @@
 """
 This is where we retrieve weather forecast from OpenWeatherMap. Before doing so, make sure you have both the
 signed up for an OWM account and also obtained a valid API key that is specified in the config.json file.
+
+Responses are cached for the TTL since OWM only updates its data every ~10 minutes. Once they expire they are still
+served while a background refresh fetches new data, so requests don't wait for the API. With a shared cache, workers
+of the same server take turns refreshing and reuse each other's responses.
 """
 
 import json
+import threading
+import time
 from enum import Enum
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import requests
 import structlog
 
+from metrics import time_stage
+from owm.weather_cache import WeatherCache
+from shared_cache import SharedCache
+from singleflight import SingleFlight
+
+COORDINATE_DECIMALS = 2
+ONE_CALL_URL = "https://api.openweathermap.org/data/3.0/onecall"
+
 
 class WeatherUnits(str, Enum):
     metric = "metric"
@@ -17,16 +31,31 @@ class WeatherUnits(str, Enum):
 
 
 class OwmModule:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        ttl: float = 0,
+        max_stale: float = 3600,
+        cache_file: Optional[str] = None,
+        shared_cache: Optional[SharedCache] = None,
+    ) -> None:
         self.logger = structlog.get_logger()
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.weather_cache = WeatherCache(cache_file)
+        self.shared_cache = shared_cache
+        self._refresh_lock = threading.Lock()
+        self._refreshing: Set[str] = set()
+        self.weather_flight: SingleFlight[Dict[str, Any]] = SingleFlight()
 
     def get_owm_weather(
         self, lat: float, lon: float, api_key: str, units: WeatherUnits
     ) -> Dict[str, Any]:
         results: Dict[str, Any] = {}
+        self.weather_cache.record_api_call()
 
-        url = f"https://api.openweathermap.org/data/3.0/onecall?lat={lat}&lon={lon}&appid={api_key}&exclude=minutely,alerts&units={units.value}"
-        response = requests.get(url)
+        url = f"{ONE_CALL_URL}?lat={lat}&lon={lon}&appid={api_key}&exclude=minutely,alerts&units={units.value}"
+        with time_stage("owm_fetch"):
+            response = requests.get(url)
 
         if response.ok:
             data = json.loads(response.text)
@@ -38,6 +67,72 @@ class OwmModule:
 
         return results
 
+    def _refresh_weather(
+        self, key: str, lat: float, lon: float, api_key: str, units: WeatherUnits
+    ) -> Dict[str, Any]:
+        if self.shared_cache is None:
+            return self._call_api(key, lat, lon, api_key, units)
+
+        shared_key = f"weather:{key}"
+        with self.shared_cache.lock(shared_key):
+            # Another worker may have refreshed the response while this one was waiting for the lock
+            entry = self.shared_cache.get(shared_key, newer_than=time.time() - self.ttl)
+            if entry is not None:
+                results = json.loads(entry.data)
+                self.weather_cache.put(key, results, entry.stored_at)
+                return results
+            results = self._call_api(key, lat, lon, api_key, units)
+            if results:
+                self.shared_cache.put(shared_key, json.dumps(results).encode("utf-8"))
+            return results
+
+    def _call_api(
+        self, key: str, lat: float, lon: float, api_key: str, units: WeatherUnits
+    ) -> Dict[str, Any]:
+        fetched_at = time.time()
+        results = self.get_owm_weather(lat, lon, api_key, units)
+        if results:
+            self.weather_cache.put(key, results, fetched_at)
+        return results
+
+    def _refresh_in_background(
+        self, key: str, lat: float, lon: float, api_key: str, units: WeatherUnits
+    ) -> None:
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh() -> None:
+            try:
+                self._refresh_weather(key, lat, lon, api_key, units)
+            except Exception as e:
+                self.logger.error(f"Error refreshing weather: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="owm-refresh", daemon=True).start()
+
+    def get_cached_weather(
+        self, lat: float, lon: float, api_key: str, units: WeatherUnits
+    ) -> Dict[str, Any]:
+        key = WeatherCache.get_key(lat, lon, units.value)
+        # Dashboards at the same location join the API call in flight
+        if self.ttl <= 0:
+            return self.weather_flight.do(
+                key, lambda: self.get_owm_weather(lat, lon, api_key, units)
+            )
+
+        entry, stale = self.weather_cache.lookup(key, self.ttl, self.max_stale)
+        if entry is None:
+            return self.weather_flight.do(
+                key, lambda: self._refresh_weather(key, lat, lon, api_key, units)
+            )
+        if stale:
+            self._refresh_in_background(key, lat, lon, api_key, units)
+        return entry.data
+
     def get_weather(
         self,
         lat: float,
@@ -45,7 +140,10 @@ class OwmModule:
         owm_api_key: str,
         units: WeatherUnits,
     ) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
-        weather_results = self.get_owm_weather(lat, lon, owm_api_key, units)
+        # Nearby dashboards share one forecast, two decimals are about one kilometer
+        weather_results = self.get_cached_weather(
+            round(lat, COORDINATE_DECIMALS), round(lon, COORDINATE_DECIMALS), owm_api_key, units
+        )
         current_weather = weather_results["current_weather"]
         hourly_forecast = weather_results["hourly_forecast"]
         daily_forecast = weather_results["daily_forecast"]
@@ -0,0 +1,101 @@
+"""
+This keeps the last OpenWeatherMap response per location and units in memory and, if a file is configured, on disk so
+that restarts don't cause extra API calls. Responses younger than the TTL are fresh, older ones are stale and can
+still be served for a while as long as they get refreshed.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import structlog
+
+from atomic_file import atomic_write
+
+
+class CachedWeather(NamedTuple):
+    data: Dict[str, Any]
+    fetched_at: float
+
+
+class WeatherCache:
+    def __init__(self, cache_file: Optional[str] = None) -> None:
+        self.logger = structlog.get_logger()
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CachedWeather] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        if cache_file:
+            self._load()
+
+    @classmethod
+    def get_key(cls, lat: float, lon: float, units: str) -> str:
+        return f"{lat},{lon},{units}"
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                entries = json.load(f)
+            self._entries = {
+                key: CachedWeather(entry["data"], entry["fetched_at"])
+                for key, entry in entries.items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            self.logger.warning(f"Ignoring unreadable weather cache file: {e}")
+
+    def _save(self) -> None:
+        entries = {key: entry._asdict() for key, entry in self._entries.items()}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+            atomic_write(self.cache_file, json.dumps(entries).encode("utf-8"))
+        except OSError as e:
+            self.logger.warning(f"Could not write weather cache file: {e}")
+
+    def lookup(
+        self, key: str, ttl: float, max_stale: float
+    ) -> Tuple[Optional[CachedWeather], bool]:
+        """
+        Returns the cached response and whether it is stale. Responses older than the TTL plus max_stale count as a
+        miss.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.time() - entry.fetched_at if entry is not None else None
+            if age is not None and age < ttl:
+                self.hits += 1
+                return entry, False
+            if age is not None and age < ttl + max_stale:
+                self.stale_hits += 1
+                return entry, True
+            self.misses += 1
+            return None, False
+
+    def record_api_call(self) -> None:
+        with self._lock:
+            self.api_calls += 1
+
+    def put(self, key: str, data: Dict[str, Any], fetched_at: float) -> None:
+        with self._lock:
+            self._entries[key] = CachedWeather(data, fetched_at)
+            if self.cache_file:
+                self._save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits) / requests, 3) if requests else 0.0,
+                "api_calls": self.api_calls,
+                "api_calls_saved": max(requests - self.api_calls, 0),
+            }
@@ -0,0 +1,152 @@
+"""
+This renders the dashboard in the background shortly before a display is expected to wake up, so that the request
+itself only has to read the finished image from memory. Wake-ups are either learned from the request history of each
+client or taken from a configured schedule of times of day.
+"""
+
+import collections
+import datetime as dt
+import statistics
+import threading
+import time
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import pytz
+import structlog
+
+# Requests closer together than this are treated as one wake-up (e.g. HEAD followed by GET)
+MIN_WAKE_INTERVAL = 60
+# Number of past wake-ups per client used to learn the cadence
+HISTORY_LENGTH = 10
+
+
+def parse_schedule(schedule: str) -> List[Tuple[Optional[int], int]]:
+    """
+    Parses a comma-separated list of times of day like "06:30,*:00" into (hour, minute) tuples. An hour of "*" means
+    every hour and is returned as None.
+    """
+
+    times: List[Tuple[Optional[int], int]] = []
+    for entry in schedule.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        hour, minute = entry.split(":")
+        times.append((None if hour == "*" else int(hour), int(minute)))
+    return times
+
+
+class PrerenderScheduler:
+    def __init__(
+        self,
+        prerender: Callable[[], bytes],
+        lead_seconds: float = 60,
+        schedule: str = "",
+        timezone: str = "UTC",
+    ) -> None:
+        self.logger = structlog.get_logger()
+        self._prerender = prerender
+        self.lead_seconds = lead_seconds
+        self.schedule = parse_schedule(schedule)
+        self.timezone = pytz.timezone(timezone)
+        self._history: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._image: Optional[bytes] = None
+        self._image_time = 0.0
+        # Wake-ups that were already rendered for, until they are more than the lead in the past
+        self._rendered_wakes: Set[float] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record_request(self, client: str, timestamp: Optional[float] = None) -> None:
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            history = self._history.setdefault(client, collections.deque(maxlen=HISTORY_LENGTH))
+            if history and timestamp - history[-1] < MIN_WAKE_INTERVAL:
+                return
+            history.append(timestamp)
+
+    def predict_wake(self, client: str, now: float) -> Optional[float]:
+        """Predicts the next wake-up of a client from the median interval between its past requests."""
+        with self._lock:
+            history = list(self._history.get(client, []))
+        if len(history) < 3:
+            return None
+
+        interval = statistics.median(b - a for a, b in zip(history, history[1:]))
+        next_wake = history[-1] + interval
+        # Skip wake-ups the client has missed
+        while next_wake < now - self.lead_seconds:
+            next_wake += interval
+        return next_wake
+
+    def next_scheduled_wake(self, now: float) -> Optional[float]:
+        if not self.schedule:
+            return None
+
+        local_now = dt.datetime.fromtimestamp(now, self.timezone)
+        candidates = []
+        for day_offset in (0, 1):
+            day = local_now.date() + dt.timedelta(days=day_offset)
+            for hour, minute in self.schedule:
+                for h in range(24) if hour is None else [hour]:
+                    wake = self.timezone.localize(dt.datetime.combine(day, dt.time(h, minute)))
+                    timestamp = wake.timestamp()
+                    if (
+                        timestamp >= now - self.lead_seconds
+                        and timestamp not in self._rendered_wakes
+                    ):
+                        candidates.append(timestamp)
+        return min(candidates) if candidates else None
+
+    def next_wake(self, now: float) -> Optional[float]:
+        with self._lock:
+            clients = list(self._history)
+        wakes = [self.predict_wake(client, now) for client in clients]
+        wakes.append(self.next_scheduled_wake(now))
+        upcoming = [w for w in wakes if w is not None and w not in self._rendered_wakes]
+        return min(upcoming) if upcoming else None
+
+    def get_image(self, max_age: Optional[float] = None) -> Optional[bytes]:
+        """Returns the pre-rendered image if it was rendered within max_age seconds (twice the lead by default)."""
+        max_age = 2 * self.lead_seconds if max_age is None else max_age
+        with self._lock:
+            if self._image is not None and time.time() - self._image_time <= max_age:
+                return self._image
+        return None
+
+    def tick(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self._rendered_wakes = {w for w in self._rendered_wakes if w >= now - self.lead_seconds}
+        wake = self.next_wake(now)
+        if wake is None or now < wake - self.lead_seconds:
+            return
+
+        self._rendered_wakes.add(wake)
+        start_time = time.time()
+        try:
+            image = self._prerender()
+        except Exception as e:
+            self.logger.error(f"Error pre-rendering image: {e}")
+            return
+        with self._lock:
+            self._image = image
+            self._image_time = time.time()
+        self.logger.info(
+            f"Pre-rendered image in {round(time.time() - start_time, 3)} seconds for wake-up in "
+            f"{round(wake - time.time())} seconds."
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(5):
+            self.tick()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prerender", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
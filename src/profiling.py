@@ -0,0 +1,202 @@
+"""
+This profiles individual image requests on demand, either when an admin asks for it or for every n-th request. Each
+profile consists of a cProfile, downloadable as pstats, and of stacks sampled from all threads, downloadable as
+collapsed stacks for flamegraph tools, both taken while the request runs. Since Python 3.12 cProfile records all
+threads, so like the sampled stacks it covers the weather and calendar retrieval on other threads, but also other
+requests served at the same time. Only the newest profiles are kept on disk.
+"""
+
+import cProfile
+import collections
+import datetime as dt
+import hmac
+import itertools
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+from types import FrameType
+from typing import Any, Counter, Dict, Iterator, List, Optional
+
+import structlog
+
+# Seconds between two samples of the stacks of all threads
+SAMPLE_INTERVAL = 0.005
+PROFILE_ID_PATTERN = re.compile(r"[0-9]{8}T[0-9]{6}-[0-9a-f]{6}")
+
+
+class ProfileFormat(str, Enum):
+    pstats = "pstats"
+    collapsed = "collapsed"
+
+
+def get_frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def get_collapsed_stack(thread_name: str, frame: Optional[FrameType]) -> str:
+    """Formats a stack as in Brendan Gregg's collapsed format, root first and separated by semicolons."""
+    names = []
+    while frame is not None:
+        names.append(get_frame_name(frame))
+        frame = frame.f_back
+    return ";".join([thread_name] + names[::-1])
+
+
+class StackSampler:
+    """Samples the stacks of all other threads in the background until it is stopped."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.samples: Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    name = thread_names.get(thread_id, str(thread_id))
+                    self.samples[get_collapsed_stack(name, frame)] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def get_collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class Profiler:
+    def __init__(
+        self, profile_dir: str, retention: int = 20, sample_rate: int = 0, token: str = ""
+    ) -> None:
+        self.logger = structlog.get_logger()
+        self.profile_dir = profile_dir
+        self.retention = max(1, retention)
+        self.sample_rate = sample_rate
+        self.token = token
+        self._requests = itertools.count(1)
+        # Only one request is profiled at a time, concurrent profilers would skew each other
+        self._active = threading.Lock()
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def should_profile(self, requested: bool) -> bool:
+        """Whether to profile a request, because an admin asked for it or because it is the n-th request."""
+        count = next(self._requests)
+        return requested or (self.sample_rate > 0 and count % self.sample_rate == 0)
+
+    def get_path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.profile_dir, profile_id + suffix)
+
+    @contextmanager
+    def profile(self, path: str, reason: str) -> Iterator[None]:
+        """Profiles the process, not only the calling thread, until the context is left."""
+        if not self._active.acquire(blocking=False):
+            self.logger.info("Another request is being profiled, not profiling this one.")
+            yield
+            return
+
+        try:
+            sampler = StackSampler()
+            profiler: Optional[cProfile.Profile] = cProfile.Profile()
+            start_time = time.time()
+            sampler.start()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Since Python 3.12 only one profiler can be active, e.g. a debugger or coverage may be running
+                self.logger.warning(f"Could not start cProfile, only sampling stacks: {e}")
+                profiler = None
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                sampler.stop()
+                self._save(profiler, sampler, path, reason, start_time, time.time())
+        finally:
+            self._active.release()
+
+    def _save(
+        self,
+        profiler: Optional[cProfile.Profile],
+        sampler: StackSampler,
+        path: str,
+        reason: str,
+        start_time: float,
+        end_time: float,
+    ) -> None:
+        profile_id = (
+            dt.datetime.fromtimestamp(start_time, dt.timezone.utc).strftime("%Y%m%dT%H%M%S")
+            + "-"
+            + secrets.token_hex(3)
+        )
+        try:
+            if profiler is not None:
+                profiler.dump_stats(self.get_path(profile_id, ".pstats"))
+            with open(self.get_path(profile_id, ".collapsed"), "w", encoding="utf-8") as f:
+                f.write(sampler.get_collapsed())
+            # The metadata is written last, profiles are only listed once they are complete
+            with open(self.get_path(profile_id, ".json"), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "id": profile_id,
+                        "path": path,
+                        "reason": reason,
+                        "started_at": start_time,
+                        "seconds": round(end_time - start_time, 3),
+                        "samples": sum(sampler.samples.values()),
+                    },
+                    f,
+                )
+        except OSError as e:
+            self.logger.warning(f"Could not write profile: {e}")
+            return
+
+        self.logger.info(
+            f"Profiled {path} in {round(end_time - start_time, 3)} seconds as {profile_id}."
+        )
+        self._prune()
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Returns the metadata of the stored profiles, newest first."""
+        profiles = []
+        for name in os.listdir(self.profile_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.profile_dir, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Ignoring unreadable profile: {e}")
+        return sorted(profiles, key=lambda p: p["started_at"], reverse=True)
+
+    def get_file(self, profile_id: str, format: ProfileFormat) -> Optional[str]:
+        """Returns the path of a stored profile in the format, or None if there is no such profile."""
+        if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        path = self.get_path(profile_id, "." + format.value)
+        return path if os.path.exists(path) else None
+
+    def _prune(self) -> None:
+        for profile in self.list_profiles()[self.retention :]:
+            for suffix in [".json"] + ["." + f.value for f in ProfileFormat]:
+                try:
+                    os.remove(self.get_path(profile["id"], suffix))
+                except FileNotFoundError:
+                    pass
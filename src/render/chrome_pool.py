@@ -0,0 +1,219 @@
+"""
+This keeps a bounded pool of warm headless Chrome sessions around so that rendering the dashboard only pays for the
+page load and the screenshot instead of starting chromedriver and Chrome on every request.
+"""
+
+import os
+import queue
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import structlog
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from metrics import time_stage
+
+
+def find_chromedriver() -> str:
+    logger = structlog.get_logger()
+
+    # Try to automatically locate chromedriver, source: https://github.com/fdmarcin/MagInkDash-updated
+    try:
+        chromedriver_path = (
+            subprocess.check_output(["which", "chromedriver"]).decode("utf-8").strip()
+        )
+        logger.info(f"Found chromedriver at: {chromedriver_path}")
+        return chromedriver_path
+    except (subprocess.SubprocessError, FileNotFoundError):
+        # Default paths to try if 'which' command fails
+        possible_paths = [
+            "/usr/bin/chromedriver",
+            "/usr/local/bin/chromedriver",
+            "/usr/lib/chromium-browser/chromedriver",
+        ]
+
+        for path in possible_paths:
+            if os.path.exists(path) and os.access(path, os.X_OK):
+                logger.info(f"Found chromedriver at default location: {path}")
+                return path
+
+        logger.error(
+            "Could not find chromedriver. Please install it with 'sudo apt-get install chromium-chromedriver'"
+        )
+        raise FileNotFoundError("chromedriver executable not found in PATH")
+
+
+def create_chrome_driver(chromedriver_path: str) -> webdriver.Chrome:
+    opts = Options()
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--disable-extensions")
+    opts.add_argument("--force-device-scale-factor=1")
+    opts.add_argument("--headless")
+    opts.add_argument("--hide-scrollbars")
+    opts.add_argument("--no-sandbox")
+
+    return webdriver.Chrome(service=Service(chromedriver_path), options=opts)
+
+
+def get_process_tree_rss(pids: List[int]) -> int:
+    """Resident memory in bytes of the processes and all of their descendants, read from /proc (Linux only)."""
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name in parentheses can contain spaces, the other fields follow it
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss[int(entry)] = int(fields[21]) * page_size
+
+    total = 0
+    pending = list(pids)
+    while pending:
+        current = pending.pop()
+        total += rss.get(current, 0)
+        pending.extend(children.get(current, []))
+    return total
+
+
+class PooledDriver:
+    def __init__(self, driver: webdriver.Chrome) -> None:
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.renders = 0
+        # Viewport size the session was last resized to, see RenderHelper.set_viewport_size
+        self.viewport: Optional[Tuple[int, int]] = None
+
+
+class ChromePool:
+    """
+    A bounded pool of headless Chrome sessions. At most `size` sessions exist at any time, idle sessions are health
+    checked before they are handed out and sessions are recycled after `max_renders` renders or `max_age` seconds.
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        max_renders: int = 50,
+        max_age: float = 3600,
+        driver_factory: Optional[Callable[[], webdriver.Chrome]] = None,
+    ) -> None:
+        self.logger = structlog.get_logger()
+        self.size = max(1, size)
+        self.max_renders = max_renders
+        self.max_age = max_age
+        self._driver_factory = driver_factory
+        self._idle: "queue.LifoQueue[PooledDriver]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+        # All sessions, idle or in use, to report their memory
+        self._lock = threading.Lock()
+        self._sessions: Set[PooledDriver] = set()
+
+    def _create(self) -> PooledDriver:
+        if self._driver_factory is None:
+            chromedriver_path = find_chromedriver()
+            self._driver_factory = lambda: create_chrome_driver(chromedriver_path)
+
+        start_time = time.time()
+        with time_stage("chrome_start"):
+            pooled = PooledDriver(self._driver_factory())
+        self.logger.info(f"Started Chrome session in {round(time.time() - start_time, 3)} seconds.")
+        with self._lock:
+            self._sessions.add(pooled)
+        return pooled
+
+    def _discard(self, pooled: PooledDriver) -> None:
+        with self._lock:
+            self._sessions.discard(pooled)
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            self.logger.warning(f"Error quitting Chrome session: {e}")
+
+    def _is_expired(self, pooled: PooledDriver) -> bool:
+        return (
+            pooled.renders >= self.max_renders
+            or time.monotonic() - pooled.created_at >= self.max_age
+        )
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Discarding unhealthy Chrome session: {e}")
+            return False
+
+    def start(self) -> None:
+        """Pre-warm the pool so that the first request doesn't pay for starting Chrome."""
+        for _ in range(self.size - self._idle.qsize()):
+            self._idle.put(self._create())
+
+    @contextmanager
+    def session(self) -> Iterator[PooledDriver]:
+        if self._closed:
+            raise RuntimeError("Chrome pool is closed")
+
+        self._slots.acquire()
+        try:
+            pooled = None
+            while pooled is None:
+                try:
+                    candidate = self._idle.get_nowait()
+                except queue.Empty:
+                    pooled = self._create()
+                    break
+                if not self._is_expired(candidate) and self._is_healthy(candidate):
+                    pooled = candidate
+                else:
+                    self._discard(candidate)
+
+            try:
+                yield pooled
+            except Exception:
+                # The session may be in an unknown state, don't hand it out again
+                self._discard(pooled)
+                raise
+
+            pooled.renders += 1
+            if self._closed or self._is_expired(pooled):
+                self._discard(pooled)
+            else:
+                self._idle.put(pooled)
+        finally:
+            self._slots.release()
+
+    def get_rss_bytes(self) -> int:
+        """Resident memory of chromedriver and the Chrome processes it started for all sessions of the pool."""
+        with self._lock:
+            sessions = list(self._sessions)
+        if not sessions or not os.path.isdir("/proc"):
+            return 0
+
+        pids = []
+        for pooled in sessions:
+            try:
+                pids.append(pooled.driver.service.process.pid)
+            except AttributeError:
+                continue
+        return get_process_tree_rss(pids)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
@@ -0,0 +1,104 @@
+"""
+This converts the rendered dashboard into the native gray levels of the E-Ink panel, either 8 levels for the 3-bit
+mode or black and white for the 1-bit mode of the Inkplate. All steps are whole-image operations that run inside
+Pillow instead of per-pixel Python loops, and the result is a palettized PNG which is much smaller than the
+full-color screenshot.
+"""
+
+import functools
+import io
+from enum import Enum
+from typing import List
+
+from PIL import Image, ImageMath
+
+
+class OutputMode(str, Enum):
+    color = "color"
+    gray_3bit = "3bit"
+    mono_1bit = "1bit"
+
+
+class Dither(str, Enum):
+    none = "none"
+    ordered = "ordered"
+    floyd_steinberg = "floyd-steinberg"
+
+
+OUTPUT_MODE_LEVELS = {OutputMode.gray_3bit: 8, OutputMode.mono_1bit: 2}
+
+
+def bayer_matrix(size: int) -> List[List[int]]:
+    """Returns the size x size Bayer threshold matrix with values from 0 to size * size - 1."""
+    if size == 1:
+        return [[0]]
+    half = bayer_matrix(size // 2)
+    top = [[4 * v for v in row] + [4 * v + 2 for v in row] for row in half]
+    bottom = [[4 * v + 3 for v in row] + [4 * v + 1 for v in row] for row in half]
+    return top + bottom
+
+
+@functools.lru_cache(maxsize=4)
+def get_threshold_image(width: int, height: int) -> Image.Image:
+    """Tiles the 8x8 Bayer matrix, scaled to 0-255, over an image of the given size."""
+    matrix = bayer_matrix(8)
+    tile = Image.new("L", (8, 8))
+    tile.putdata([round((v + 0.5) / 64 * 255) for row in matrix for v in row])
+
+    strip = Image.new("L", (width, 8))
+    for x in range(0, width, 8):
+        strip.paste(tile, (x, 0))
+    threshold = Image.new("L", (width, height))
+    for y in range(0, height, 8):
+        threshold.paste(strip, (0, y))
+    return threshold
+
+
+def get_palette_image(levels: int) -> Image.Image:
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(get_palette(levels))
+    return palette
+
+
+def get_palette(levels: int) -> List[int]:
+    # Evenly spaced gray levels, index 0 is black and the last index is white
+    return [round(i * 255 / (levels - 1)) for i in range(levels) for _ in range(3)]
+
+
+def quantize(image: Image.Image, levels: int, dither: Dither) -> Image.Image:
+    """
+    Quantizes the image into the given number of gray levels. The result is an "L" image whose pixel values are the
+    level indices from 0 (black) to levels - 1 (white).
+    """
+
+    gray = image.convert("L")
+
+    if dither == Dither.floyd_steinberg:
+        # Error diffusion is sequential by nature, Pillow's quantizer does it natively
+        quantized = gray.convert("RGB").quantize(
+            palette=get_palette_image(levels), dither=Image.Dither.FLOYDSTEINBERG
+        )
+        return Image.frombytes("L", quantized.size, quantized.tobytes())
+    elif dither == Dither.ordered:
+        threshold = get_threshold_image(*gray.size)
+        return ImageMath.lambda_eval(
+            lambda args: (args["g"] * (levels - 1) + args["t"]) / 255, g=gray, t=threshold
+        ).convert("L")
+    else:
+        return gray.point([round(v * (levels - 1) / 255) for v in range(256)])
+
+
+@functools.lru_cache(maxsize=8)
+def encode_png(png: bytes, mode: OutputMode, dither: Dither) -> bytes:
+    """Converts a rendered PNG into a palettized PNG for the given output mode."""
+    if mode == OutputMode.color:
+        return png
+
+    levels = OUTPUT_MODE_LEVELS[mode]
+    indices = quantize(Image.open(io.BytesIO(png)), levels, dither)
+
+    paletted = Image.frombytes("P", indices.size, indices.tobytes())
+    paletted.putpalette(get_palette(levels))
+    output = io.BytesIO()
+    paletted.save(output, format="PNG", optimize=True)
+    return output.getvalue()
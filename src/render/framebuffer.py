@@ -0,0 +1,177 @@
+"""
+This packs the quantized dashboard into the frame buffer layout of the Inkplate library, so that the display can copy
+the bytes straight into its frame buffer instead of decoding a PNG:
+
+* 3-bit: two pixels per byte, the even column in the high nibble, 0 is black and 7 is white
+* 1-bit: eight pixels per byte, the leftmost pixel in the least significant bit, a set bit is black
+
+Rows always start on a new byte, if the width doesn't fill the last byte of a row it is padded with white pixels.
+
+Every frame buffer is prefixed with a little-endian header (see HEADER_FORMAT) and can optionally be run-length or
+zlib compressed. Run-length encoding uses (count, value) byte pairs with counts from 1 to 255.
+"""
+
+import functools
+import hashlib
+import io
+import re
+import struct
+import zlib
+from enum import Enum
+from typing import NamedTuple
+
+from PIL import Image
+
+from render.encode import OUTPUT_MODE_LEVELS, Dither, OutputMode, quantize
+
+# Magic, version, bit depth, compression, padding, width, height, content hash, payload length
+HEADER_FORMAT = "<4sBBBxHH8sI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b"IKFB"
+VERSION = 1
+
+
+class Compression(str, Enum):
+    none = "none"
+    rle = "rle"
+    zlib = "zlib"
+
+
+COMPRESSION_IDS = {Compression.none: 0, Compression.rle: 1, Compression.zlib: 2}
+OUTPUT_MODE_BIT_DEPTHS = {OutputMode.gray_3bit: 3, OutputMode.mono_1bit: 1}
+
+# Lookup tables to shift the even pixel into the high nibble and to reverse the bit order of a byte
+HIGH_NIBBLE = bytes((v << 4) & 0xFF for v in range(256))
+REVERSED_BITS = bytes(int(f"{v:08b}"[::-1], 2) for v in range(256))
+
+RUN_PATTERN = re.compile(rb"(.)\1{0,254}", re.DOTALL)
+
+
+class FrameBuffer(NamedTuple):
+    width: int
+    height: int
+    bit_depth: int
+    compression: Compression
+    content_hash: bytes
+    data: bytes
+
+
+def get_padded_width(width: int, pixels_per_byte: int) -> int:
+    return -(-width // pixels_per_byte) * pixels_per_byte
+
+
+def pad_rows(indices: Image.Image, pixels_per_byte: int, white: int) -> Image.Image:
+    """Pads every row with white pixels so that it fills whole bytes."""
+    width = get_padded_width(indices.width, pixels_per_byte)
+    if width == indices.width:
+        return indices
+    padded = Image.new("L", (width, indices.height), white)
+    padded.paste(indices, (0, 0))
+    return padded
+
+
+def pack_3bit(indices: Image.Image) -> bytes:
+    """Packs an image of gray level indices from 0 to 7 into two pixels per byte."""
+    indices = pad_rows(indices, 2, 7)
+    pixels = indices.tobytes()
+    even = pixels[0::2].translate(HIGH_NIBBLE)
+    odd = pixels[1::2]
+    # Combine both halves in one go instead of byte by byte
+    return (int.from_bytes(even, "big") | int.from_bytes(odd, "big")).to_bytes(len(even), "big")
+
+
+def unpack_3bit(data: bytes, width: int, height: int) -> Image.Image:
+    padded_width = get_padded_width(width, 2)
+    pixels = bytearray(padded_width * height)
+    pixels[0::2] = bytes(b >> 4 for b in data)
+    pixels[1::2] = bytes(b & 0x0F for b in data)
+    return Image.frombytes("L", (padded_width, height), bytes(pixels)).crop((0, 0, width, height))
+
+
+def pack_1bit(indices: Image.Image) -> bytes:
+    """Packs an image of gray level indices 0 (black) and 1 (white) into eight pixels per byte."""
+    indices = pad_rows(indices, 8, 1)
+    # Pillow packs 1-bit images with the leftmost pixel in the most significant bit
+    black = indices.point([255] + [0] * 255, mode="1")
+    return black.tobytes().translate(REVERSED_BITS)
+
+
+def unpack_1bit(data: bytes, width: int, height: int) -> Image.Image:
+    padded_width = get_padded_width(width, 8)
+    black = Image.frombytes("1", (padded_width, height), data.translate(REVERSED_BITS))
+    return black.crop((0, 0, width, height)).convert("L").point([1] + [0] * 255)
+
+
+def rle_encode(data: bytes) -> bytes:
+    return b"".join(bytes((len(m.group(0)),)) + m.group(1) for m in RUN_PATTERN.finditer(data))
+
+
+def rle_decode(data: bytes) -> bytes:
+    return b"".join(data[i + 1 : i + 2] * data[i] for i in range(0, len(data), 2))
+
+
+def encode_framebuffer(
+    indices: Image.Image, bit_depth: int, compression: Compression = Compression.none
+) -> bytes:
+    if bit_depth == 3:
+        packed = pack_3bit(indices)
+    elif bit_depth == 1:
+        packed = pack_1bit(indices)
+    else:
+        raise ValueError(f"Unsupported bit depth {bit_depth}")
+
+    content_hash = hashlib.sha256(packed).digest()[:8]
+    if compression == Compression.rle:
+        payload = rle_encode(packed)
+    elif compression == Compression.zlib:
+        payload = zlib.compress(packed, 9)
+    else:
+        payload = packed
+
+    header = struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        VERSION,
+        bit_depth,
+        COMPRESSION_IDS[compression],
+        indices.width,
+        indices.height,
+        content_hash,
+        len(payload),
+    )
+    return header + payload
+
+
+def decode_framebuffer(raw: bytes) -> FrameBuffer:
+    magic, version, bit_depth, compression_id, width, height, content_hash, length = struct.unpack(
+        HEADER_FORMAT, raw[:HEADER_SIZE]
+    )
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a frame buffer")
+
+    compression = {v: k for k, v in COMPRESSION_IDS.items()}[compression_id]
+    payload = raw[HEADER_SIZE : HEADER_SIZE + length]
+    if compression == Compression.rle:
+        data = rle_decode(payload)
+    elif compression == Compression.zlib:
+        data = zlib.decompress(payload)
+    else:
+        data = payload
+
+    return FrameBuffer(width, height, bit_depth, compression, content_hash, data)
+
+
+def unpack_framebuffer(framebuffer: FrameBuffer) -> Image.Image:
+    """Returns the gray level indices of a decoded frame buffer."""
+    if framebuffer.bit_depth == 3:
+        return unpack_3bit(framebuffer.data, framebuffer.width, framebuffer.height)
+    return unpack_1bit(framebuffer.data, framebuffer.width, framebuffer.height)
+
+
+@functools.lru_cache(maxsize=8)
+def encode_raw(png: bytes, mode: OutputMode, dither: Dither, compression: Compression) -> bytes:
+    """Converts a rendered PNG into a frame buffer for the given output mode."""
+    if mode not in OUTPUT_MODE_BIT_DEPTHS:
+        raise ValueError(f"Output mode {mode.value} has no frame buffer layout")
+    indices = quantize(Image.open(io.BytesIO(png)), OUTPUT_MODE_LEVELS[mode], dither)
+    return encode_framebuffer(indices, OUTPUT_MODE_BIT_DEPTHS[mode], compression)
@@ -0,0 +1,277 @@
+"""
+This draws the dashboard directly with Pillow instead of rendering the HTML template in headless Chrome. The layout
+follows dashboard_template.html.j2 and styles.css (Bootstrap 3 grid, 1rem = 10px) and uses the same bundled fonts,
+weather icons are looked up from the glyph codes in weather-icons.min.css.
+"""
+
+import functools
+import io
+import pathlib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from metrics import time_stage
+from render.render import RenderHelper
+
+RENDER_PATH = pathlib.Path(__file__).parent.absolute()
+
+TEXT_COLOR = 51  # Bootstrap's #333
+GRAY_COLOR = 128  # CSS "gray"
+BACKGROUND_COLOR = 255
+
+# Horizontal layout of the Bootstrap 3 grid: the container is centered and its width depends on the viewport width
+# (breakpoint and container width, narrower viewports use their full width). From the md breakpoint on, the weather
+# takes 5 of 12 columns and the calendar the remaining 7, below it the calendar is placed under the weather. Columns
+# have a padding of 15px.
+CONTAINER_BREAKPOINTS = ((1200, 1170), (992, 970), (768, 750))
+COLUMNS_BREAKPOINT = 992
+GUTTER = 15
+# Space below the weather column, as the empty row at the end of the weather in the template
+WEATHER_MARGIN = 50
+
+
+def get_container_width(viewport_width: int) -> int:
+    for breakpoint, container_width in CONTAINER_BREAKPOINTS:
+        if viewport_width >= breakpoint:
+            return container_width
+    return viewport_width
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(name: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(str(RENDER_PATH / "font" / name), size)
+
+
+@functools.lru_cache(maxsize=1)
+def get_weather_icon_glyphs() -> Dict[str, str]:
+    """Parses the mapping from Weather Icons class names (e.g. wi-owm-800) to glyphs from the stylesheet."""
+    css = (RENDER_PATH / "css" / "weather-icons.min.css").read_text()
+    glyphs: Dict[str, str] = {}
+    for selectors, code in re.findall(
+        r'((?:\.wi-[\w-]+:before,?)+)\{content:"\\([0-9a-f]+)"\}', css
+    ):
+        for name in re.findall(r"\.(wi-[\w-]+):before", selectors):
+            glyphs[name] = chr(int(code, 16))
+    return glyphs
+
+
+class PillowRenderHelper(RenderHelper):
+    def render(self, params: Dict[str, Any]) -> bytes:
+        # Drawing takes the place of rendering the template, there is no page to load or screenshot to take
+        with time_stage("template_render"):
+            image = self.draw_dashboard(params)
+        output = io.BytesIO()
+        with time_stage("encode"):
+            image.save(output, format="PNG")
+        self.logger.debug("Dashboard drawn.")
+        return output.getvalue()
+
+    def draw_dashboard(self, params: Dict[str, Any]) -> Image.Image:
+        image = Image.new("L", (self.cfg.IMAGE_WIDTH, self.cfg.IMAGE_HEIGHT), BACKGROUND_COLOR)
+        draw = ImageDraw.Draw(image)
+
+        container_width = get_container_width(self.cfg.IMAGE_WIDTH)
+        left = (self.cfg.IMAGE_WIDTH - container_width) / 2
+        if self.cfg.IMAGE_WIDTH >= COLUMNS_BREAKPOINT:
+            weather_width = container_width * 5 / 12
+            self.draw_weather(draw, params, left, weather_width)
+            self.draw_calendar(
+                draw,
+                params,
+                left + weather_width + GUTTER,
+                container_width - weather_width - 2 * GUTTER,
+            )
+        else:
+            bottom = self.draw_weather(draw, params, left, container_width)
+            self.draw_calendar(
+                draw,
+                params,
+                left + GUTTER,
+                container_width - 2 * GUTTER,
+                bottom + WEATHER_MARGIN,
+            )
+
+        return image
+
+    def draw_icon(
+        self,
+        draw: ImageDraw.ImageDraw,
+        name: str,
+        xy: Tuple[float, float],
+        size: int,
+        fill: int,
+        anchor: str,
+    ) -> None:
+        glyph = get_weather_icon_glyphs().get(name)
+        if glyph is None:
+            self.logger.warning(f"No weather icon found for {name}")
+            return
+        draw.text(
+            xy,
+            glyph,
+            font=get_font("weathericons-regular-webfont.ttf", size),
+            fill=fill,
+            anchor=anchor,
+        )
+
+    def draw_weather(
+        self, draw: ImageDraw.ImageDraw, params: Dict[str, Any], left: float, width: float
+    ) -> float:
+        """Draws the weather column and returns the y coordinate of its bottom."""
+        center = left + width / 2
+
+        # Day of the month on the left, moon phase, weekday and month on the right
+        draw.text(
+            (center - 5, 0),
+            params["day"],
+            font=get_font("TiltWarp-Regular.ttf", 160),
+            fill=TEXT_COLOR,
+            anchor="ra",
+        )
+        y = 45
+        if params["today_moon_phase"]:
+            self.draw_icon(
+                draw, params["today_moon_phase"], (center + GUTTER, y), 50, TEXT_COLOR, "la"
+            )
+        y += 55
+        for text in (params["weekday"], params["month"]):
+            draw.text(
+                (center + GUTTER, y), text, font=get_font("Lexend-Regular.ttf", 25), fill=TEXT_COLOR
+            )
+            y += 36
+
+        # Current weather
+        y = 240
+        self.draw_icon(
+            draw, f"wi-owm-{params['current_weather_id']}", (center, y + 125), 250, TEXT_COLOR, "mm"
+        )
+        y += 290
+        draw.text(
+            (center, y),
+            f"{params['current_weather_text']} | {params['current_weather_temp']}",
+            font=get_font("Lexend-Regular.ttf", 30),
+            fill=TEXT_COLOR,
+            anchor="ma",
+        )
+        y += 40
+        draw.text(
+            (center, y),
+            params["current_weather_add_info"],
+            font=get_font("Lexend-Regular.ttf", 18),
+            fill=TEXT_COLOR,
+            anchor="ma",
+        )
+        y += 46
+
+        # Forecast for today, tomorrow and the day after
+        forecasts = [
+            ("today", "Today"),
+            ("tomorrow", "Tomorrow"),
+            ("dayafter", params["dayaftertomorrow"]),
+        ]
+        for i, (key, label) in enumerate(forecasts):
+            column_center = left + width * (2 * i + 1) / 6
+            self.draw_icon(
+                draw,
+                f"wi-owm-{params[key + '_weather_id']}",
+                (column_center, y + 50),
+                100,
+                GRAY_COLOR,
+                "mm",
+            )
+            draw.text(
+                (column_center, y + 115),
+                label,
+                font=get_font("Lexend-Regular.ttf", 24),
+                fill=TEXT_COLOR,
+                anchor="ma",
+            )
+            draw.text(
+                (column_center, y + 150),
+                f"{params[key + '_weather_pop']}% | "
+                f"{params[key + '_weather_min']}-{params[key + '_weather_max']}°",
+                font=get_font("Lexend-Regular.ttf", 18),
+                fill=TEXT_COLOR,
+                anchor="ma",
+            )
+        return y + 176
+
+    def draw_calendar(
+        self,
+        draw: ImageDraw.ImageDraw,
+        params: Dict[str, Any],
+        left: float,
+        width: float,
+        top: float = 0,
+    ) -> None:
+        draw.text(
+            (left + width, top + 10),
+            f"Last Updated: {params['update_time']}",
+            font=get_font("Lexend-Light.ttf", 13),
+            fill=TEXT_COLOR,
+            anchor="ra",
+        )
+
+        max_width = width * 0.95
+        y = top + 45
+        for day, day_events in zip(params["cal_days"], params["cal_days_events"]):
+            if y >= self.cfg.IMAGE_HEIGHT:
+                break
+            draw.text((left, y), day, font=get_font("Lexend-Regular.ttf", 30), fill=TEXT_COLOR)
+            y += 48
+            for event in day_events:
+                if y >= self.cfg.IMAGE_HEIGHT:
+                    break
+                self.draw_event(draw, event, left, y, max_width)
+                y += 34
+            y += 20
+
+    def draw_event(
+        self,
+        draw: ImageDraw.ImageDraw,
+        event: Dict[str, Optional[str]],
+        left: float,
+        y: float,
+        max_width: float,
+    ) -> None:
+        font = get_font("Lexend-Regular.ttf", 24)
+        segments: List[Tuple[str, int, ImageFont.FreeTypeFont]] = [("• ", TEXT_COLOR, font)]
+        if event["time"] is not None:
+            segments.append((event["time"] + " ", GRAY_COLOR, font))
+        segments.append((event["summary"] or "", TEXT_COLOR, font))
+        if event["location"] is not None:
+            segments.append((" at " + event["location"], GRAY_COLOR, font))
+        if event["calendar_name"] is not None:
+            segments.append(
+                (f" ({event['calendar_name']})", TEXT_COLOR, get_font("Lexend-Regular.ttf", 20))
+            )
+
+        # Draw the segments one after the other and cut off overflowing text with an ellipsis
+        x = left
+        for text, fill, segment_font in segments:
+            remaining = left + max_width - x
+            text_width = segment_font.getlength(text)
+            if text_width > remaining:
+                draw.text(
+                    (x, y),
+                    self.truncate(text, segment_font, remaining),
+                    font=segment_font,
+                    fill=fill,
+                )
+                return
+            draw.text((x, y), text, font=segment_font, fill=fill)
+            x += text_width
+
+    @classmethod
+    def truncate(cls, text: str, font: ImageFont.FreeTypeFont, max_width: float) -> str:
+        # Binary search for the longest prefix that still fits including the ellipsis
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if font.getlength(text[:mid] + "…") <= max_width:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + "…"
@@ -1,32 +1,59 @@
 """
-This script essentially generates a HTML file of the calendar I wish to display. It then fires up a headless Chrome
-instance, sized to the resolution of the eInk display and takes a screenshot.
+This script essentially generates a HTML file of the calendar I wish to display. It then borrows a warm headless Chrome
+instance from the pool, sized to the resolution of the eInk display and takes a screenshot. Every render uses its own
+temporary HTML file so that concurrent renders don't interfere with each other.
 """
 
 import datetime as dt
-import os
+import functools
 import pathlib
 import string
-import subprocess
-from time import sleep
-from typing import Any, Dict, List
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
 
 import structlog
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
 
 from config import DashboardConfig
+from ics_cal.event import DayEvent
+from metrics import time_stage
+from render.chrome_pool import ChromePool
+
+
+# The page is ready once the DOM and all webfonts are loaded. The template can additionally delay the screenshot by
+# setting data-ready="false" on the html tag and flipping it to "true" once it's done.
+PAGE_READY_SCRIPT = """
+return document.readyState === "complete"
+    && document.fonts.status === "loaded"
+    && document.documentElement.dataset.ready !== "false";
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_environment(auto_reload: bool = False) -> Environment:
+    """
+    The environment is shared by all renders of the process so that the template is only compiled once. Compiled
+    templates are additionally kept in an on-disk bytecode cache for faster cold starts.
+    """
+
+    return Environment(
+        loader=FileSystemLoader(pathlib.Path(__file__).parent.absolute()),
+        bytecode_cache=FileSystemBytecodeCache(),
+        auto_reload=auto_reload,
+    )
 
 
 class RenderHelper:
-    def __init__(self, cfg: DashboardConfig) -> None:
+    def __init__(self, cfg: DashboardConfig, chrome_pool: Optional[ChromePool] = None) -> None:
         self.logger = structlog.get_logger()
         self.currPath = str(pathlib.Path(__file__).parent.absolute())
-        self.htmlFile = "file://" + self.currPath + "/dashboard.html"
         self.cfg = cfg
+        self.chrome_pool = chrome_pool
 
     def set_viewport_size(self, driver: webdriver.Chrome) -> None:
         # Extract the current window size from the driver
@@ -43,119 +70,90 @@ class RenderHelper:
 
         driver.set_window_rect(width=target_width, height=target_height)
 
-    def get_screenshot(self, path_to_server_image: str) -> None:
-        opts = Options()
-        opts.add_argument("--disable-dev-shm-usage")
-        opts.add_argument("--disable-gpu")
-        opts.add_argument("--disable-extensions")
-        opts.add_argument("--force-device-scale-factor=1")
-        opts.add_argument("--headless")
-        opts.add_argument("--hide-scrollbars")
-        opts.add_argument("--no-sandbox")
-
-        # Try to automatically locate chromedriver, source: https://github.com/fdmarcin/MagInkDash-updated
+    def wait_until_ready(self, driver: webdriver.Chrome) -> None:
+        start_time = time.time()
         try:
-            chromedriver_path = (
-                subprocess.check_output(["which", "chromedriver"]).decode("utf-8").strip()
+            WebDriverWait(driver, self.cfg.RENDER_TIMEOUT, poll_frequency=0.02).until(
+                lambda d: d.execute_script(PAGE_READY_SCRIPT)
+            )
+            self.logger.info(f"Page ready after {round(time.time() - start_time, 3)} seconds.")
+        except TimeoutException:
+            self.logger.warning(
+                f"Page not ready after {self.cfg.RENDER_TIMEOUT} seconds, taking screenshot anyway."
             )
-            self.logger.info(f"Found chromedriver at: {chromedriver_path}")
-        except (subprocess.SubprocessError, FileNotFoundError):
-            # Default paths to try if 'which' command fails
-            possible_paths = [
-                "/usr/bin/chromedriver",
-                "/usr/local/bin/chromedriver",
-                "/usr/lib/chromium-browser/chromedriver",
-            ]
-
-            chromedriver_path = None
-            for path in possible_paths:
-                if os.path.exists(path) and os.access(path, os.X_OK):
-                    chromedriver_path = path
-                    self.logger.info(f"Found chromedriver at default location: {chromedriver_path}")
-                    break
-
-            if not chromedriver_path:
-                self.logger.error(
-                    "Could not find chromedriver. Please install it with 'sudo apt-get install chromium-chromedriver'"
-                )
-                raise FileNotFoundError("chromedriver executable not found in PATH")
-
-        # Use the discovered chromedriver path
-        service = Service(chromedriver_path)
+
+    def get_screenshot(self, html_file: str) -> bytes:
+        if self.chrome_pool is None:
+            self.chrome_pool = ChromePool()
 
         try:
-            driver = webdriver.Chrome(service=service, options=opts)
-            self.set_viewport_size(driver)
-            driver.get(self.htmlFile)
-            sleep(1)
-            driver.get_screenshot_as_file(self.currPath + "/dashboard.png")
-            driver.get_screenshot_as_file(path_to_server_image)
-            driver.quit()  # Make sure to quit the driver to free resources
-            self.logger.debug(f"Screenshot captured and saved to file {path_to_server_image}.")
+            with self.chrome_pool.session() as session:
+                viewport = (self.cfg.IMAGE_WIDTH, self.cfg.IMAGE_HEIGHT)
+                if session.viewport != viewport:
+                    self.set_viewport_size(session.driver)
+                    session.viewport = viewport
+                with time_stage("page_load"):
+                    session.driver.get(html_file)
+                with time_stage("page_wait"):
+                    self.wait_until_ready(session.driver)
+                with time_stage("screenshot"):
+                    image = session.driver.get_screenshot_as_png()
+            self.logger.debug("Screenshot captured.")
+            return image
         except Exception as e:
             self.logger.error(f"Error taking screenshot: {str(e)}")
             raise
 
-    def process_inputs(
+    def get_template_params(
         self,
         current_time: dt.datetime,
         current_weather: Dict[str, Any],
         hourly_forecast: List[Dict[str, Any]],
         daily_forecast: List[Dict[str, Any]],
-        events: Dict[dt.date, List[Dict[str, Any]]],
-        path_to_server_image: str,
-    ) -> None:
-        # Read html template
-        environment = Environment(loader=FileSystemLoader(self.currPath))
-        dashboard_template = environment.get_template("dashboard_template.html.j2")
+        events: Dict[dt.date, List[DayEvent]],
+    ) -> Dict[str, Any]:
+        """
+        Returns everything that is shown on the dashboard as plain values, independent of the rendering backend.
+        """
 
         current_date = current_time.date()
 
         # Populate the date and events
-        cal_events_days: List[str] = []
-        cal_events_list: List[str] = []
+        cal_days: List[str] = []
+        cal_days_events: List[List[Dict[str, Optional[str]]]] = []
         for d, e in events.items():
-            cal_events_text = ""
+            day_events: List[Dict[str, Optional[str]]] = []
             for event in e:
-                cal_events_text += '<div class="event">'
+                day_event: Dict[str, Optional[str]] = {
+                    "time": None,
+                    "summary": event.summary,
+                    "location": None,
+                    "calendar_name": None,
+                }
                 # All-day events or continuations from yesterday start at midnight
-                if event["startDatetime"].time() == dt.time(0, 0, 0):
-                    cal_events_text += event["summary"]
-                else:
-                    cal_events_text += (
-                        '<span class="event-time">'
-                        + self.format_time(event["startDatetime"])
-                        + "</span> "
-                        + event["summary"]
-                    )
+                if event.start_datetime.time() != dt.time(0, 0, 0):
+                    day_event["time"] = self.format_time(event.start_datetime)
                 # Some clients set the location to empty string
-                if "location" in event and event["location"] != "":
-                    cal_events_text += (
-                        '<span class="event-location"> at ' + event["location"] + "</span>"
-                    )
-                if self.cfg.SHOW_CALENDAR_NAME and event["calendarName"] is not None:
-                    cal_events_text += (
-                        '<span class="event-calendar-name"> (' + event["calendarName"] + ")</span>"
-                    )
-                cal_events_text += "</div>\n"
+                if event.location:
+                    day_event["location"] = event.location
+                if self.cfg.SHOW_CALENDAR_NAME and event.calendar_name is not None:
+                    day_event["calendar_name"] = event.calendar_name
+                day_events.append(day_event)
             if d == current_date:
-                cal_events_days.append("Today")
+                cal_days.append("Today")
             elif d == current_date + dt.timedelta(days=1):
-                cal_events_days.append("Tomorrow")
+                cal_days.append("Tomorrow")
             else:
-                cal_events_days.append(d.strftime("%A (%B %-d)"))
-            cal_events_list.append(cal_events_text)
+                cal_days.append(d.strftime("%A (%B %-d)"))
+            cal_days_events.append(day_events)
 
-        if len(cal_events_days) == 0:
-            cal_events_days.append("Next Days")
-            cal_events_list.append(
-                '<div class="event"><span class="event-time">No Events</span></div>'
+        if len(cal_days) == 0:
+            cal_days.append("Next Days")
+            cal_days_events.append(
+                [{"time": "No Events", "summary": "", "location": None, "calendar_name": None}]
             )
 
-        self.extend_list(cal_events_days, self.cfg.NUM_CAL_DAYS_TO_QUERY, "")
-        self.extend_list(cal_events_list, self.cfg.NUM_CAL_DAYS_TO_QUERY, "")
-
-        weather_add_info = "&nbsp;"
+        weather_add_info = ""
         if self.cfg.SHOW_ADDITIONAL_WEATHER:
             additional_infos = []
             if round(current_weather["temp"]) != round(current_weather["feels_like"]):
@@ -170,40 +168,71 @@ class RenderHelper:
         if self.cfg.SHOW_MOON_PHASE:
             today_moon_phase = self.wi_moon_phase(daily_forecast[0]["moon_phase"])
 
-        # Append the bottom and write the file
-        htmlFile = open(self.currPath + "/dashboard.html", "w")
-        htmlFile.write(
-            dashboard_template.render(
-                update_time=f"{current_time.strftime('%B %-d')}, {self.format_time(current_time)}",
-                day=current_date.strftime("%-d"),
-                month=current_date.strftime("%B"),
-                weekday=current_date.strftime("%A"),
-                dayaftertomorrow=(current_date + dt.timedelta(days=2)).strftime("%A"),
-                cal_days=cal_events_days,
-                cal_days_events=cal_events_list,
-                # I'm choosing to show the forecast for the next hour instead of the current weather
-                current_weather_text=string.capwords(current_weather["weather"][0]["description"]),
-                current_weather_id=current_weather["weather"][0]["id"],
-                current_weather_temp=f"{round(current_weather['temp'])}°",
-                current_weather_add_info=weather_add_info,
-                today_weather_id=daily_forecast[0]["weather"][0]["id"],
-                tomorrow_weather_id=daily_forecast[1]["weather"][0]["id"],
-                dayafter_weather_id=daily_forecast[2]["weather"][0]["id"],
-                today_weather_pop=str(round(daily_forecast[0]["pop"] * 100)),
-                tomorrow_weather_pop=str(round(daily_forecast[1]["pop"] * 100)),
-                dayafter_weather_pop=str(round(daily_forecast[2]["pop"] * 100)),
-                today_weather_min=str(round(daily_forecast[0]["temp"]["min"])),
-                tomorrow_weather_min=str(round(daily_forecast[1]["temp"]["min"])),
-                dayafter_weather_min=str(round(daily_forecast[2]["temp"]["min"])),
-                today_weather_max=str(round(daily_forecast[0]["temp"]["max"])),
-                tomorrow_weather_max=str(round(daily_forecast[1]["temp"]["max"])),
-                dayafter_weather_max=str(round(daily_forecast[2]["temp"]["max"])),
-                today_moon_phase=today_moon_phase,
-            )
+        return {
+            "update_time": f"{current_time.strftime('%B %-d')}, {self.format_time(current_time)}",
+            "day": current_date.strftime("%-d"),
+            "month": current_date.strftime("%B"),
+            "weekday": current_date.strftime("%A"),
+            "dayaftertomorrow": (current_date + dt.timedelta(days=2)).strftime("%A"),
+            "cal_days": cal_days,
+            "cal_days_events": cal_days_events,
+            # I'm choosing to show the forecast for the next hour instead of the current weather
+            "current_weather_text": string.capwords(current_weather["weather"][0]["description"]),
+            "current_weather_id": current_weather["weather"][0]["id"],
+            "current_weather_temp": f"{round(current_weather['temp'])}°",
+            "current_weather_add_info": weather_add_info,
+            "today_weather_id": daily_forecast[0]["weather"][0]["id"],
+            "tomorrow_weather_id": daily_forecast[1]["weather"][0]["id"],
+            "dayafter_weather_id": daily_forecast[2]["weather"][0]["id"],
+            "today_weather_pop": str(round(daily_forecast[0]["pop"] * 100)),
+            "tomorrow_weather_pop": str(round(daily_forecast[1]["pop"] * 100)),
+            "dayafter_weather_pop": str(round(daily_forecast[2]["pop"] * 100)),
+            "today_weather_min": str(round(daily_forecast[0]["temp"]["min"])),
+            "tomorrow_weather_min": str(round(daily_forecast[1]["temp"]["min"])),
+            "dayafter_weather_min": str(round(daily_forecast[2]["temp"]["min"])),
+            "today_weather_max": str(round(daily_forecast[0]["temp"]["max"])),
+            "tomorrow_weather_max": str(round(daily_forecast[1]["temp"]["max"])),
+            "dayafter_weather_max": str(round(daily_forecast[2]["temp"]["max"])),
+            "today_moon_phase": today_moon_phase,
+        }
+
+    def render_html(self, params: Dict[str, Any]) -> str:
+        dashboard_template = get_template_environment(self.cfg.TEMPLATE_AUTO_RELOAD).get_template(
+            "dashboard_template.html.j2"
         )
-        htmlFile.close()
 
-        self.get_screenshot(path_to_server_image)
+        cal_days = list(params["cal_days"])
+        cal_days_events = list(params["cal_days_events"])
+        num_days = self.cfg.NUM_CAL_DAYS_TO_DISPLAY or self.cfg.NUM_CAL_DAYS_TO_QUERY
+        self.extend_list(cal_days, num_days, "")
+        self.extend_list(cal_days_events, num_days, [])
+
+        return dashboard_template.render(
+            {**params, "cal_days": cal_days, "cal_days_events": cal_days_events}
+        )
+
+    def render(self, params: Dict[str, Any]) -> bytes:
+        # Every render gets its own HTML file next to the template so that the relative CSS and font paths resolve
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.currPath, prefix=".dashboard-", suffix=".html"
+        ) as htmlFile:
+            with time_stage("template_render"):
+                htmlFile.write(self.render_html(params))
+            htmlFile.flush()
+            return self.get_screenshot("file://" + htmlFile.name)
+
+    def process_inputs(
+        self,
+        current_time: dt.datetime,
+        current_weather: Dict[str, Any],
+        hourly_forecast: List[Dict[str, Any]],
+        daily_forecast: List[Dict[str, Any]],
+        events: Dict[dt.date, List[DayEvent]],
+    ) -> bytes:
+        params = self.get_template_params(
+            current_time, current_weather, hourly_forecast, daily_forecast, events
+        )
+        return self.render(params)
 
     def format_time(self, datetimeObj: dt.datetime) -> str:
         if self.cfg.USE_24H_FORMAT:
@@ -212,7 +241,7 @@ class RenderHelper:
             return datetimeObj.strftime("%-I:%M%p").replace(":00", "").lower()
 
     @classmethod
-    def extend_list(cls, my_list: List[str], new_length: int, default_value: str) -> None:
+    def extend_list(cls, my_list: List[Any], new_length: int, default_value: Any) -> None:
         return my_list.extend([default_value] * (new_length - len(my_list)))
 
     @classmethod
@@ -0,0 +1,56 @@
+"""
+This keeps the last rendered image in memory together with a hash of everything that is shown on it, so that the
+image doesn't need to be rendered again as long as the weather, events and update time on the dashboard are the same.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+
+class RenderCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._key: Optional[str] = None
+        self._image: Optional[bytes] = None
+        self._render_seconds = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @classmethod
+    def get_key(cls, params: Dict[str, Any]) -> str:
+        """Canonical hash of the template parameters, i.e. the values actually displayed on the dashboard."""
+        canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key == self._key and self._image is not None:
+                self.hits += 1
+                self.saved_seconds += self._render_seconds
+                return self._image
+            self.misses += 1
+            return None
+
+    def get_last(self) -> Optional[bytes]:
+        """Returns the last rendered image regardless of what it shows, e.g. when fresh data isn't available."""
+        with self._lock:
+            return self._image
+
+    def put(self, key: str, image: bytes, render_seconds: float) -> None:
+        with self._lock:
+            self._key = key
+            self._image = image
+            self._render_seconds = render_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+                "saved_render_seconds": round(self.saved_seconds, 3),
+            }
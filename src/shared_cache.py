@@ -0,0 +1,115 @@
+"""
+This shares fetched data and rendered images between the worker processes of one server, e.g. when uvicorn runs with
+several workers. Entries are files in a local directory that are written atomically and read memory-mapped, and a file
+lock per key makes sure that only one worker refreshes an entry while the others wait and then reuse its result.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+import structlog
+
+from atomic_file import atomic_write
+
+
+class SharedEntry(NamedTuple):
+    data: bytes
+    version: str
+    stored_at: float
+
+
+class SharedCache:
+    def __init__(self, cache_dir: str) -> None:
+        self.logger = structlog.get_logger()
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.lock_wait_seconds = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_path(self, key: str, suffix: str = ".bin") -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + suffix
+        )
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(
+        self, key: str, version: Optional[str] = None, newer_than: float = 0.0
+    ) -> Optional[SharedEntry]:
+        """
+        Returns the entry for the key, or None if there is none, it has a different version or it wasn't stored after
+        newer_than. Only the version line is read before the entry is known to match.
+        """
+
+        try:
+            with open(self.get_path(key), "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size == 0 or stat.st_mtime <= newer_than:
+                    self._count(False)
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    newline = m.find(b"\n")
+                    entry_version = m[:newline].decode("utf-8") if newline >= 0 else None
+                    if entry_version is None or (version is not None and entry_version != version):
+                        self._count(False)
+                        return None
+                    data = m[newline + 1 :]
+        except FileNotFoundError:
+            self._count(False)
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable shared cache file: {e}")
+            self._count(False)
+            return None
+
+        self._count(True)
+        return SharedEntry(data, entry_version, stat.st_mtime)
+
+    def put(self, key: str, data: bytes, version: str = "") -> Optional[float]:
+        """Stores the entry and returns when it was stored, or None if it couldn't be written."""
+        # Written atomically so that other workers never read a half-written entry
+        try:
+            atomic_write(self.get_path(key), version.encode("utf-8") + b"\n" + data)
+            stored_at = os.stat(self.get_path(key)).st_mtime
+        except OSError as e:
+            self.logger.warning(f"Could not write shared cache file: {e}")
+            return None
+        with self._lock:
+            self.writes += 1
+        return stored_at
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """Holds an exclusive lock on the key across all workers, and across threads within a worker."""
+        start_time = time.time()
+        with open(self.get_path(key, ".lock"), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            with self._lock:
+                self.lock_wait_seconds += time.time() - start_time
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "lock_wait_seconds": round(self.lock_wait_seconds, 3),
+            }
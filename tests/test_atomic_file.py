@@ -0,0 +1,32 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from atomic_file import atomic_write
+
+
+class TestAtomicWrite:
+    """Test suite for atomic_write."""
+
+    def test_replaces_file(self, tmp_path):
+        """Test that the file is replaced and no temporary file is left behind."""
+        path = tmp_path / "cache.json"
+        path.write_bytes(b"old")
+        atomic_write(str(path), b"new")
+        assert path.read_bytes() == b"new"
+        assert os.listdir(tmp_path) == ["cache.json"]
+
+    def test_failed_replace_keeps_file(self, tmp_path):
+        """Test that the old content survives a failed write and the temporary file is removed."""
+        path = tmp_path / "cache.json"
+        path.write_bytes(b"old")
+        with patch("atomic_file.os.replace", side_effect=OSError("read-only")):
+            with pytest.raises(OSError):
+                atomic_write(str(path), b"new")
+        assert path.read_bytes() == b"old"
+        assert os.listdir(tmp_path) == ["cache.json"]
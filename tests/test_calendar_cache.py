@@ -0,0 +1,165 @@
+import datetime as dt
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+import pytz
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.calendar_cache import (
+    LOCALIZED_OCCURRENCE_BYTES,
+    OCCURRENCE_BYTES,
+    PARSED_BYTES_PER_BYTE,
+    CachedCalendar,
+    CalendarCache,
+)
+
+DAILY_ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//Test Calendar//EN
+X-WR-CALNAME:Family
+BEGIN:VEVENT
+DTSTART:20240827T100000Z
+DTEND:20240827T110000Z
+RRULE:FREQ=DAILY
+SUMMARY:Daily Event
+UID:daily
+END:VEVENT
+END:VCALENDAR"""
+
+
+def day(d):
+    return dt.datetime(2024, 8, d, tzinfo=dt.timezone.utc)
+
+
+def starts(occurrences):
+    return [start.day for start, _, _ in occurrences]
+
+
+class TestCachedCalendar:
+    """Test suite for the CachedCalendar class."""
+
+    def test_between(self):
+        """Test that occurrences of a recurring event are expanded."""
+        calendar = CachedCalendar(DAILY_ICS)
+        assert calendar.name == "Family"
+        assert starts(calendar.between(day(27), day(30), pytz.utc)) == [27, 28, 29]
+
+    def test_window_slides_forward(self):
+        """Test that only the newly exposed day is expanded when the window slides forward."""
+        calendar = CachedCalendar(DAILY_ICS)
+        calendar.between(day(27), day(30), pytz.utc)
+        with patch.object(calendar._query, "between", wraps=calendar._query.between) as between:
+            events = calendar.between(day(28), day(31), pytz.utc)
+        between.assert_called_once_with(day(30), day(31))
+        assert starts(events) == [27, 28, 29, 30]
+
+    def test_old_occurrences_dropped(self):
+        """Test that occurrences ending more than a day before the window are dropped as the window slides."""
+        calendar = CachedCalendar(DAILY_ICS)
+        calendar.between(day(27), day(30), pytz.utc)
+        assert starts(calendar.between(day(28), day(31), pytz.utc)) == [27, 28, 29, 30]
+        assert starts(calendar.between(day(29), day(31), pytz.utc)) == [28, 29, 30]
+
+    def test_size_includes_occurrences(self):
+        """Test that the estimated size grows with the expanded and converted occurrences."""
+        calendar = CachedCalendar(DAILY_ICS)
+        assert calendar.size == len(DAILY_ICS) * PARSED_BYTES_PER_BYTE
+        calendar.between(day(1), day(31), pytz.utc)
+        assert calendar.size == len(DAILY_ICS) * PARSED_BYTES_PER_BYTE + 4 * (
+            OCCURRENCE_BYTES + LOCALIZED_OCCURRENCE_BYTES
+        )
+
+    def test_localized(self):
+        """Test that the occurrences are converted to the time zone, sorted and reused until the next expansion."""
+        calendar = CachedCalendar(DAILY_ICS)
+        berlin = pytz.timezone("Europe/Berlin")
+        localized = calendar.between(day(27), day(30), berlin)
+        assert [start.hour for start, _, _ in localized] == [12, 12, 12]
+        assert starts(localized) == [27, 28, 29]
+        assert calendar.between(day(27), day(30), berlin) is localized
+        assert len(calendar.between(day(27), day(31), berlin)) == 4
+
+    def test_interleaved_windows(self):
+        """Test that a request keeps the occurrences of its own window when another time zone starts over."""
+        calendar = CachedCalendar(DAILY_ICS)
+        los_angeles = pytz.timezone("America/Los_Angeles")
+        berlin = pytz.timezone("Europe/Berlin")
+        la_start = los_angeles.localize(dt.datetime(2024, 8, 27))
+        berlin_start = berlin.localize(dt.datetime(2024, 8, 27))
+
+        la_occurrences = calendar.between(la_start, la_start + dt.timedelta(days=3), los_angeles)
+        # Midnight in Berlin is before midnight in Los Angeles, so this window starts over
+        berlin_occurrences = calendar.between(
+            berlin_start, berlin_start + dt.timedelta(days=2), berlin
+        )
+        assert starts(la_occurrences) == [27, 28, 29]
+        assert starts(berlin_occurrences) == [27, 28]
+        assert starts(calendar.between(la_start, la_start + dt.timedelta(days=3), los_angeles)) == [
+            27,
+            28,
+            29,
+        ]
+
+    def test_window_within_cached(self):
+        """Test that a window inside the expanded one doesn't expand anything."""
+        calendar = CachedCalendar(DAILY_ICS)
+        calendar.between(day(27), day(30), pytz.utc)
+        with patch.object(calendar._query, "between") as between:
+            calendar.between(day(27), day(29), pytz.utc)
+        between.assert_not_called()
+
+    def test_window_moves_backwards(self):
+        """Test that the occurrences are expanded again when the window moves backwards."""
+        calendar = CachedCalendar(DAILY_ICS)
+        calendar.between(day(28), day(30), pytz.utc)
+        assert starts(calendar.between(day(27), day(29), pytz.utc)) == [27, 28]
+
+    def test_invalid_calendar(self):
+        """Test that an invalid feed raises ValueError."""
+        with pytest.raises(ValueError):
+            CachedCalendar("not a calendar")
+
+
+class TestCalendarCache:
+    """Test suite for the CalendarCache class."""
+
+    def test_same_content_parsed_once(self):
+        """Test that the same feed content returns the same parsed calendar."""
+        cache = CalendarCache()
+        assert cache.get(DAILY_ICS) is cache.get(DAILY_ICS)
+        assert cache.get_stats() == {
+            "calendars": 1,
+            "bytes": len(DAILY_ICS) * PARSED_BYTES_PER_BYTE,
+            "hits": 1,
+            "misses": 1,
+        }
+
+    def test_eviction(self):
+        """Test that the least recently used calendars are evicted once the limit is exceeded."""
+        other_ics = DAILY_ICS.replace("Daily Event", "Other Event")
+        cache = CalendarCache(
+            max_bytes=(len(DAILY_ICS) + len(other_ics)) * PARSED_BYTES_PER_BYTE - 1
+        )
+        first = cache.get(DAILY_ICS)
+        cache.get(other_ics)
+        assert cache.get_stats()["calendars"] == 1
+        assert cache.get(DAILY_ICS) is not first
+
+    def test_eviction_after_expansion(self):
+        """Test that calendars growing by their expanded occurrences are evicted."""
+        other_ics = DAILY_ICS.replace("Daily Event", "Other Event")
+        cache = CalendarCache(
+            max_bytes=(len(DAILY_ICS) + len(other_ics)) * PARSED_BYTES_PER_BYTE
+            + 10 * OCCURRENCE_BYTES
+        )
+        cache.get(DAILY_ICS)
+        cache.get(other_ics).between(
+            day(27), dt.datetime(2024, 9, 27, tzinfo=dt.timezone.utc), pytz.utc
+        )
+        assert cache.get_stats()["calendars"] == 2
+        cache.evict()
+        assert cache.get_stats()["calendars"] == 1
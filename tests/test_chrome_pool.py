@@ -0,0 +1,105 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from render.chrome_pool import ChromePool
+
+
+@pytest.fixture
+def driver_factory():
+    """Provides a factory for mock WebDriver sessions."""
+    return MagicMock(side_effect=lambda: MagicMock())
+
+
+class TestChromePool:
+    """Test suite for ChromePool class."""
+
+    def test_start_prewarms_sessions(self, driver_factory):
+        """Test that start creates as many sessions as the pool size."""
+        pool = ChromePool(size=2, driver_factory=driver_factory)
+        pool.start()
+        assert driver_factory.call_count == 2
+
+    def test_session_is_reused(self, driver_factory):
+        """Test that a returned session is handed out again."""
+        pool = ChromePool(size=1, driver_factory=driver_factory)
+        with pool.session() as first:
+            pass
+        with pool.session() as second:
+            pass
+        assert first is second
+        assert second.renders == 2
+        assert driver_factory.call_count == 1
+
+    def test_session_recycled_after_max_renders(self, driver_factory):
+        """Test that a session is quit and replaced after max_renders renders."""
+        pool = ChromePool(size=1, max_renders=2, driver_factory=driver_factory)
+        with pool.session() as first:
+            pass
+        with pool.session():
+            pass
+        first.driver.quit.assert_called_once()
+        with pool.session() as third:
+            pass
+        assert third is not first
+        assert driver_factory.call_count == 2
+
+    def test_session_recycled_after_max_age(self, driver_factory):
+        """Test that a session older than max_age is replaced before it is handed out."""
+        pool = ChromePool(size=1, max_age=0, driver_factory=driver_factory)
+        with pool.session() as first:
+            pass
+        with pool.session() as second:
+            pass
+        assert first is not second
+        first.driver.quit.assert_called_once()
+
+    def test_unhealthy_session_is_replaced(self, driver_factory):
+        """Test that an idle session failing the health check is discarded."""
+        pool = ChromePool(size=1, driver_factory=driver_factory)
+        with pool.session() as first:
+            pass
+        first.driver.execute_script.side_effect = Exception("chrome crashed")
+        with pool.session() as second:
+            pass
+        assert first is not second
+        first.driver.quit.assert_called_once()
+
+    def test_session_discarded_on_error(self, driver_factory):
+        """Test that a session is not handed out again after an error during a render."""
+        pool = ChromePool(size=1, driver_factory=driver_factory)
+        with pytest.raises(ValueError):
+            with pool.session() as first:
+                raise ValueError("render failed")
+        first.driver.quit.assert_called_once()
+        with pool.session() as second:
+            pass
+        assert first is not second
+
+    def test_close_quits_idle_sessions(self, driver_factory):
+        """Test that close quits all idle sessions and rejects new borrows."""
+        drivers = [MagicMock(), MagicMock()]
+        pool = ChromePool(size=2, driver_factory=MagicMock(side_effect=drivers))
+        pool.start()
+        pool.close()
+        for driver in drivers:
+            driver.quit.assert_called_once()
+        with pytest.raises(RuntimeError):
+            with pool.session():
+                pass
+
+    @pytest.mark.skipif(not os.path.isdir("/proc"), reason="Requires /proc")
+    def test_rss_bytes(self, driver_factory):
+        """Test that the memory of the processes behind live sessions is reported."""
+        pool = ChromePool(size=1, driver_factory=driver_factory)
+        assert pool.get_rss_bytes() == 0
+        with pool.session() as session:
+            session.driver.service.process.pid = os.getpid()
+            assert pool.get_rss_bytes() > 0
+        pool.close()
+        assert pool.get_rss_bytes() == 0
@@ -7,7 +7,7 @@ from unittest.mock import patch
 # Add the src directory to the path so we can import the modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from config import DashboardConfig
+from config import DashboardConfig, load_profiles
 from owm.owm import WeatherUnits
 
 
@@ -298,3 +298,53 @@ class TestDashboardConfig:
 
             assert config1 is config2
             assert id(config1) == id(config2)
+
+
+class TestLoadProfiles:
+    """Test suite for loading dashboard profiles from a TOML file."""
+
+    ENV = {
+        "ICS_URL": "https://example.com/calendar.ics",
+        "OWM_API_KEY": "test_api_key",
+        "LAT": "37.7749",
+        "LNG": "-122.4194",
+    }
+
+    def write_profiles(self, tmp_path, content):
+        path = tmp_path / "profiles.toml"
+        path.write_text(content)
+        return str(path)
+
+    def test_profiles_fall_back_to_env(self, tmp_path):
+        """Test that profiles override some settings and take the rest from the environment."""
+        path = self.write_profiles(
+            tmp_path,
+            """
+[profiles.kitchen]
+ICS_URL = ["https://example.com/a.ics", "https://example.com/b.ics"]
+LAT = 40.7128
+IMAGE_WIDTH = 800
+SHOW_MOON_PHASE = true
+""",
+        )
+        profiles = load_profiles(path, self.ENV)
+
+        assert list(profiles) == ["kitchen"]
+        kitchen = profiles["kitchen"]
+        assert kitchen.ICS_URL == "https://example.com/a.ics|https://example.com/b.ics"
+        assert kitchen.LAT == 40.7128
+        assert kitchen.LNG == -122.4194
+        assert kitchen.IMAGE_WIDTH == 800
+        assert kitchen.SHOW_MOON_PHASE is True
+        assert kitchen.OWM_API_KEY == "test_api_key"
+
+    def test_no_profiles(self, tmp_path):
+        """Test that a file without profiles table yields no profiles."""
+        assert load_profiles(self.write_profiles(tmp_path, ""), self.ENV) == {}
+
+    @pytest.mark.parametrize("name", ["default", "etag", "kitchen.raw", "Kitchen Display"])
+    def test_invalid_profile_name(self, tmp_path, name):
+        """Test that profile names which clash with routes or aren't URL friendly are rejected."""
+        path = self.write_profiles(tmp_path, f'[profiles."{name}"]\nLAT = 1.0\n')
+        with pytest.raises(ValueError):
+            load_profiles(path, self.ENV)
@@ -0,0 +1,71 @@
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from render.encode import Dither, OutputMode, bayer_matrix, encode_png, quantize
+
+
+@pytest.fixture
+def gradient():
+    """Provides a horizontal gradient from black to white."""
+    image = Image.new("L", (256, 16))
+    image.putdata([x for _ in range(16) for x in range(256)])
+    return image.convert("RGB")
+
+
+def to_png(image):
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+class TestEncode:
+    """Test suite for the E-Ink output encoder."""
+
+    def test_bayer_matrix(self):
+        """Test the Bayer threshold matrix contains every threshold exactly once."""
+        assert bayer_matrix(2) == [[0, 2], [3, 1]]
+        assert sorted(v for row in bayer_matrix(8) for v in row) == list(range(64))
+
+    @pytest.mark.parametrize("dither", list(Dither))
+    @pytest.mark.parametrize("levels", [2, 8])
+    def test_quantize_levels(self, gradient, dither, levels):
+        """Test that quantized pixels only use the available levels and keep black and white."""
+        indices = quantize(gradient, levels, dither)
+        assert indices.mode == "L"
+        assert indices.size == gradient.size
+        assert indices.getextrema() == (0, levels - 1)
+        assert indices.getpixel((0, 0)) == 0
+        assert indices.getpixel((255, 0)) == levels - 1
+
+    def test_quantize_none_rounds(self, gradient):
+        """Test that quantization without dithering rounds to the nearest level."""
+        indices = quantize(gradient, 8, Dither.none)
+        assert indices.getpixel((36, 0)) == 1
+        assert indices.getpixel((128, 0)) == 4
+
+    @pytest.mark.parametrize("dither", [Dither.ordered, Dither.floyd_steinberg])
+    def test_quantize_dither_preserves_mean(self, dither):
+        """Test that dithering a flat gray keeps its average brightness."""
+        gray = Image.new("RGB", (64, 64), (128, 128, 128))
+        indices = quantize(gray, 2, dither)
+        white = indices.histogram()[1]
+        assert 0.4 < white / (64 * 64) < 0.6
+
+    def test_encode_png_color_unchanged(self, gradient):
+        """Test that the color mode returns the rendered image as is."""
+        png = to_png(gradient)
+        assert encode_png(png, OutputMode.color, Dither.none) is png
+
+    @pytest.mark.parametrize("mode, colors", [(OutputMode.gray_3bit, 8), (OutputMode.mono_1bit, 2)])
+    def test_encode_png_palettized(self, gradient, mode, colors):
+        """Test that the encoded image is a palettized PNG with the panel's gray levels."""
+        encoded = Image.open(io.BytesIO(encode_png(to_png(gradient), mode, Dither.ordered)))
+        assert encoded.mode == "P"
+        assert len(encoded.getcolors()) == colors
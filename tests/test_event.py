@@ -0,0 +1,74 @@
+import dataclasses
+import datetime as dt
+import os
+import sys
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.event import Event, EventDay
+
+
+@pytest.fixture
+def multiday_event():
+    """Provides an event spanning three days."""
+    return Event(
+        summary="Vacation",
+        start_datetime=dt.datetime(2024, 8, 27, 16, 0, 0),
+        end_datetime=dt.datetime(2024, 8, 29, 12, 0, 0),
+        calendar_name="Family",
+        location="Beach",
+    )
+
+
+class TestEvent:
+    """Test suite for the Event and EventDay classes."""
+
+    def test_immutable(self, multiday_event):
+        """Test that events can't be modified."""
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            multiday_event.summary = "Work"
+
+    def test_slots(self, multiday_event):
+        """Test that events and days don't carry an instance dictionary."""
+        assert not hasattr(multiday_event, "__dict__")
+        assert not hasattr(EventDay(multiday_event, dt.date(2024, 8, 28)), "__dict__")
+
+    def test_is_multiday(self, multiday_event):
+        """Test that events crossing midnight are multi-day events."""
+        assert multiday_event.is_multiday
+        assert not dataclasses.replace(
+            multiday_event, end_datetime=dt.datetime(2024, 8, 27, 18, 0, 0)
+        ).is_multiday
+
+    @pytest.mark.parametrize(
+        "date, start, end",
+        [
+            (
+                dt.date(2024, 8, 27),
+                dt.datetime(2024, 8, 27, 16, 0, 0),
+                dt.datetime(2024, 8, 27, 23, 59, 59),
+            ),
+            (
+                dt.date(2024, 8, 28),
+                dt.datetime(2024, 8, 28, 0, 0, 0),
+                dt.datetime(2024, 8, 28, 23, 59, 59),
+            ),
+            (
+                dt.date(2024, 8, 29),
+                dt.datetime(2024, 8, 29, 0, 0, 0),
+                dt.datetime(2024, 8, 29, 12, 0, 0),
+            ),
+        ],
+    )
+    def test_event_day(self, multiday_event, date, start, end):
+        """Test that a day of a multi-day event references the event and is clipped to the day."""
+        event_day = EventDay(multiday_event, date)
+        assert event_day.event is multiday_event
+        assert event_day.summary == "Vacation"
+        assert event_day.location == "Beach"
+        assert event_day.calendar_name == "Family"
+        assert event_day.start_datetime == start
+        assert event_day.end_datetime == end
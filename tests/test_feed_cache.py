@@ -0,0 +1,88 @@
+import os
+import sys
+from unittest.mock import patch
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.feed_cache import CachedFeed, FeedCache
+from shared_cache import SharedCache
+
+URL = "https://example.com/calendar.ics"
+FEED = CachedFeed("BEGIN:VCALENDAR\nEND:VCALENDAR", '"v1"', "Tue, 27 Aug 2024 10:00:00 GMT", 1000.0)
+
+
+class TestFeedCache:
+    """Test suite for the FeedCache class."""
+
+    def test_memory_only(self):
+        """Test that feeds are cached in memory without a cache directory."""
+        cache = FeedCache()
+        assert cache.get(URL) is None
+        cache.put(URL, FEED)
+        assert cache.get(URL) == FEED
+
+    def test_persists_to_disk(self, tmp_path):
+        """Test that a new cache instance reads the feeds written by a previous one."""
+        FeedCache(str(tmp_path)).put(URL, FEED)
+        assert FeedCache(str(tmp_path)).get(URL) == FEED
+        # Only the body and metadata files are left behind, no temporary files
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_url_not_written(self, tmp_path):
+        """Test that the feed URL, which may contain a secret token, isn't written to the cache files."""
+        FeedCache(str(tmp_path)).put(URL, FEED)
+        for path in tmp_path.iterdir():
+            assert URL not in path.read_text()
+
+    def test_touch_keeps_body(self, tmp_path):
+        """Test that revalidating an unchanged feed only writes the metadata."""
+        cache = FeedCache(str(tmp_path))
+        cache.put(URL, FEED)
+        with patch.object(cache, "_write", wraps=cache._write) as write:
+            feed = cache.touch(URL, 2000.0, etag='"v2"')
+        assert [call.args[0] for call in write.call_args_list] == [cache.get_path(URL)]
+        assert feed == FEED._replace(etag='"v2"', fetched_at=2000.0)
+        assert FeedCache(str(tmp_path)).get(URL) == feed
+
+    def test_touch_shared(self, tmp_path):
+        """Test that other workers pick up revalidated metadata and keep the body they already read."""
+        shared_cache = SharedCache(str(tmp_path))
+        first, second = FeedCache(shared_cache=shared_cache), FeedCache(shared_cache=shared_cache)
+        first.put(URL, FEED)
+        assert second.get(URL) == FEED
+
+        with patch.object(shared_cache, "put", wraps=shared_cache.put) as put:
+            first.touch(URL, 2000.0)
+        assert [call.args[0] for call in put.call_args_list] == [f"ics-meta:{URL}"]
+        with patch.object(shared_cache, "get", wraps=shared_cache.get) as get:
+            assert second.get(URL).fetched_at == 2000.0
+        assert [call.args[0] for call in get.call_args_list] == [f"ics-meta:{URL}"]
+
+    def test_unreadable_shared(self, tmp_path):
+        """Test that incomplete shared metadata or a body that isn't UTF-8 is treated as a cache miss."""
+        shared_cache = SharedCache(str(tmp_path))
+        FeedCache(shared_cache=shared_cache).put(URL, FEED)
+        metadata = shared_cache.get(f"ics-meta:{URL}").data
+        shared_cache.put(f"ics-meta:{URL}", metadata.replace(b'"etag"', b'"tag"'))
+        assert FeedCache(shared_cache=shared_cache).get(URL) is None
+
+        shared_cache.put(f"ics-meta:{URL}", metadata)
+        version = shared_cache.get(f"ics:{URL}").version
+        shared_cache.put(f"ics:{URL}", b"\xff\xfe", version=version)
+        assert FeedCache(shared_cache=shared_cache).get(URL) is None
+
+    def test_unreadable_file(self, tmp_path):
+        """Test that a corrupted cache file is treated as a cache miss."""
+        cache = FeedCache(str(tmp_path))
+        with open(cache.get_path(URL), "w") as f:
+            f.write("{not json")
+        assert cache.get(URL) is None
+
+    def test_body_mismatch(self, tmp_path):
+        """Test that a body file that doesn't match the metadata is treated as a cache miss."""
+        FeedCache(str(tmp_path)).put(URL, FEED)
+        cache = FeedCache(str(tmp_path))
+        with open(cache.get_path(URL, ".ics"), "w") as f:
+            f.write("BEGIN:VCALENDAR")
+        assert cache.get(URL) is None
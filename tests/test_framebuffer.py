@@ -0,0 +1,128 @@
+import io
+import os
+import random
+import struct
+import sys
+
+import pytest
+from PIL import Image
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from render.encode import Dither, OutputMode
+from render.framebuffer import (
+    HEADER_FORMAT,
+    HEADER_SIZE,
+    Compression,
+    decode_framebuffer,
+    encode_framebuffer,
+    encode_raw,
+    pack_1bit,
+    pack_3bit,
+    rle_decode,
+    rle_encode,
+    unpack_framebuffer,
+)
+
+
+def random_indices(width, height, levels, seed=0):
+    """Creates an image of random gray level indices."""
+    rng = random.Random(seed)
+    image = Image.new("L", (width, height))
+    image.putdata([rng.randrange(levels) for _ in range(width * height)])
+    return image
+
+
+class TestFrameBuffer:
+    """Test suite for packing Inkplate frame buffers."""
+
+    def test_pack_3bit_layout(self):
+        """Test that the even pixel is stored in the high nibble."""
+        image = Image.new("L", (4, 1))
+        image.putdata([0, 7, 3, 5])
+        assert pack_3bit(image) == bytes([0x07, 0x35])
+
+    def test_pack_1bit_layout(self):
+        """Test that the leftmost pixel is the least significant bit and black is set."""
+        image = Image.new("L", (8, 2), 1)
+        image.putpixel((0, 0), 0)
+        image.putpixel((7, 1), 0)
+        assert pack_1bit(image) == bytes([0x01, 0x80])
+
+    def test_pack_pads_rows(self):
+        """Test that rows which don't fill whole bytes are padded with white."""
+        image = Image.new("L", (3, 2), 0)
+        assert pack_3bit(image) == bytes([0x00, 0x07, 0x00, 0x07])
+        assert pack_1bit(image) == bytes([0x07, 0x07])
+
+    @pytest.mark.parametrize(
+        "bit_depth, levels, width, row_bytes",
+        [(3, 8, 3, 2), (3, 8, 825, 413), (1, 2, 13, 2), (1, 2, 825, 104)],
+    )
+    def test_round_trip_padded(self, bit_depth, levels, width, row_bytes):
+        """Test that a frame buffer with padded rows decodes to the original size."""
+        indices = random_indices(width, 3, levels)
+        framebuffer = decode_framebuffer(encode_framebuffer(indices, bit_depth))
+        assert framebuffer.width == width
+        assert len(framebuffer.data) == 3 * row_bytes
+        assert unpack_framebuffer(framebuffer).tobytes() == indices.tobytes()
+
+    @pytest.mark.parametrize(
+        "data",
+        [b"", b"\x00", b"\x00" * 1000, b"\x01\x02\x02\x03\x03\x03", bytes(range(256)) * 3],
+    )
+    def test_rle_round_trip(self, data):
+        """Test that run-length encoding can be decoded again."""
+        encoded = rle_encode(data)
+        assert rle_decode(encoded) == data
+        assert all(0 < count <= 255 for count in encoded[0::2])
+
+    @pytest.mark.parametrize("compression", list(Compression))
+    @pytest.mark.parametrize("bit_depth, levels, size", [(3, 8, 320), (1, 2, 80)])
+    def test_round_trip(self, compression, bit_depth, levels, size):
+        """Test that a frame buffer decodes to the same pixels and header values."""
+        indices = random_indices(64, 10, levels)
+        raw = encode_framebuffer(indices, bit_depth, compression)
+
+        framebuffer = decode_framebuffer(raw)
+        assert framebuffer.width == 64
+        assert framebuffer.height == 10
+        assert framebuffer.bit_depth == bit_depth
+        assert framebuffer.compression == compression
+        assert len(framebuffer.data) == size
+        assert unpack_framebuffer(framebuffer).tobytes() == indices.tobytes()
+
+    def test_header(self):
+        """Test the header fields of an uncompressed frame buffer."""
+        raw = encode_framebuffer(random_indices(16, 2, 8), 3)
+        magic, version, bit_depth, compression, width, height, _, length = struct.unpack(
+            HEADER_FORMAT, raw[:HEADER_SIZE]
+        )
+        assert (magic, version, bit_depth, compression) == (b"IKFB", 1, 3, 0)
+        assert (width, height, length) == (16, 2, 16)
+        assert len(raw) == HEADER_SIZE + length
+
+    def test_content_hash_independent_of_compression(self):
+        """Test that the content hash only depends on the pixels."""
+        indices = random_indices(16, 4, 8)
+        hashes = {
+            decode_framebuffer(encode_framebuffer(indices, 3, c)).content_hash for c in Compression
+        }
+        assert len(hashes) == 1
+
+    def test_decode_invalid(self):
+        """Test that other data is rejected."""
+        with pytest.raises(ValueError):
+            decode_framebuffer(b"\x89PNG" + b"\x00" * HEADER_SIZE)
+
+    def test_encode_raw(self):
+        """Test converting a rendered PNG into a frame buffer."""
+        output = io.BytesIO()
+        Image.new("RGB", (16, 4), (255, 255, 255)).save(output, format="PNG")
+        raw = encode_raw(output.getvalue(), OutputMode.gray_3bit, Dither.none, Compression.zlib)
+        framebuffer = decode_framebuffer(raw)
+        assert framebuffer.data == b"\x77" * 32
+
+        with pytest.raises(ValueError):
+            encode_raw(output.getvalue(), OutputMode.color, Dither.none, Compression.none)
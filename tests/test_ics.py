@@ -9,11 +9,15 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 import pytz
+import requests
 
 # Add the src directory to the path so we can import the modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from ics_cal.ics import IcsModule
+from ics_cal.event import Event
+from ics_cal.ics import IcsModule, get_feed_id, parse_per_feed
+from metrics import ics_fetch_results, ics_fetch_seconds, registry
+from shared_cache import SharedCache
 
 
 @pytest.fixture
@@ -28,118 +32,108 @@ def ics_module():
         # Single day event
         (
             [
-                {
-                    "summary": "Test Event 1",
-                    "location": "Test Location 1",
-                    "startDatetime": dt.datetime(2024, 8, 27, 10, 0, 0),
-                    "endDatetime": dt.datetime(2024, 8, 27, 11, 0, 0),
-                    "isMultiday": False,
-                    "calendarName": "Work",
-                }
+                Event(
+                    summary="Test Event 1",
+                    start_datetime=dt.datetime(2024, 8, 27, 10, 0, 0),
+                    end_datetime=dt.datetime(2024, 8, 27, 11, 0, 0),
+                    calendar_name="Work",
+                    location="Test Location 1",
+                )
             ],
             {
                 dt.date(2024, 8, 27): [
-                    {
-                        "summary": "Test Event 1",
-                        "location": "Test Location 1",
-                        "startDatetime": dt.datetime(2024, 8, 27, 10, 0, 0),
-                        "endDatetime": dt.datetime(2024, 8, 27, 11, 0, 0),
-                        "isMultiday": False,
-                        "calendarName": "Work",
-                    }
+                    Event(
+                        summary="Test Event 1",
+                        start_datetime=dt.datetime(2024, 8, 27, 10, 0, 0),
+                        end_datetime=dt.datetime(2024, 8, 27, 11, 0, 0),
+                        calendar_name="Work",
+                        location="Test Location 1",
+                    )
                 ]
             },
         ),
         # Multi-day event spanning two days
         (
             [
-                {
-                    "summary": "Multi-day Event",
-                    "location": "Conference Center",
-                    "startDatetime": dt.datetime(2024, 8, 28, 16, 0, 0),
-                    "endDatetime": dt.datetime(2024, 8, 29, 12, 0, 0),
-                    "isMultiday": True,
-                    "calendarName": "Personal",
-                }
+                Event(
+                    summary="Multi-day Event",
+                    start_datetime=dt.datetime(2024, 8, 28, 16, 0, 0),
+                    end_datetime=dt.datetime(2024, 8, 29, 12, 0, 0),
+                    calendar_name="Personal",
+                    location="Conference Center",
+                )
             ],
             {
                 dt.date(2024, 8, 28): [
-                    {
-                        "summary": "Multi-day Event",
-                        "location": "Conference Center",
-                        "startDatetime": dt.datetime(2024, 8, 28, 16, 0, 0),
-                        "endDatetime": dt.datetime(2024, 8, 28, 23, 59, 59),
-                        "isMultiday": True,
-                        "calendarName": "Personal",
-                    }
+                    Event(
+                        summary="Multi-day Event",
+                        start_datetime=dt.datetime(2024, 8, 28, 16, 0, 0),
+                        end_datetime=dt.datetime(2024, 8, 28, 23, 59, 59),
+                        calendar_name="Personal",
+                        location="Conference Center",
+                    )
                 ],
                 dt.date(2024, 8, 29): [
-                    {
-                        "summary": "Multi-day Event",
-                        "location": "Conference Center",
-                        "startDatetime": dt.datetime(2024, 8, 29, 0, 0, 0),
-                        "endDatetime": dt.datetime(2024, 8, 29, 12, 0, 0),
-                        "isMultiday": True,
-                        "calendarName": "Personal",
-                    }
+                    Event(
+                        summary="Multi-day Event",
+                        start_datetime=dt.datetime(2024, 8, 29, 0, 0, 0),
+                        end_datetime=dt.datetime(2024, 8, 29, 12, 0, 0),
+                        calendar_name="Personal",
+                        location="Conference Center",
+                    )
                 ],
             },
         ),
         # Short event crossing midnight
         (
             [
-                {
-                    "summary": "Cross-midnight Event",
-                    "location": "Dive Bar",
-                    "startDatetime": dt.datetime(2024, 8, 28, 23, 0, 0),
-                    "endDatetime": dt.datetime(2024, 8, 29, 0, 30, 0),
-                    "isMultiday": True,
-                    "calendarName": "Personal",
-                }
+                Event(
+                    summary="Cross-midnight Event",
+                    start_datetime=dt.datetime(2024, 8, 28, 23, 0, 0),
+                    end_datetime=dt.datetime(2024, 8, 29, 0, 30, 0),
+                    calendar_name="Personal",
+                    location="Dive Bar",
+                )
             ],
             {
                 dt.date(2024, 8, 28): [
-                    {
-                        "summary": "Cross-midnight Event",
-                        "location": "Dive Bar",
-                        "startDatetime": dt.datetime(2024, 8, 28, 23, 0, 0),
-                        "endDatetime": dt.datetime(2024, 8, 28, 23, 59, 59),
-                        "isMultiday": True,
-                        "calendarName": "Personal",
-                    }
+                    Event(
+                        summary="Cross-midnight Event",
+                        start_datetime=dt.datetime(2024, 8, 28, 23, 0, 0),
+                        end_datetime=dt.datetime(2024, 8, 28, 23, 59, 59),
+                        calendar_name="Personal",
+                        location="Dive Bar",
+                    )
                 ],
                 dt.date(2024, 8, 29): [
-                    {
-                        "summary": "Cross-midnight Event",
-                        "location": "Dive Bar",
-                        "startDatetime": dt.datetime(2024, 8, 29, 0, 0, 0),
-                        "endDatetime": dt.datetime(2024, 8, 29, 0, 30, 0),
-                        "isMultiday": True,
-                        "calendarName": "Personal",
-                    }
+                    Event(
+                        summary="Cross-midnight Event",
+                        start_datetime=dt.datetime(2024, 8, 29, 0, 0, 0),
+                        end_datetime=dt.datetime(2024, 8, 29, 0, 30, 0),
+                        calendar_name="Personal",
+                        location="Dive Bar",
+                    )
                 ],
             },
         ),
         # All-day event
         (
             [
-                {
-                    "summary": "All-day Event",
-                    "startDatetime": dt.datetime(2024, 8, 30, 0, 0, 0),
-                    "endDatetime": dt.datetime(2024, 8, 30, 23, 59, 59),
-                    "isMultiday": False,
-                    "calendarName": "Family",
-                }
+                Event(
+                    summary="All-day Event",
+                    start_datetime=dt.datetime(2024, 8, 30, 0, 0, 0),
+                    end_datetime=dt.datetime(2024, 8, 30, 23, 59, 59),
+                    calendar_name="Family",
+                )
             ],
             {
                 dt.date(2024, 8, 30): [
-                    {
-                        "summary": "All-day Event",
-                        "startDatetime": dt.datetime(2024, 8, 30, 0, 0, 0),
-                        "endDatetime": dt.datetime(2024, 8, 30, 23, 59, 59),
-                        "isMultiday": False,
-                        "calendarName": "Family",
-                    }
+                    Event(
+                        summary="All-day Event",
+                        start_datetime=dt.datetime(2024, 8, 30, 0, 0, 0),
+                        end_datetime=dt.datetime(2024, 8, 30, 23, 59, 59),
+                        calendar_name="Family",
+                    )
                 ]
             },
         ),
@@ -164,7 +158,14 @@ def test_get_events(
 
     events_by_day = ics_module.get_events(ics_url, cal_start, cal_end, display_tz)
 
-    assert events_by_day == expected_events_by_day
+    # Days of multi-day events are views, compare them by their values
+    assert {
+        day: [
+            Event(e.summary, e.start_datetime, e.end_datetime, e.calendar_name, e.location)
+            for e in events
+        ]
+        for day, events in events_by_day.items()
+    } == expected_events_by_day
 
 
 @pytest.mark.parametrize(
@@ -185,14 +186,13 @@ UID:12345
 END:VEVENT
 END:VCALENDAR""",
             [
-                {
-                    "summary": "Test Event 1",
-                    "location": "Test Location 1",
-                    "startDatetime": dt.datetime(2024, 8, 27, 10, 0, 0, tzinfo=dt.timezone.utc),
-                    "endDatetime": dt.datetime(2024, 8, 27, 11, 0, 0, tzinfo=dt.timezone.utc),
-                    "isMultiday": False,
-                    "calendarName": "Work Calendar",
-                }
+                Event(
+                    summary="Test Event 1",
+                    start_datetime=dt.datetime(2024, 8, 27, 10, 0, 0, tzinfo=dt.timezone.utc),
+                    end_datetime=dt.datetime(2024, 8, 27, 11, 0, 0, tzinfo=dt.timezone.utc),
+                    calendar_name="Work Calendar",
+                    location="Test Location 1",
+                )
             ],
         ),
         # All-day event
@@ -208,13 +208,12 @@ UID:12345
 END:VEVENT
 END:VCALENDAR""",
             [
-                {
-                    "summary": "All-day Event",
-                    "startDatetime": dt.datetime(2024, 8, 27, 0, 0, 0, tzinfo=dt.timezone.utc),
-                    "endDatetime": dt.datetime(2024, 8, 27, 23, 59, 59, tzinfo=dt.timezone.utc),
-                    "isMultiday": False,
-                    "calendarName": None,
-                }
+                Event(
+                    summary="All-day Event",
+                    start_datetime=dt.datetime(2024, 8, 27, 0, 0, 0, tzinfo=dt.timezone.utc),
+                    end_datetime=dt.datetime(2024, 8, 27, 23, 59, 59, tzinfo=dt.timezone.utc),
+                    calendar_name=None,
+                )
             ],
         ),
         # Multi-day event
@@ -230,13 +229,12 @@ UID:12345
 END:VEVENT
 END:VCALENDAR""",
             [
-                {
-                    "summary": "Multi-day Event",
-                    "startDatetime": dt.datetime(2024, 8, 27, 16, 0, 0, tzinfo=dt.timezone.utc),
-                    "endDatetime": dt.datetime(2024, 8, 29, 12, 0, 0, tzinfo=dt.timezone.utc),
-                    "isMultiday": True,
-                    "calendarName": None,
-                }
+                Event(
+                    summary="Multi-day Event",
+                    start_datetime=dt.datetime(2024, 8, 27, 16, 0, 0, tzinfo=dt.timezone.utc),
+                    end_datetime=dt.datetime(2024, 8, 29, 12, 0, 0, tzinfo=dt.timezone.utc),
+                    calendar_name=None,
+                )
             ],
         ),
         # Short event crossing midnight
@@ -254,14 +252,13 @@ UID:12345
 END:VEVENT
 END:VCALENDAR""",
             [
-                {
-                    "summary": "Cross-midnight Event",
-                    "location": "Dive Bar",
-                    "startDatetime": dt.datetime(2024, 8, 28, 22, 0, 0, tzinfo=dt.timezone.utc),
-                    "endDatetime": dt.datetime(2024, 8, 29, 0, 30, 0, tzinfo=dt.timezone.utc),
-                    "isMultiday": True,
-                    "calendarName": "Personal",
-                }
+                Event(
+                    summary="Cross-midnight Event",
+                    start_datetime=dt.datetime(2024, 8, 28, 22, 0, 0, tzinfo=dt.timezone.utc),
+                    end_datetime=dt.datetime(2024, 8, 29, 0, 30, 0, tzinfo=dt.timezone.utc),
+                    calendar_name="Personal",
+                    location="Dive Bar",
+                )
             ],
         ),
         # Recurring event (daily for 2 days)
@@ -278,20 +275,18 @@ UID:12345
 END:VEVENT
 END:VCALENDAR""",
             [
-                {
-                    "summary": "Recurring Event",
-                    "startDatetime": dt.datetime(2024, 8, 27, 10, 0, 0, tzinfo=dt.timezone.utc),
-                    "endDatetime": dt.datetime(2024, 8, 27, 11, 0, 0, tzinfo=dt.timezone.utc),
-                    "isMultiday": False,
-                    "calendarName": None,
-                },
-                {
-                    "summary": "Recurring Event",
-                    "startDatetime": dt.datetime(2024, 8, 28, 10, 0, 0, tzinfo=dt.timezone.utc),
-                    "endDatetime": dt.datetime(2024, 8, 28, 11, 0, 0, tzinfo=dt.timezone.utc),
-                    "isMultiday": False,
-                    "calendarName": None,
-                },
+                Event(
+                    summary="Recurring Event",
+                    start_datetime=dt.datetime(2024, 8, 27, 10, 0, 0, tzinfo=dt.timezone.utc),
+                    end_datetime=dt.datetime(2024, 8, 27, 11, 0, 0, tzinfo=dt.timezone.utc),
+                    calendar_name=None,
+                ),
+                Event(
+                    summary="Recurring Event",
+                    start_datetime=dt.datetime(2024, 8, 28, 10, 0, 0, tzinfo=dt.timezone.utc),
+                    end_datetime=dt.datetime(2024, 8, 28, 11, 0, 0, tzinfo=dt.timezone.utc),
+                    calendar_name=None,
+                ),
             ],
         ),
         # No events (empty calendar)
@@ -315,18 +310,17 @@ UID:67890
 END:VEVENT
 END:VCALENDAR""",
             [
-                {
-                    "summary": "No Location Event",
-                    "startDatetime": dt.datetime(2024, 8, 27, 14, 0, 0, tzinfo=dt.timezone.utc),
-                    "endDatetime": dt.datetime(2024, 8, 27, 15, 0, 0, tzinfo=dt.timezone.utc),
-                    "isMultiday": False,
-                    "calendarName": None,
-                }
+                Event(
+                    summary="No Location Event",
+                    start_datetime=dt.datetime(2024, 8, 27, 14, 0, 0, tzinfo=dt.timezone.utc),
+                    end_datetime=dt.datetime(2024, 8, 27, 15, 0, 0, tzinfo=dt.timezone.utc),
+                    calendar_name=None,
+                )
             ],
         ),
     ],
 )
-@patch("ics_cal.ics.requests.get")
+@patch("ics_cal.ics.requests.Session.get")
 def test_retrieve_events_success(mock_get, ics_module, ics_content, expected_events):
     """Test _retrieve_events method with various calendar scenarios."""
     mock_response = MagicMock()
@@ -338,14 +332,16 @@ def test_retrieve_events_success(mock_get, ics_module, ics_content, expected_eve
     cal_end = dt.datetime(2024, 8, 30, 0, 0, 0, tzinfo=dt.timezone.utc)
     display_tz = "UTC"
 
-    events = ics_module._retrieve_events(
-        "https://example.com/calendar.ics", cal_start, cal_end, display_tz
+    events = list(
+        ics_module._retrieve_events(
+            "https://example.com/calendar.ics", cal_start, cal_end, display_tz
+        )
     )
 
     assert events == expected_events
 
 
-@patch("ics_cal.ics.requests.get")
+@patch("ics_cal.ics.requests.Session.get")
 def test_retrieve_events_multiple_urls(mock_get, ics_module):
     """Test _retrieve_events method with multiple ICS URLs separated by pipe."""
     # Setup responses for two different calendars
@@ -380,26 +376,33 @@ END:VEVENT
 END:VCALENDAR"""
     responses[1].raise_for_status.return_value = None
 
-    mock_get.side_effect = responses
+    urls = ["https://example.com/calendar.ics", "http://work.com/cal.ics"]
+    # Feeds are downloaded concurrently, so answer by URL instead of call order
+    mock_get.side_effect = lambda url, **kwargs: responses[urls.index(url)]
 
     cal_start = dt.datetime(2024, 8, 27, 0, 0, 0, tzinfo=dt.timezone.utc)
     cal_end = dt.datetime(2024, 8, 28, 0, 0, 0, tzinfo=dt.timezone.utc)
     display_tz = "UTC"
 
     # Test with pipe-separated URLs
-    events = ics_module._retrieve_events(
-        "https://example.com/calendar.ics|http://work.com/cal.ics", cal_start, cal_end, display_tz
+    events = list(
+        ics_module._retrieve_events(
+            "https://example.com/calendar.ics|http://work.com/cal.ics",
+            cal_start,
+            cal_end,
+            display_tz,
+        )
     )
 
     assert len(events) == 2
     # Events should be sorted by start time
-    assert events[0]["summary"] == "Work Event"
-    assert events[0]["calendarName"] == "Work"
-    assert events[1]["summary"] == "Personal Event"
-    assert events[1]["calendarName"] == "Personal"
+    assert events[0].summary == "Work Event"
+    assert events[0].calendar_name == "Work"
+    assert events[1].summary == "Personal Event"
+    assert events[1].calendar_name == "Personal"
 
 
-@patch("ics_cal.ics.requests.get")
+@patch("ics_cal.ics.requests.Session.get")
 def test_retrieve_events_timezone_conversion(mock_get, ics_module):
     """Test _retrieve_events method properly converts timezones."""
     mock_response = MagicMock()
@@ -420,8 +423,10 @@ END:VCALENDAR"""
     cal_end = dt.datetime(2024, 8, 28, 0, 0, 0, tzinfo=dt.timezone.utc)
     display_tz = "Europe/Berlin"  # UTC+2 in summer
 
-    events = ics_module._retrieve_events(
-        "https://example.com/calendar.ics", cal_start, cal_end, display_tz
+    events = list(
+        ics_module._retrieve_events(
+            "https://example.com/calendar.ics", cal_start, cal_end, display_tz
+        )
     )
 
     assert len(events) == 1
@@ -432,11 +437,11 @@ END:VCALENDAR"""
     expected_start = berlin_tz.localize(dt.datetime(2024, 8, 27, 12, 0, 0))  # 10 UTC + 2 hours DST
     expected_end = berlin_tz.localize(dt.datetime(2024, 8, 27, 13, 0, 0))  # 11 UTC + 2 hours DST
 
-    assert event["startDatetime"] == expected_start
-    assert event["endDatetime"] == expected_end
+    assert event.start_datetime == expected_start
+    assert event.end_datetime == expected_end
 
 
-@patch("ics_cal.ics.requests.get")
+@patch("ics_cal.ics.requests.Session.get")
 def test_retrieve_events_filtering_by_date_range(mock_get, ics_module):
     """Test _retrieve_events method filters events by date range."""
     mock_response = MagicMock()
@@ -470,9 +475,246 @@ END:VCALENDAR"""
     cal_end = dt.datetime(2024, 8, 28, 23, 59, 59, tzinfo=dt.timezone.utc)
     display_tz = "UTC"
 
-    events = ics_module._retrieve_events(
-        "https://example.com/calendar.ics", cal_start, cal_end, display_tz
+    events = list(
+        ics_module._retrieve_events(
+            "https://example.com/calendar.ics", cal_start, cal_end, display_tz
+        )
     )
 
     assert len(events) == 1
-    assert events[0]["summary"] == "In Range"
+    assert events[0].summary == "In Range"
+
+
+@pytest.mark.parametrize(
+    "timeout, count, expected",
+    [
+        ("10", 3, [10.0, 10.0, 10.0]),
+        ("10|30|5", 3, [10.0, 30.0, 5.0]),
+        ("10|30", 3, [10.0, 30.0, 30.0]),
+        ("10||5", 3, [10.0, 10.0, 5.0]),
+        ("10|30|5", 1, [10.0]),
+    ],
+)
+def test_parse_per_feed(timeout, count, expected):
+    """Test parsing of the per-feed timeouts."""
+    assert parse_per_feed(timeout, count, 10.0) == expected
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_retrieve_events_per_feed_timeouts(mock_get):
+    """Test that every feed is downloaded with its own timeout through the shared session."""
+    mock_get.return_value = MagicMock(text="BEGIN:VCALENDAR\nEND:VCALENDAR")
+    ics_module = IcsModule(timeout="3|7")
+
+    cal_start = dt.datetime(2024, 8, 27, 0, 0, 0, tzinfo=dt.timezone.utc)
+    cal_end = dt.datetime(2024, 8, 28, 0, 0, 0, tzinfo=dt.timezone.utc)
+    ics_module._retrieve_events(
+        "https://a.com/cal.ics|https://b.com/cal.ics", cal_start, cal_end, "UTC"
+    )
+
+    timeouts = {call.args[0]: call.kwargs["timeout"] for call in mock_get.call_args_list}
+    assert timeouts == {"https://a.com/cal.ics": 3.0, "https://b.com/cal.ics": 7.0}
+    assert "gzip" in ics_module.session.headers["Accept-Encoding"]
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_retrieve_events_failed_feed(mock_get, ics_module):
+    """Test that a failing feed doesn't prevent the other feeds from being shown."""
+    working = MagicMock(
+        text="""BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+DTSTART:20240827T100000Z
+DTEND:20240827T110000Z
+SUMMARY:Working Event
+UID:working1
+END:VEVENT
+END:VCALENDAR"""
+    )
+
+    def get(url, **kwargs):
+        if "broken" in url:
+            raise requests.exceptions.Timeout("timed out")
+        return working
+
+    mock_get.side_effect = get
+
+    cal_start = dt.datetime(2024, 8, 27, 0, 0, 0, tzinfo=dt.timezone.utc)
+    cal_end = dt.datetime(2024, 8, 28, 0, 0, 0, tzinfo=dt.timezone.utc)
+    events = list(
+        ics_module._retrieve_events(
+            "https://broken.com/cal.ics|https://example.com/calendar.ics", cal_start, cal_end, "UTC"
+        )
+    )
+
+    assert [e.summary for e in events] == ["Working Event"]
+
+
+EMPTY_ICS = "BEGIN:VCALENDAR\nVERSION:2.0\nEND:VCALENDAR"
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_fetch_feed_conditional_request(mock_get, tmp_path):
+    """Test that a cached feed is requested conditionally and reused when it is unchanged."""
+    mock_get.return_value = MagicMock(
+        status_code=200,
+        text=EMPTY_ICS,
+        headers={"ETag": '"v1"', "Last-Modified": "Tue, 27 Aug 2024 10:00:00 GMT"},
+    )
+    ics_module = IcsModule(cache_dir=str(tmp_path))
+    assert ics_module._fetch_feed("https://example.com/calendar.ics", 10, 0) == EMPTY_ICS
+
+    mock_get.return_value = MagicMock(status_code=304, text="", headers={})
+    # A new instance only has the on-disk cache
+    ics_module = IcsModule(cache_dir=str(tmp_path))
+    assert ics_module._fetch_feed("https://example.com/calendar.ics", 10, 0) == EMPTY_ICS
+    assert mock_get.call_args.kwargs["headers"] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Tue, 27 Aug 2024 10:00:00 GMT",
+    }
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_fetch_feed_min_refresh(mock_get):
+    """Test that a feed isn't requested again within the minimum refresh interval."""
+    mock_get.return_value = MagicMock(status_code=200, text=EMPTY_ICS, headers={})
+    ics_module = IcsModule()
+    ics_module._fetch_feed("https://example.com/calendar.ics", 10, 60)
+    ics_module._fetch_feed("https://example.com/calendar.ics", 10, 60)
+    assert mock_get.call_count == 1
+
+    ics_module._fetch_feed("https://example.com/calendar.ics", 10, 0)
+    assert mock_get.call_count == 2
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_fetch_feed_shared_between_workers(mock_get, tmp_path):
+    """Test that workers sharing a cache reuse a feed downloaded by another worker."""
+    mock_get.return_value = MagicMock(status_code=200, text=EMPTY_ICS, headers={})
+    shared_cache = SharedCache(str(tmp_path))
+    first = IcsModule(shared_cache=shared_cache)
+    second = IcsModule(shared_cache=shared_cache)
+    assert first._fetch_feed("https://example.com/calendar.ics", 10, 60) == EMPTY_ICS
+    assert second._fetch_feed("https://example.com/calendar.ics", 10, 60) == EMPTY_ICS
+    assert mock_get.call_count == 1
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_fetch_feed_metrics(mock_get):
+    """Test that feed requests are counted by result without exposing the URL."""
+    url = "https://example.com/metrics.ics"
+    mock_get.return_value = MagicMock(status_code=200, text=EMPTY_ICS, headers={})
+    ics_module = IcsModule()
+    ics_module._fetch_feed(url, 10, 60)
+    ics_module._fetch_feed(url, 10, 60)
+
+    feed_id = get_feed_id(url)
+    assert ics_fetch_results.get(feed=feed_id, result="downloaded") == 1
+    assert ics_fetch_results.get(feed=feed_id, result="fresh") == 1
+    assert ics_fetch_seconds.get_count(feed=feed_id) == 2
+    assert url not in registry.expose()
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_fetch_feed_fallback(mock_get):
+    """Test that the cached copy is used when the feed is unreachable."""
+    mock_get.return_value = MagicMock(status_code=200, text=EMPTY_ICS, headers={})
+    ics_module = IcsModule()
+    ics_module._fetch_feed("https://example.com/calendar.ics", 10, 0)
+
+    mock_get.side_effect = requests.exceptions.ConnectionError("unreachable")
+    assert ics_module._fetch_feed("https://example.com/calendar.ics", 10, 0) == EMPTY_ICS
+    assert ics_module._fetch_feed("https://other.com/calendar.ics", 10, 0) is None
+
+
+@patch("ics_cal.ics.IcsModule._retrieve_events")
+def test_get_events_clipped_to_window(mock_retrieve_events, ics_module):
+    """Test that a year-long event is only split into the days of the query window, in its time zone."""
+    berlin_tz = pytz.timezone("Europe/Berlin")
+    cal_start = berlin_tz.localize(dt.datetime(2024, 10, 25, 0, 0, 0))
+    cal_end = berlin_tz.localize(dt.datetime(2024, 10, 28, 0, 0, 0)) - dt.timedelta(seconds=1)
+    mock_retrieve_events.return_value = [
+        Event(
+            summary="School Term",
+            # Already clipped to the start of the window by _retrieve_events
+            start_datetime=cal_start,
+            end_datetime=berlin_tz.localize(dt.datetime(2025, 7, 31, 12, 0, 0)),
+        )
+    ]
+
+    events_by_day = ics_module.get_events(
+        "https://example.com/calendar.ics", cal_start, cal_end, "Europe/Berlin"
+    )
+
+    assert list(events_by_day) == [
+        dt.date(2024, 10, 25),
+        dt.date(2024, 10, 26),
+        dt.date(2024, 10, 27),
+    ]
+    # The daylight saving time ends on October 27
+    last_day = events_by_day[dt.date(2024, 10, 27)][0]
+    assert last_day.start_datetime == berlin_tz.localize(dt.datetime(2024, 10, 27, 0, 0, 0))
+    assert last_day.start_datetime.utcoffset() == dt.timedelta(hours=2)
+    assert last_day.end_datetime.utcoffset() == dt.timedelta(hours=1)
+
+
+@patch("ics_cal.ics.IcsModule._retrieve_events")
+def test_get_events_max_days(mock_retrieve_events, ics_module):
+    """Test that grouping stops once enough days are complete and later events are never built."""
+    consumed = []
+
+    def events():
+        for day in (27, 27, 28, 29, 30, 31):
+            event = Event(
+                summary=f"Event {day}",
+                start_datetime=dt.datetime(2024, 8, day, 10, 0, 0),
+                end_datetime=dt.datetime(2024, 8, day, 11, 0, 0),
+            )
+            consumed.append(event)
+            yield event
+
+    mock_retrieve_events.return_value = events()
+
+    events_by_day = ics_module.get_events(
+        "https://example.com/calendar.ics",
+        dt.datetime(2024, 8, 27, 0, 0, 0),
+        dt.datetime(2024, 9, 30, 0, 0, 0),
+        "UTC",
+        max_days=2,
+    )
+
+    assert list(events_by_day) == [dt.date(2024, 8, 27), dt.date(2024, 8, 28)]
+    assert len(events_by_day[dt.date(2024, 8, 27)]) == 2
+    # The first event of the third day shows that the second day is complete
+    assert len(consumed) == 4
+
+
+@patch("ics_cal.ics.requests.Session.get")
+def test_retrieve_events_merges_feeds(mock_get, ics_module):
+    """Test that the events of all feeds are merged in order of their start."""
+    feeds = {
+        "https://a.com/cal.ics": ["20240827T090000Z", "20240828T120000Z"],
+        "https://b.com/cal.ics": ["20240827T080000Z", "20240827T100000Z", "20240829T080000Z"],
+    }
+
+    def get(url, **kwargs):
+        events = "".join(
+            f"BEGIN:VEVENT\nDTSTART:{start}\nDTEND:{start}\nSUMMARY:{start}\nUID:{url}{start}\nEND:VEVENT\n"
+            for start in reversed(feeds[url])
+        )
+        return MagicMock(
+            status_code=200, text=f"BEGIN:VCALENDAR\n{events}END:VCALENDAR", headers={}
+        )
+
+    mock_get.side_effect = get
+
+    events = ics_module._retrieve_events(
+        "https://a.com/cal.ics|https://b.com/cal.ics",
+        dt.datetime(2024, 8, 27, 0, 0, 0, tzinfo=dt.timezone.utc),
+        dt.datetime(2024, 8, 30, 0, 0, 0, tzinfo=dt.timezone.utc),
+        "UTC",
+    )
+
+    assert [e.summary for e in events] == sorted(
+        feeds["https://a.com/cal.ics"] + feeds["https://b.com/cal.ics"]
+    )
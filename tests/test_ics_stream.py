@@ -0,0 +1,96 @@
+import datetime as dt
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.ics import IcsModule
+from ics_cal.stream import filter_calendar, is_outside_window, unfold_lines
+
+CALENDAR = """BEGIN:VCALENDAR
+VERSION:2.0
+X-WR-CALNAME:Family
+BEGIN:VEVENT
+DTSTART:20140827T100000Z
+DTEND:20140827T110000Z
+SUMMARY:Old Event
+UID:old
+END:VEVENT
+BEGIN:VEVENT
+DTSTART;TZID=Europe/Berlin:20240827T100000
+DTEND;TZID=Europe/Berlin:20240827T110000
+SUMMARY:Current Event with a long
+  folded summary
+UID:current
+BEGIN:VALARM
+ACTION:DISPLAY
+END:VALARM
+END:VEVENT
+BEGIN:VEVENT
+DTSTART;VALUE=DATE:20140101
+RRULE:FREQ=YEARLY
+SUMMARY:Birthday
+UID:birthday
+END:VEVENT
+END:VCALENDAR"""
+
+START = dt.datetime(2024, 8, 27, tzinfo=dt.timezone.utc)
+END = dt.datetime(2024, 9, 26, tzinfo=dt.timezone.utc)
+
+
+class TestStream:
+    """Test suite for the streaming ICS filter."""
+
+    def test_unfold_lines(self):
+        """Test that folded lines are joined and line endings removed."""
+        lines = ["SUMMARY:Long\r\n", " summary\r\n", "\r\n", "UID:1\r\n"]
+        assert list(unfold_lines(lines)) == ["SUMMARY:Longsummary", "UID:1"]
+
+    @pytest.mark.parametrize(
+        "event, expected",
+        [
+            (["DTSTART:20140827T100000Z", "DTEND:20140827T110000Z"], True),
+            (["DTSTART:20240827T100000Z", "DTEND:20240827T110000Z"], False),
+            (["DTSTART:20250827T100000Z", "DTEND:20250827T110000Z"], True),
+            # Ongoing multi-day event
+            (["DTSTART;VALUE=DATE:20240801", "DTEND;VALUE=DATE:20240901"], False),
+            # Within the one day margin
+            (["DTSTART:20240826T220000Z", "DTEND:20240826T230000Z"], False),
+            (["DTSTART:20140827T100000Z", "DURATION:P1D"], False),
+            (["DTSTART:20140827T100000Z"], True),
+            (["DTSTART:20140827T100000Z", "RRULE:FREQ=DAILY"], False),
+            (["DTSTART:20140827T100000Z", "RECURRENCE-ID:20240827T100000Z"], False),
+        ],
+    )
+    def test_is_outside_window(self, event, expected):
+        """Test which events are dropped before parsing."""
+        assert is_outside_window(event, START.date(), END.date()) == expected
+
+    def test_filter_calendar(self):
+        """Test that only events outside the window are dropped."""
+        filtered = filter_calendar(CALENDAR.splitlines(), START, END)
+        assert "Old Event" not in filtered
+        assert "SUMMARY:Current Event with a long folded summary" in filtered
+        assert "Birthday" in filtered
+        assert "X-WR-CALNAME:Family" in filtered
+        assert filtered.count("BEGIN:VEVENT") == filtered.count("END:VEVENT") == 2
+
+    @patch("ics_cal.ics.requests.Session.get")
+    def test_retrieve_events_streaming(self, mock_get):
+        """Test that the streaming mode returns the events in the window."""
+        response = MagicMock(headers={"Content-Type": "text/calendar"})
+        response.iter_lines.return_value = iter(CALENDAR.splitlines())
+        mock_get.return_value.__enter__.return_value = response
+        ics_module = IcsModule(streaming=True)
+
+        events = list(
+            ics_module._retrieve_events("https://example.com/calendar.ics", START, END, "UTC")
+        )
+
+        assert [e.summary for e in events] == ["Current Event with a long folded summary"]
+        assert mock_get.call_args.kwargs["stream"] is True
+        assert response.encoding == "utf-8"
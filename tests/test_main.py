@@ -0,0 +1,268 @@
+import io
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+with patch.dict(
+    os.environ,
+    {
+        "ICS_URL": "https://example.com/calendar.ics",
+        "OWM_API_KEY": "test_api_key",
+        "LAT": "37.7749",
+        "LNG": "-122.4194",
+    },
+):
+    import main
+
+from render.framebuffer import decode_framebuffer
+
+
+@pytest.fixture
+def rendered_image():
+    """Replaces the rendering pipeline with one that returns a fixed image."""
+    with patch("main.render_image", return_value=b"\x89PNG test image"):
+        yield b"\x89PNG test image"
+
+
+@pytest.fixture
+def mock_request():
+    """Provides a request from a display."""
+    return MagicMock(client=MagicMock(host="192.168.1.10"))
+
+
+class TestImageEtag:
+    """Test suite for the ETag handling of the image endpoints."""
+
+    @pytest.mark.parametrize(
+        "if_none_match, etag, expected",
+        [
+            (None, '"abc"', False),
+            ('"abc"', '"abc"', True),
+            ('"def"', '"abc"', False),
+            ('"def", "abc"', '"abc"', True),
+            ('W/"abc"', '"abc"', True),
+            ("*", '"abc"', True),
+        ],
+    )
+    def test_etag_matches(self, if_none_match, etag, expected):
+        """Test matching of If-None-Match header values."""
+        assert main.etag_matches(if_none_match, etag) == expected
+
+    def test_get_image_returns_etag(self, rendered_image, mock_request):
+        """Test that the image is served with a strong ETag."""
+        response = main.get_image(mock_request, if_none_match=None)
+        assert response.status_code == 200
+        assert response.headers["ETag"] == main.get_etag(rendered_image)
+
+    def test_get_image_not_modified(self, rendered_image, mock_request):
+        """Test that a matching If-None-Match header is answered with 304."""
+        etag = main.get_image(mock_request, if_none_match=None).headers["ETag"]
+        response = main.get_image(mock_request, if_none_match=etag)
+        assert response.status_code == 304
+        assert response.body == b""
+
+    def test_head_image(self, rendered_image, mock_request):
+        """Test that HEAD returns the ETag and size without a body."""
+        response = main.head_image(mock_request, if_none_match=None)
+        assert response.status_code == 200
+        assert response.headers["Content-Length"] == str(len(rendered_image))
+        assert response.body == b""
+
+    def test_get_image_etag(self, rendered_image, mock_request):
+        """Test that the ETag endpoint returns only the ETag."""
+        etag = main.get_image_etag(mock_request)
+        assert etag.body.decode() == etag.headers["ETag"]
+
+    def test_get_image_raw(self, rendered_image, mock_request):
+        """Test that the frame buffer is served with an ETag."""
+        with patch("main.encode_raw", return_value=b"IKFB frame buffer") as encode_raw:
+            response = main.get_image_raw(mock_request, mode=None, dither=None, if_none_match=None)
+        assert response.status_code == 200
+        assert response.body == b"IKFB frame buffer"
+        assert response.headers["ETag"] == main.get_etag(b"IKFB frame buffer")
+        assert encode_raw.call_args.args[1] == main.OutputMode.gray_3bit
+
+    def test_get_image_raw_color(self, rendered_image, mock_request):
+        """Test that there is no frame buffer for the color mode."""
+        with pytest.raises(main.HTTPException):
+            main.get_image_raw(
+                mock_request, mode=main.OutputMode.color, dither=None, if_none_match=None
+            )
+
+
+class TestProfiles:
+    """Test suite for serving several dashboard profiles."""
+
+    def test_unknown_profile(self, rendered_image, mock_request):
+        """Test that an unknown profile is answered with 404."""
+        with pytest.raises(main.HTTPException) as e:
+            main.get_profile_image(
+                mock_request, "unknown", mode=None, dither=None, if_none_match=None
+            )
+        assert e.value.status_code == 404
+
+    def test_profile_image(self, rendered_image, mock_request):
+        """Test that the profile image is rendered with the settings of the profile."""
+        with patch.dict(main.dashboards, {"kitchen": main.dashboards[main.DEFAULT_PROFILE]}):
+            response = main.get_profile_image(
+                mock_request, "kitchen", mode=None, dither=None, if_none_match=None
+            )
+            head = main.head_profile_image(
+                mock_request, "kitchen", mode=None, dither=None, if_none_match=None
+            )
+        assert response.status_code == 200
+        assert head.headers["ETag"] == response.headers["ETag"]
+        main.render_image.assert_called_with("kitchen")
+
+    def test_profile_image_raw_with_own_size(self, mock_request):
+        """Test that a profile with a width that doesn't fill whole bytes is served as frame buffer."""
+        output = io.BytesIO()
+        Image.new("RGB", (825, 1200), (255, 255, 255)).save(output, format="PNG")
+        with (
+            patch("main.render_image", return_value=output.getvalue()),
+            patch.dict(main.dashboards, {"kitchen": main.dashboards[main.DEFAULT_PROFILE]}),
+        ):
+            response = main.get_profile_image_raw(
+                mock_request, "kitchen", mode=None, dither=None, if_none_match=None
+            )
+        framebuffer = decode_framebuffer(response.body)
+        assert (framebuffer.width, framebuffer.height) == (825, 1200)
+        assert len(framebuffer.data) == 413 * 1200
+
+    def test_profiles_rendered_separately(self):
+        """Test that concurrent requests are only coalesced for the same profile."""
+        with patch("main.fetch_and_render", side_effect=lambda profile: profile.encode()):
+            assert main.render_image("kitchen") == b"kitchen"
+            assert main.render_image(main.DEFAULT_PROFILE) == main.DEFAULT_PROFILE.encode()
+
+
+class TestProfiling:
+    """Test suite for profiling image requests."""
+
+    @pytest.fixture
+    def profiler(self, tmp_path):
+        """Enables profiling for admins with the token "secret"."""
+        with patch.object(main, "profiler", main.Profiler(str(tmp_path), token="secret")):
+            yield main.profiler
+
+    def admin_request(self, token):
+        return MagicMock(
+            client=MagicMock(host="192.168.1.10"),
+            headers={"X-Profiling-Token": token},
+            query_params={},
+            url=MagicMock(path="/image"),
+        )
+
+    def test_profiling_disabled(self, mock_request):
+        """Test that the admin endpoints don't exist without profiling."""
+        with pytest.raises(main.HTTPException) as e:
+            main.get_profiling_results(mock_request)
+        assert e.value.status_code == 404
+
+    def test_invalid_token(self, profiler):
+        """Test that the admin endpoints require the token."""
+        with pytest.raises(main.HTTPException) as e:
+            main.get_profiling_results(self.admin_request("wrong"))
+        assert e.value.status_code == 403
+
+    def test_profile_request(self, profiler, rendered_image):
+        """Test that an admin request is profiled and the profile can be downloaded."""
+        request = self.admin_request("secret")
+        main.get_image(request, if_none_match=None)
+        (profile,) = main.get_profiling_results(request)
+        assert profile["reason"] == "requested"
+
+        response = main.get_profiling_result(request, profile["id"], main.ProfileFormat.collapsed)
+        assert response.path == profiler.get_file(profile["id"], main.ProfileFormat.collapsed)
+        with pytest.raises(main.HTTPException):
+            main.get_profiling_result(request, "unknown", main.ProfileFormat.pstats)
+
+    def test_request_not_profiled(self, profiler, rendered_image):
+        """Test that requests without the token aren't profiled when sampling is off."""
+        main.get_image(self.admin_request("wrong"), if_none_match=None)
+        assert profiler.list_profiles() == []
+
+
+class TestFetchAndRender:
+    """Test suite for the data retrieval of the rendering pipeline."""
+
+    @pytest.fixture
+    def slow_sources(self):
+        """Replaces weather, calendar and rendering with sources that take 0.2 seconds each."""
+
+        def get_weather(*args):
+            time.sleep(0.2)
+            return {}, [], []
+
+        def get_events(*args):
+            time.sleep(0.2)
+            return {}
+
+        render_service = MagicMock()
+        render_service.get_template_params.return_value = {"a": 1}
+        render_service.render.return_value = b"\x89PNG test image"
+
+        with (
+            patch.object(main.owmModule, "get_weather", side_effect=get_weather),
+            patch.object(main.calModule, "get_events", side_effect=get_events),
+            patch.dict(
+                main.dashboards,
+                {
+                    main.DEFAULT_PROFILE: main.Dashboard(
+                        main.cfg, render_service, main.RenderCache()
+                    )
+                },
+            ),
+        ):
+            yield
+
+    def test_sources_fetched_concurrently(self, slow_sources):
+        """Test that weather and calendar are retrieved at the same time."""
+        start_time = time.time()
+        assert main.fetch_and_render() == b"\x89PNG test image"
+        assert time.time() - start_time < 0.35
+
+    def test_shared_image(self, slow_sources, tmp_path):
+        """Test that a worker serves the image rendered by another worker for the same dashboard."""
+        with patch.object(main, "sharedCache", main.SharedCache(str(tmp_path))):
+            main.fetch_and_render()
+            dashboard = main.dashboards[main.DEFAULT_PROFILE]
+            # Another worker only shares the directory, not the render cache
+            with patch.dict(
+                main.dashboards,
+                {main.DEFAULT_PROFILE: dashboard._replace(render_cache=main.RenderCache())},
+            ):
+                assert main.fetch_and_render() == b"\x89PNG test image"
+        assert dashboard.render_service.render.call_count == 1
+
+    def test_metrics(self, slow_sources):
+        """Test that the stages of a render show up in the metrics."""
+        main.fetch_and_render()
+        metrics = main.get_metrics().body.decode()
+        assert 'dashboard_stage_seconds_count{stage="template_params"}' in metrics
+        assert 'dashboard_render_cache_hit_ratio{profile="default"} 0' in metrics
+        assert "dashboard_renders_in_flight 0" in metrics
+
+    def test_deadline(self, slow_sources):
+        """Test that data retrieval is answered with 503 once the shared deadline has passed."""
+        with patch.object(main.cfg, "DATA_RETRIEVAL_TIMEOUT", 0.1):
+            with pytest.raises(main.HTTPException) as e:
+                main.fetch_and_render()
+        assert e.value.status_code == 503
+
+    def test_deadline_serves_last_image(self, slow_sources):
+        """Test that the last rendered image is served once the shared deadline has passed."""
+        main.fetch_and_render()
+        with patch.object(main.cfg, "DATA_RETRIEVAL_TIMEOUT", 0.1):
+            assert main.fetch_and_render() == b"\x89PNG test image"
+
+    def test_executor_sized_for_dashboards(self):
+        """Test that every dashboard can retrieve weather and calendar without waiting for a worker."""
+        assert main.dataExecutor._max_workers == 2 * len(main.dashboards)
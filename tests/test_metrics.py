@@ -0,0 +1,84 @@
+import os
+import sys
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from metrics import Metric, MetricsRegistry, stage_errors, stage_seconds, time_stage
+
+
+class TestMetricsRegistry:
+    """Test suite for the Prometheus text format of the MetricsRegistry."""
+
+    def test_counter(self):
+        """Test that counters are exposed per label values."""
+        registry = MetricsRegistry()
+        counter = registry.counter("fetches_total", "Fetches", ("result",))
+        counter.inc(result="ok")
+        counter.inc(2, result="failed")
+        assert registry.expose() == (
+            "# HELP fetches_total Fetches\n"
+            "# TYPE fetches_total counter\n"
+            'fetches_total{result="failed"} 2\n'
+            'fetches_total{result="ok"} 1\n'
+        )
+
+    def test_histogram(self):
+        """Test that histogram buckets are cumulative and end with +Inf."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("stage_seconds", "Stages", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="parse")
+        histogram.observe(0.5, stage="parse")
+        histogram.observe(5, stage="parse")
+        assert registry.expose().splitlines()[2:] == [
+            'stage_seconds_bucket{stage="parse",le="0.1"} 1',
+            'stage_seconds_bucket{stage="parse",le="1"} 2',
+            'stage_seconds_bucket{stage="parse",le="+Inf"} 3',
+            'stage_seconds_sum{stage="parse"} 5.55',
+            'stage_seconds_count{stage="parse"} 3',
+        ]
+
+    def test_gauge_callback(self):
+        """Test that gauges are read from their callback, with or without labels."""
+        registry = MetricsRegistry()
+        registry.gauge("in_flight", "In flight", callback=lambda: 3)
+        registry.gauge("hit_ratio", "Hit ratio", ("cache",), callback=lambda: {("weather",): 0.5})
+        assert registry.expose().splitlines() == [
+            "# HELP in_flight In flight",
+            "# TYPE in_flight gauge",
+            "in_flight 3",
+            "# HELP hit_ratio Hit ratio",
+            "# TYPE hit_ratio gauge",
+            'hit_ratio{cache="weather"} 0.5',
+        ]
+
+    def test_label_escaping(self):
+        """Test that quotes and backslashes in label values are escaped."""
+        registry = MetricsRegistry()
+        registry.counter("total", "Total", ("name",)).inc(name='a "b" \\c')
+        assert registry.expose().splitlines()[-1] == 'total{name="a \\"b\\" \\\\c"} 1'
+
+    def test_invalid_labels(self):
+        """Test that observations with the wrong labels are rejected."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("stage_seconds", "Stages", ("stage",))
+        with pytest.raises(ValueError):
+            histogram.observe(1.0, feed="abc")
+        with pytest.raises(ValueError):
+            registry.histogram("stage_seconds", "Stages")
+
+    def test_metric_abstract(self):
+        """Test that a metric type must implement collecting its samples."""
+        with pytest.raises(TypeError):
+            Metric("total", "Total")
+
+    def test_time_stage_error(self):
+        """Test that a failing stage is timed and counted as an error."""
+        count = stage_seconds.get_count(stage="test_stage")
+        with pytest.raises(RuntimeError):
+            with time_stage("test_stage"):
+                raise RuntimeError("failed")
+        assert stage_seconds.get_count(stage="test_stage") == count + 1
+        assert stage_errors.get(stage="test_stage") == 1
@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from owm.owm import OwmModule, WeatherUnits
+from owm.weather_cache import WeatherCache
+from shared_cache import SharedCache
+
+
+def owm_response(temp):
+    """Builds a One Call API response with the given current temperature."""
+    data = {"current": {"temp": temp}, "hourly": [], "daily": []}
+    return MagicMock(ok=True, text=json.dumps(data))
+
+
+@pytest.fixture
+def mock_get():
+    """Replaces the One Call API with one that returns increasing temperatures."""
+    with patch("owm.owm.requests.get") as mock_get:
+        mock_get.side_effect = [owm_response(temp) for temp in range(20, 30)]
+        yield mock_get
+
+
+def get_temp(owm_module):
+    current_weather, _, _ = owm_module.get_weather(1.0, 2.0, "key", WeatherUnits.metric)
+    return current_weather["temp"]
+
+
+class TestWeatherCache:
+    """Test suite for the weather caching of the OwmModule."""
+
+    def test_caching_disabled(self, mock_get):
+        """Test that every request calls the API without a TTL."""
+        owm_module = OwmModule()
+        assert get_temp(owm_module) == 20
+        assert get_temp(owm_module) == 21
+
+    def test_fresh_hit(self, mock_get):
+        """Test that a fresh response is reused without calling the API."""
+        owm_module = OwmModule(ttl=600)
+        assert get_temp(owm_module) == 20
+        assert get_temp(owm_module) == 20
+        assert mock_get.call_count == 1
+        assert owm_module.weather_cache.get_stats() == {
+            "hits": 1,
+            "stale_hits": 0,
+            "misses": 1,
+            "hit_rate": 0.5,
+            "api_calls": 1,
+            "api_calls_saved": 1,
+        }
+
+    def test_stale_while_revalidate(self, mock_get):
+        """Test that a stale response is served while it is refreshed in the background."""
+        owm_module = OwmModule(ttl=600)
+        owm_module.weather_cache.put(
+            WeatherCache.get_key(1.0, 2.0, "metric"),
+            {"current_weather": {"temp": 10}, "hourly_forecast": [], "daily_forecast": []},
+            time.time() - 900,
+        )
+
+        assert get_temp(owm_module) == 10
+        # Wait for the background refresh
+        for _ in range(100):
+            if not owm_module._refreshing:
+                break
+            time.sleep(0.01)
+        assert get_temp(owm_module) == 20
+        assert mock_get.call_count == 1
+
+    def test_too_stale(self, mock_get):
+        """Test that a response older than the stale window is fetched again right away."""
+        owm_module = OwmModule(ttl=600, max_stale=60)
+        owm_module.weather_cache.put(
+            WeatherCache.get_key(1.0, 2.0, "metric"),
+            {"current_weather": {"temp": 10}, "hourly_forecast": [], "daily_forecast": []},
+            time.time() - 900,
+        )
+        assert get_temp(owm_module) == 20
+
+    def test_persists_to_disk(self, mock_get, tmp_path):
+        """Test that a new module reads the cached response from disk."""
+        cache_file = str(tmp_path / "owm-cache.json")
+        assert get_temp(OwmModule(ttl=600, cache_file=cache_file)) == 20
+        assert get_temp(OwmModule(ttl=600, cache_file=cache_file)) == 20
+        assert mock_get.call_count == 1
+
+    def test_unreadable_file(self, tmp_path):
+        """Test that a corrupted cache file is ignored."""
+        cache_file = tmp_path / "owm-cache.json"
+        cache_file.write_text("{not json")
+        cache = WeatherCache(str(cache_file))
+        assert cache.lookup(WeatherCache.get_key(1.0, 2.0, "metric"), 600, 0) == (None, False)
+
+    def test_nearby_locations_share_response(self, mock_get):
+        """Test that coordinates are rounded so that dashboards close to each other share one response."""
+        owm_module = OwmModule(ttl=600)
+        owm_module.get_weather(1.0012, 2.0031, "key", WeatherUnits.metric)
+        current_weather, _, _ = owm_module.get_weather(1.0009, 2.0049, "key", WeatherUnits.metric)
+        assert current_weather["temp"] == 20
+        assert mock_get.call_count == 1
+        assert "lat=1.0&lon=2.0&" in mock_get.call_args.args[0]
+
+    def test_shared_between_workers(self, mock_get, tmp_path):
+        """Test that workers sharing a cache reuse each other's responses."""
+        shared_cache = SharedCache(str(tmp_path))
+        assert get_temp(OwmModule(ttl=600, shared_cache=shared_cache)) == 20
+        assert get_temp(OwmModule(ttl=600, shared_cache=shared_cache)) == 20
+        assert mock_get.call_count == 1
@@ -0,0 +1,109 @@
+import datetime as dt
+import os
+import sys
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ics_cal.event import Event
+from render.pillow_render import (
+    PillowRenderHelper,
+    get_container_width,
+    get_font,
+    get_weather_icon_glyphs,
+)
+
+
+class PillowMockConfig:
+    """Pillow renderer mock configuration for testing."""
+
+    IMAGE_WIDTH = 1200
+    IMAGE_HEIGHT = 825
+    NUM_CAL_DAYS_TO_QUERY = 30
+    SHOW_ADDITIONAL_WEATHER = True
+    SHOW_CALENDAR_NAME = True
+    SHOW_MOON_PHASE = True
+    USE_24H_FORMAT = True
+
+
+@pytest.fixture
+def dashboard_params():
+    """Provides template parameters for a dashboard with a few events."""
+    current_time = dt.datetime(2024, 8, 27, 9, 0, 0)
+    current_weather = {
+        "dt": 2,
+        "feels_like": 22.1,
+        "sunrise": 1,
+        "sunset": 3,
+        "temp": 20.4,
+        "uvi": 4.2,
+        "weather": [{"description": "light rain", "id": 500}],
+    }
+    daily_forecast = [
+        {"moon_phase": 0.3, "pop": 0.2, "temp": {"min": 10, "max": 20}, "weather": [{"id": 800}]}
+    ] * 3
+    events = {
+        dt.date(2024, 8, 27): [
+            Event(
+                summary="Test Event with a very long title that does not fit into a single line at all",
+                start_datetime=dt.datetime(2024, 8, 27, 10, 0, 0),
+                end_datetime=dt.datetime(2024, 8, 27, 11, 0, 0),
+                calendar_name="Work",
+                location="Test Location",
+            )
+        ]
+    }
+    return PillowRenderHelper(PillowMockConfig()).get_template_params(
+        current_time, current_weather, [], daily_forecast, events
+    )
+
+
+class TestPillowRenderHelper:
+    """Test suite for PillowRenderHelper class."""
+
+    def test_weather_icon_glyphs(self):
+        """Test that the glyphs are parsed from the Weather Icons stylesheet."""
+        glyphs = get_weather_icon_glyphs()
+        assert glyphs["wi-owm-200"] == "\uf01e"
+        assert glyphs["wi-moon-new"] == "\uf095"
+
+    def test_draw_dashboard_size(self, dashboard_params):
+        """Test that the dashboard is drawn in the configured size."""
+        image = PillowRenderHelper(PillowMockConfig()).draw_dashboard(dashboard_params)
+        assert image.size == (1200, 825)
+        # Something was drawn on the white background
+        assert image.getextrema()[0] < 255
+
+    @pytest.mark.parametrize(
+        "viewport_width, container_width",
+        [(1600, 1170), (1200, 1170), (1000, 970), (825, 750), (600, 600)],
+    )
+    def test_get_container_width(self, viewport_width, container_width):
+        """Test that the container width follows the Bootstrap breakpoints."""
+        assert get_container_width(viewport_width) == container_width
+
+    def test_draw_dashboard_portrait(self, dashboard_params):
+        """Test that a portrait dashboard narrower than the wide container isn't cut off."""
+        cfg = PillowMockConfig()
+        cfg.IMAGE_WIDTH, cfg.IMAGE_HEIGHT = 825, 1200
+        image = PillowRenderHelper(cfg).draw_dashboard(dashboard_params)
+        assert image.size == (825, 1200)
+        # The container leaves a white margin on both sides and the calendar is drawn below the weather
+        left, top, right, bottom = image.point(lambda v: 255 - v).getbbox()
+        assert left > 0 and right < 825
+        assert bottom > 825
+
+    def test_render_returns_png(self, dashboard_params):
+        """Test that render returns the PNG image."""
+        image = PillowRenderHelper(PillowMockConfig()).render(dashboard_params)
+        assert image.startswith(b"\x89PNG")
+
+    @pytest.mark.parametrize("max_width", [0, 50, 200])
+    def test_truncate(self, max_width):
+        """Test that truncated text including the ellipsis fits into the given width."""
+        font = get_font("Lexend-Regular.ttf", 24)
+        text = PillowRenderHelper.truncate("A very long event title", font, max_width)
+        assert text.endswith("…")
+        assert text == "…" or font.getlength(text) <= max_width
@@ -0,0 +1,90 @@
+import datetime as dt
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytz
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from prerender import PrerenderScheduler, parse_schedule
+
+
+class TestPrerenderScheduler:
+    """Test suite for PrerenderScheduler class."""
+
+    def test_parse_schedule(self):
+        """Test parsing of the configured wake-up times."""
+        assert parse_schedule("06:30, *:00") == [(6, 30), (None, 0)]
+        assert parse_schedule("") == []
+
+    def test_predict_wake_needs_history(self):
+        """Test that no wake-up is predicted before the cadence is known."""
+        scheduler = PrerenderScheduler(MagicMock())
+        scheduler.record_request("display", 0)
+        scheduler.record_request("display", 3600)
+        assert scheduler.predict_wake("display", 3600) is None
+
+    def test_predict_wake_from_median_interval(self):
+        """Test that the next wake-up is predicted from the median interval."""
+        scheduler = PrerenderScheduler(MagicMock())
+        for timestamp in [0, 3600, 7300, 10800]:
+            scheduler.record_request("display", timestamp)
+        assert scheduler.predict_wake("display", 10800) == 10800 + 3600
+
+    def test_predict_wake_skips_missed_wakes(self):
+        """Test that missed wake-ups are skipped."""
+        scheduler = PrerenderScheduler(MagicMock())
+        for timestamp in [0, 3600, 7200]:
+            scheduler.record_request("display", timestamp)
+        assert scheduler.predict_wake("display", 20000) == 21600
+
+    def test_record_request_ignores_repeated_requests(self):
+        """Test that requests right after each other count as one wake-up."""
+        scheduler = PrerenderScheduler(MagicMock())
+        for timestamp in [0, 5, 3600, 3610, 7200]:
+            scheduler.record_request("display", timestamp)
+        assert scheduler.predict_wake("display", 7200) == 10800
+
+    def test_next_scheduled_wake(self):
+        """Test that the next configured wake-up is found in the display time zone."""
+        scheduler = PrerenderScheduler(
+            MagicMock(), schedule="06:30,18:00", timezone="Europe/Berlin"
+        )
+        now = pytz.timezone("Europe/Berlin").localize(dt.datetime(2024, 8, 27, 12, 0))
+        expected = pytz.timezone("Europe/Berlin").localize(dt.datetime(2024, 8, 27, 18, 0))
+        assert scheduler.next_scheduled_wake(now.timestamp()) == expected.timestamp()
+
+    def test_tick_prerenders_before_wake(self):
+        """Test that the image is rendered once within the lead time of a wake-up."""
+        prerender = MagicMock(return_value=b"image")
+        scheduler = PrerenderScheduler(prerender, lead_seconds=60)
+        for timestamp in [0, 3600, 7200]:
+            scheduler.record_request("display", timestamp)
+
+        scheduler.tick(10000)
+        prerender.assert_not_called()
+        scheduler.tick(10750)
+        scheduler.tick(10760)
+        prerender.assert_called_once()
+        assert scheduler.get_image() == b"image"
+
+    def test_tick_renders_close_wakes_once(self):
+        """Test that wake-ups close together are each rendered once instead of alternately."""
+        prerender = MagicMock(return_value=b"image")
+        scheduler = PrerenderScheduler(prerender, lead_seconds=60, schedule="*:00")
+        # The display is predicted to wake up at 10810, ten seconds after the scheduled 10800
+        for timestamp in [10, 3610, 7210]:
+            scheduler.record_request("display", timestamp)
+
+        for now in range(10700, 10900, 5):
+            scheduler.tick(now)
+        assert prerender.call_count == 2
+
+    def test_get_image_expires(self):
+        """Test that an old pre-rendered image is not served."""
+        scheduler = PrerenderScheduler(MagicMock(return_value=b"image"), schedule="*:00")
+        assert scheduler.get_image() is None
+        scheduler.tick(scheduler.next_scheduled_wake(0) - 30)
+        assert scheduler.get_image(max_age=-1) is None
@@ -0,0 +1,83 @@
+import os
+import pstats
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from profiling import ProfileFormat, Profiler
+
+
+def busy_wait(seconds):
+    end_time = time.time() + seconds
+    while time.time() < end_time:
+        pass
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    """Provides a profiler that keeps two profiles."""
+    return Profiler(str(tmp_path), retention=2, sample_rate=3, token="secret")
+
+
+class TestProfiler:
+    """Test suite for the Profiler class."""
+
+    def test_is_admin(self, profiler, tmp_path):
+        """Test that only the configured token is accepted, and none without a token."""
+        assert profiler.is_admin("secret")
+        assert not profiler.is_admin("wrong")
+        assert not profiler.is_admin(None)
+        assert not Profiler(str(tmp_path)).is_admin("")
+
+    def test_should_profile(self, profiler):
+        """Test that every n-th request is sampled and requested profiles are always taken."""
+        assert [profiler.should_profile(False) for _ in range(6)] == [
+            False,
+            False,
+            True,
+            False,
+            False,
+            True,
+        ]
+        assert profiler.should_profile(True)
+
+    def test_profile(self, profiler):
+        """Test that a profile is stored as pstats and as collapsed stacks of all threads."""
+        with profiler.profile("/image", "requested"):
+            thread = threading.Thread(target=busy_wait, args=(0.1,), name="data_0")
+            thread.start()
+            busy_wait(0.1)
+            thread.join()
+
+        (profile,) = profiler.list_profiles()
+        assert profile["path"] == "/image"
+        assert profile["reason"] == "requested"
+        assert profile["samples"] > 0
+
+        collapsed = open(profiler.get_file(profile["id"], ProfileFormat.collapsed)).read()
+        assert any(
+            line.startswith("data_0;") and "busy_wait" in line for line in collapsed.splitlines()
+        )
+        pstats_path = profiler.get_file(profile["id"], ProfileFormat.pstats)
+        if pstats_path is not None:
+            functions = [name for _, _, name in pstats.Stats(pstats_path).stats]
+            assert "busy_wait" in functions
+
+    def test_retention(self, profiler, tmp_path):
+        """Test that only the newest profiles are kept."""
+        for _ in range(3):
+            with profiler.profile("/image", "sampled"):
+                pass
+            time.sleep(0.01)
+        assert len(profiler.list_profiles()) == 2
+        assert len(list(tmp_path.iterdir())) <= 6
+
+    def test_get_file_rejects_invalid_ids(self, profiler):
+        """Test that profile ids can't be used to read other files."""
+        assert profiler.get_file("../secret", ProfileFormat.pstats) is None
+        assert profiler.get_file("20240827T100000-abcdef", ProfileFormat.pstats) is None
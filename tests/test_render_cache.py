@@ -0,0 +1,53 @@
+import datetime as dt
+import os
+import sys
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from render.render_cache import RenderCache
+
+
+class TestRenderCache:
+    """Test suite for RenderCache class."""
+
+    def test_get_key_is_canonical(self):
+        """Test that the key doesn't depend on the order of the parameters."""
+        assert RenderCache.get_key({"a": 1, "b": [1, 2]}) == RenderCache.get_key(
+            {"b": [1, 2], "a": 1}
+        )
+
+    def test_get_key_changes_with_params(self):
+        """Test that a different displayed value leads to a different key."""
+        assert RenderCache.get_key({"temp": "20°"}) != RenderCache.get_key({"temp": "21°"})
+
+    def test_get_key_serializes_dates(self):
+        """Test that non-JSON values like dates can be hashed."""
+        assert RenderCache.get_key({"day": dt.date(2024, 8, 27)})
+
+    def test_get_returns_cached_image(self):
+        """Test that the image is returned for the same key and counted as hit."""
+        cache = RenderCache()
+        assert cache.get("key") is None
+        cache.put("key", b"image", 2.5)
+        assert cache.get("key") == b"image"
+        assert cache.get_stats() == {
+            "hits": 1,
+            "misses": 1,
+            "hit_rate": 0.5,
+            "saved_render_seconds": 2.5,
+        }
+
+    def test_get_with_different_key(self):
+        """Test that a different key is a miss."""
+        cache = RenderCache()
+        cache.put("key", b"image", 2.5)
+        assert cache.get("other") is None
+        assert cache.get_stats()["misses"] == 1
+
+    def test_get_last(self):
+        """Test that the last image is returned regardless of the key."""
+        cache = RenderCache()
+        assert cache.get_last() is None
+        cache.put("key", b"image", 2.5)
+        assert cache.get_last() == b"image"
@@ -2,11 +2,12 @@ import datetime as dt
 import pytest
 import sys
 import os
+from unittest.mock import MagicMock
 
 # Add the src directory to the path so we can import the modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from render.render import RenderHelper
+from render.render import RenderHelper, get_template_environment
 
 
 class HourMockConfig:
@@ -107,3 +108,71 @@ class TestRenderHelper:
 
         result = render_helper.format_time(datetime_obj)
         assert result == expected
+
+
+class ReadyMockConfig:
+    """Render timeout mock configuration for testing."""
+
+    def __init__(self, render_timeout=0.1):
+        self.RENDER_TIMEOUT = render_timeout
+
+
+class TestWaitUntilReady:
+    """Test suite for RenderHelper.wait_until_ready."""
+
+    def test_wait_until_ready_returns_when_ready(self):
+        """Test that the wait stops as soon as the page reports readiness."""
+        driver = MagicMock()
+        driver.execute_script.side_effect = [False, False, True]
+        RenderHelper(ReadyMockConfig(render_timeout=5)).wait_until_ready(driver)
+        assert driver.execute_script.call_count == 3
+
+    def test_wait_until_ready_times_out(self):
+        """Test that a page that never gets ready doesn't raise after the timeout."""
+        driver = MagicMock()
+        driver.execute_script.return_value = False
+        RenderHelper(ReadyMockConfig(render_timeout=0.1)).wait_until_ready(driver)
+        assert driver.execute_script.call_count >= 1
+
+
+class TemplateMockConfig:
+    """Template rendering mock configuration for testing."""
+
+    NUM_CAL_DAYS_TO_DISPLAY = 0
+    NUM_CAL_DAYS_TO_QUERY = 3
+    TEMPLATE_AUTO_RELOAD = False
+
+
+class TestRenderHtml:
+    """Test suite for RenderHelper.render_html."""
+
+    def test_template_environment_is_shared(self):
+        """Test that the template environment is only created once per process."""
+        assert get_template_environment(False) is get_template_environment(False)
+
+    def test_render_html_events(self):
+        """Test that events are rendered with the event macro."""
+        params = {
+            "cal_days": ["Today"],
+            "cal_days_events": [
+                [
+                    {
+                        "time": "09:00",
+                        "summary": "Meeting",
+                        "location": "Office",
+                        "calendar_name": "Work",
+                    },
+                    {"time": None, "summary": "Birthday", "location": None, "calendar_name": None},
+                ]
+            ],
+            "current_weather_add_info": "",
+        }
+        html = RenderHelper(TemplateMockConfig()).render_html(params)
+        assert (
+            '<div class="event"><span class="event-time">09:00</span> Meeting'
+            '<span class="event-location"> at Office</span>'
+            '<span class="event-calendar-name"> (Work)</span></div>'
+        ) in html
+        assert '<div class="event">Birthday</div>' in html
+        assert html.count('class="event-date"') == 3
+        assert '<div class="weather-forecast">&nbsp;</div>' in html
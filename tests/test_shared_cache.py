@@ -0,0 +1,64 @@
+import os
+import sys
+import threading
+import time
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from shared_cache import SharedCache
+
+
+class TestSharedCache:
+    """Test suite for the SharedCache class."""
+
+    def test_put_and_get(self, tmp_path):
+        """Test that an entry written by one instance is read by another one."""
+        SharedCache(str(tmp_path)).put("image:default", b"\x89PNG\n test image", version="abc")
+        entry = SharedCache(str(tmp_path)).get("image:default")
+        assert entry.data == b"\x89PNG\n test image"
+        assert entry.version == "abc"
+        # Only the entry is left behind, no temporary files
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_version_mismatch(self, tmp_path):
+        """Test that an entry stored for a different version is a miss."""
+        cache = SharedCache(str(tmp_path))
+        cache.put("image:default", b"image", version="abc")
+        assert cache.get("image:default", version="def") is None
+        assert cache.get("image:default", version="abc").data == b"image"
+        assert cache.get_stats() == {"hits": 1, "misses": 1, "writes": 1, "lock_wait_seconds": 0.0}
+
+    def test_newer_than(self, tmp_path):
+        """Test that entries stored before newer_than are a miss."""
+        cache = SharedCache(str(tmp_path))
+        stored_at = cache.put("weather", b"{}")
+        assert cache.get("weather", newer_than=stored_at) is None
+        assert cache.get("weather", newer_than=stored_at - 1).stored_at == stored_at
+
+    def test_missing_and_unreadable(self, tmp_path):
+        """Test that missing and empty entries are a miss."""
+        cache = SharedCache(str(tmp_path))
+        assert cache.get("missing") is None
+        open(cache.get_path("empty"), "wb").close()
+        assert cache.get("empty") is None
+
+    def test_lock_is_exclusive(self, tmp_path):
+        """Test that only one holder of the lock for a key runs at a time."""
+        cache = SharedCache(str(tmp_path))
+        running = []
+        overlaps = []
+
+        def hold_lock():
+            with cache.lock("weather"):
+                overlaps.append(len(running))
+                running.append(1)
+                time.sleep(0.05)
+                running.pop()
+
+        threads = [threading.Thread(target=hold_lock) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert overlaps == [0, 0, 0, 0]
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test suite for the SingleFlight class."""
+
+    @pytest.fixture
+    def blocking_call(self):
+        """Provides a function that blocks until released and counts its calls."""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            if isinstance(fn.result, Exception):
+                raise fn.result
+            return fn.result
+
+        fn.result = b"image"
+        fn.started, fn.release, fn.calls = started, release, calls
+        return fn
+
+    def run_burst(self, flight, fn, count):
+        """Starts a leader and count followers for the same key and returns results and errors."""
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(flight.do("dashboard", fn))
+            except Exception as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        fn.started.wait(5)
+        followers = [threading.Thread(target=call) for _ in range(count)]
+        for t in followers:
+            t.start()
+        # Give the followers time to join the in-flight call
+        time.sleep(0.1)
+        fn.release.set()
+        for t in [leader] + followers:
+            t.join()
+        return results, errors
+
+    def test_concurrent_calls_share_result(self, blocking_call):
+        """Test that concurrent calls for the same key run the function once."""
+        flight = SingleFlight()
+        results, errors = self.run_burst(flight, blocking_call, 5)
+
+        assert blocking_call.calls == [1]
+        assert results == [b"image"] * 6
+        assert errors == []
+        assert flight.in_flight() == 0
+
+    def test_exception_propagates_to_followers(self, blocking_call):
+        """Test that an exception of the in-flight call is raised for every caller."""
+        blocking_call.result = RuntimeError("render failed")
+        flight = SingleFlight()
+        results, errors = self.run_burst(flight, blocking_call, 3)
+
+        assert blocking_call.calls == [1]
+        assert results == []
+        assert len(errors) == 4
+        assert all(isinstance(e, RuntimeError) for e in errors)
+        assert flight.in_flight() == 0
+
+    def test_new_call_after_completion(self):
+        """Test that the function runs again once the previous call has finished."""
+        flight = SingleFlight()
+        assert flight.do("dashboard", lambda: 1) == 1
+        assert flight.do("dashboard", lambda: 2) == 2
+
+    def test_different_keys_run_separately(self):
+        """Test that calls for different keys don't share results."""
+        flight = SingleFlight()
+        assert flight.do("a", lambda: "a") == "a"
+        assert flight.do("b", lambda: "b") == "b"